@@ -0,0 +1,98 @@
+import bisect
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class EntityIndex:
+    """单个文档的实体索引：小写文本哈希表加上按提及起始位置排序的区间索引"""
+
+    def __init__(self, entities: List[Dict[str, Any]]):
+        """
+        构建实体索引
+
+        Args:
+            entities: 实体列表，查找结果在多个实体都匹配时返回列表中靠前的实体
+        """
+        self.entities = entities
+
+        # 小写文本 -> 第一个具有该文本的实体序号
+        self._by_text = {}
+        for order, entity in enumerate(entities):
+            self._by_text.setdefault(entity.get("text", "").lower(), order)
+
+        # 提及区间按起始位置排序，并记录前缀最大结束位置用于提前终止回溯
+        intervals = []
+        for order, entity in enumerate(entities):
+            for mention in entity.get("mentions", []):
+                position = mention.get("position")
+                if isinstance(position, (list, tuple)) and len(position) == 2 \
+                        and all(isinstance(p, int) for p in position):
+                    intervals.append((position[0], position[1], order))
+        intervals.sort()
+
+        self._starts = [start for start, _, _ in intervals]
+        self._ends = [end for _, end, _ in intervals]
+        self._orders = [order for _, _, order in intervals]
+        self._max_ends = []
+        max_end = -1
+        for end in self._ends:
+            max_end = max(max_end, end)
+            self._max_ends.append(max_end)
+
+        # 部分匹配按实体顺序扫描，结果缓存后同一文本只扫描一次
+        self._texts_in_order = sorted(self._by_text.items(), key=lambda item: item[1])
+        self._partial_cache = {}
+
+    def find_by_text(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        根据文本查找实体：先查完全匹配，再查互相包含的部分匹配
+
+        Args:
+            text: 待查找的文本
+
+        Returns:
+            匹配的实体，未找到时返回None
+        """
+        text = text.strip().lower()
+        order = self._by_text.get(text)
+        if order is not None:
+            return self.entities[order]
+
+        if text not in self._partial_cache:
+            self._partial_cache[text] = next(
+                (order for entity_text, order in self._texts_in_order
+                 if text in entity_text or entity_text in text),
+                None
+            )
+        order = self._partial_cache[text]
+        return self.entities[order] if order is not None else None
+
+    def find_by_span(self, start: int, end: int) -> Optional[Dict[str, Any]]:
+        """
+        查找提及覆盖 [start, end) 或被其覆盖的实体
+
+        Args:
+            start: 开始位置
+            end: 结束位置
+
+        Returns:
+            匹配的实体，未找到时返回None
+        """
+        best = None
+
+        # 覆盖该区间的提及：起始位置不晚于start，向前回溯直到前缀最大结束位置小于end
+        i = bisect.bisect_right(self._starts, start) - 1
+        while i >= 0 and self._max_ends[i] >= end:
+            if self._ends[i] >= end and (best is None or self._orders[i] < best):
+                best = self._orders[i]
+            i -= 1
+
+        # 被该区间覆盖的提及：起始位置在 [start, end) 内
+        i = bisect.bisect_left(self._starts, start)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._ends[i] <= end and (best is None or self._orders[i] < best):
+                best = self._orders[i]
+            i += 1
+
+        return self.entities[best] if best is not None else None
@@ -1,38 +1,41 @@
+import hashlib
 import logging
 import os
-import re
 import json
-import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+
+from algorithms.nlp_models import DocumentAnalysis
+from algorithms.trigger_matcher import AhoCorasickMatcher
+from services.analysis_logger import get_analysis_logger
+from services.log_config import configure_logging
 
 logger = logging.getLogger(__name__)
 
 class EventTriggerExtractor:
     """事件触发词提取器，负责从文本中识别事件触发词"""
     
-    def __init__(self):
-        """初始化事件触发词提取器"""
+    def __init__(self, lexicon_paths=None):
+        """
+        初始化事件触发词提取器
+        
+        Args:
+            lexicon_paths: 额外的触发词词典文件列表，默认加载config/trigger_lexicons下的所有词典
+        """
         self.setup_logging()
-        self.load_trigger_words()
+        self.load_trigger_words(lexicon_paths)
         
     def setup_logging(self):
         """设置日志"""
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 配置日志格式
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(os.path.join(log_dir, "event_trigger.log"), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging("event_trigger.log")
     
-    def load_trigger_words(self):
-        """加载常见事件触发词列表"""
-        # 这里是一些常见的事件触发词，实际应用中可以从文件或数据库加载更完整的列表
+    def load_trigger_words(self, lexicon_paths=None):
+        """
+        加载事件触发词列表并构建匹配自动机
+        
+        Args:
+            lexicon_paths: 触发词词典文件列表，为None时加载config/trigger_lexicons下的所有词典
+        """
+        # 内置的常见英文事件触发词
         self.trigger_words = {
             "STATEMENT": ["say", "announce", "state", "declare", "claim", "report", "mention", "tell", "speak", "assert"],
             "MOVEMENT": ["go", "move", "travel", "arrive", "leave", "depart", "return", "enter", "exit", "flee"],
@@ -45,11 +48,39 @@ class EventTriggerExtractor:
             "PERSONNEL": ["hire", "fire", "resign", "appoint", "elect", "nominate", "promote", "demote", "employ", "work"]
         }
         
-        # 扁平化触发词列表，用于快速查找
+        # 扁平化触发词列表，触发词形式 -> 事件类型
         self.all_triggers = {}
-        for event_type, words in self.trigger_words.items():
+        # 已加载词典文件内容的SHA-256摘要，词典变化时阶段检查点随之失效
+        self.lexicon_digests = []
+        self._add_trigger_words(self.trigger_words, inflect=True)
+        
+        if lexicon_paths is None:
+            lexicon_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "trigger_lexicons")
+            lexicon_paths = []
+            if os.path.isdir(lexicon_dir):
+                lexicon_paths = [os.path.join(lexicon_dir, name) for name in sorted(os.listdir(lexicon_dir))
+                                 if name.endswith((".json", ".txt"))]
+        
+        for path in lexicon_paths:
+            self.load_lexicon_file(path)
+        
+        self._build_matcher()
+        logger.info(f"加载了 {len(self.all_triggers)} 个事件触发词")
+    
+    def _add_trigger_words(self, trigger_words, inflect=False):
+        """
+        添加触发词
+        
+        Args:
+            trigger_words: 事件类型 -> 触发词列表
+            inflect: 是否为英文触发词添加过去式和现在进行时形式
+        """
+        for event_type, words in trigger_words.items():
             for word in words:
+                word = word.lower()
                 self.all_triggers[word] = event_type
+                if not inflect:
+                    continue
                 # 添加过去式和现在进行时形式
                 if word.endswith('e'):
                     self.all_triggers[word + 'd'] = event_type
@@ -57,21 +88,62 @@ class EventTriggerExtractor:
                 else:
                     self.all_triggers[word + 'ed'] = event_type
                     self.all_triggers[word + 'ing'] = event_type
+    
+    def load_lexicon_file(self, path):
+        """
+        从文件加载触发词词典
         
-        logger.info(f"加载了 {len(self.all_triggers)} 个事件触发词")
+        支持两种格式：
+        - JSON: {"inflect": false, "triggers": {"事件类型": ["触发词", ...]}}
+        - TXT: 每行 "触发词<TAB>事件类型"，以#开头的行为注释
+        
+        Args:
+            path: 词典文件路径
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            self.lexicon_digests.append(hashlib.sha256(content.encode("utf-8")).hexdigest())
+            if path.endswith(".json"):
+                lexicon = json.loads(content)
+                self._add_trigger_words(lexicon.get("triggers", {}), inflect=lexicon.get("inflect", False))
+            else:
+                trigger_words = {}
+                for line in content.splitlines():
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    word, _, event_type = line.partition("\t")
+                    trigger_words.setdefault(event_type.strip() or "OTHER", []).append(word.strip())
+                self._add_trigger_words(trigger_words)
+            logger.info(f"成功加载触发词词典: {path}")
+        except Exception as e:
+            logger.error(f"加载触发词词典失败 {path}: {e}")
+    
+    def _build_matcher(self):
+        """基于所有触发词形式构建Aho-Corasick自动机"""
+        self.matcher = AhoCorasickMatcher()
+        for form in self.all_triggers:
+            self.matcher.add(form, form)
+        self.matcher.build()
     
-    def extract_triggers(self, text: str) -> List[Dict[str, Any]]:
+    def extract_triggers(self, text: Union[str, DocumentAnalysis]) -> List[Dict[str, Any]]:
         """
         从文本中提取事件触发词
         
+        使用预先构建的自动机一次线性扫描找出所有出现位置，重叠的匹配保留最左最长的一个。
+        
         Args:
-            text: 输入文本
+            text: 输入文本或文档分析对象
             
         Returns:
             触发词列表，每个触发词包含ID、文本、位置和可能的事件类型
         """
         logger.info("开始提取事件触发词")
         
+        if isinstance(text, DocumentAnalysis):
+            text = text.text
+        
         # 详细日志记录
         detailed_log = {
             "triggers": [],
@@ -79,67 +151,82 @@ class EventTriggerExtractor:
             "text_length": len(text)
         }
         
-        # 分词
-        words = re.findall(r'\b\w+\b', text.lower())
+        # 小写化，保证位置与原文一一对应
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+        
+        # 过滤掉不在词边界上的匹配，再按最左最长原则去除重叠
+        matches = [m for m in self.matcher.finditer(lowered) if self._at_word_boundary(lowered, m[0], m[1])]
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
         
         # 提取触发词
         triggers = []
         trigger_id_counter = 1
+        last_end = 0
         
-        for word in words:
-            if word in self.all_triggers:
-                # 查找单词在原文中的位置
-                pattern = r'\b' + re.escape(word) + r'\b'
-                for match in re.finditer(pattern, text.lower()):
-                    start_pos = match.start()
-                    end_pos = match.end()
-                    
-                    # 获取原文中的实际文本（保留大小写）
-                    original_text = text[start_pos:end_pos]
-                    
-                    trigger = {
-                        "trigger_id": f"T{trigger_id_counter}",
-                        "text": original_text,
-                        "position": [start_pos, end_pos],
-                        "potential_type": self.all_triggers[word]
-                    }
-                    triggers.append(trigger)
-                    
-                    # 记录到详细日志
-                    detailed_log["triggers"].append({
-                        "trigger_id": f"T{trigger_id_counter}",
-                        "text": original_text,
-                        "position": [start_pos, end_pos],
-                        "type": self.all_triggers[word],
-                        "match_pattern": word,
-                        "original_form": word
-                    })
-                    
-                    trigger_id_counter += 1
+        for start_pos, end_pos, form in matches:
+            if start_pos < last_end:
+                continue
+            last_end = end_pos
+            
+            # 获取原文中的实际文本（保留大小写）
+            original_text = text[start_pos:end_pos]
+            
+            trigger = {
+                "trigger_id": f"T{trigger_id_counter}",
+                "text": original_text,
+                "position": [start_pos, end_pos],
+                "potential_type": self.all_triggers[form]
+            }
+            triggers.append(trigger)
+            
+            # 记录到详细日志
+            detailed_log["triggers"].append({
+                "trigger_id": f"T{trigger_id_counter}",
+                "text": original_text,
+                "position": [start_pos, end_pos],
+                "type": self.all_triggers[form],
+                "match_pattern": form,
+                "original_form": form
+            })
+            
+            trigger_id_counter += 1
         
         # 写入详细日志
         self._log_detailed_analysis(detailed_log)
         
         logger.info(f"提取到 {len(triggers)} 个事件触发词")
         return triggers
+    
+    @staticmethod
+    def _at_word_boundary(text, start, end):
+        """
+        判断匹配是否位于词边界
+        
+        以字母数字结尾的触发词要求两侧不是字母数字（与正则的单词边界一致）；
+        中日韩触发词之间没有空格分隔，不做边界检查。
+        """
+        first, last = text[start], text[end - 1]
+        if _is_word_char(first) and not _is_cjk(first) and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if _is_word_char(last) and not _is_cjk(last) and end < len(text) and _is_word_char(text[end]):
+            return False
+        return True
 
     def _log_detailed_analysis(self, detailed_log):
         """记录详细的触发词分析日志"""
-        # 创建日志目录
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                              "logs", "analysis_logs", "triggers")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 创建日志文件名（使用时间戳）
-        timestamp = int(time.time())
-        log_file = os.path.join(log_dir, f"trigger_analysis_{timestamp}.json")
-        
-        # 添加时间戳
-        detailed_log["timestamp"] = timestamp
         detailed_log["total_triggers"] = len(detailed_log["triggers"])
         
-        # 写入日志文件
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(detailed_log, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"触发词提取详细分析日志已保存至: {log_file}") 
\ No newline at end of file
+        # 交给后台线程写入，不阻塞提取流程
+        get_analysis_logger().log("triggers", detailed_log)
+
+
+def _is_word_char(char):
+    """与正则单词字符一致的判断"""
+    return char.isalnum() or char == '_'
+
+
+def _is_cjk(char):
+    """判断是否为中日韩统一表意文字"""
+    return '\u3400' <= char <= '\u9fff' or '\uf900' <= char <= '\ufaff'
@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import math
+from collections import Counter, defaultdict
+from typing import Optional, Any, Tuple, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# shingle哈希位数
+HASH_BITS = 64
+# MinHash哈希族的随机种子
+MINHASH_SEED = 1016
+
+# (各分段的MinHash桶键, 最小shingle哈希值有序列表)
+Signature = Tuple[Tuple[bytes, ...], List[int]]
+
+def shingle_hashes(text: str, shingle_size: int = 3) -> Counter:
+    """
+    将文本切分为字符shingle并计算64位哈希
+
+    文本先去除空白并转为小写，转发时增减的空格和换行不影响结果。
+
+    Args:
+        text: 输入文本
+        shingle_size: 字符shingle长度
+
+    Returns:
+        shingle哈希值 -> 出现次数
+    """
+    normalized = "".join(text.split()).lower()
+    if len(normalized) <= shingle_size:
+        shingles = Counter([normalized])
+    else:
+        shingles = Counter(normalized[i:i + shingle_size] for i in range(len(normalized) - shingle_size + 1))
+
+    hashes = Counter()
+    for shingle, count in shingles.items():
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=HASH_BITS // 8).digest()
+        hashes[int.from_bytes(digest, "big")] += count
+    return hashes
+
+
+def sketch_similarity(a: List[int], b: List[int], sketch_size: int) -> float:
+    """
+    用bottom-k草图估计两个shingle集合的Jaccard相似度
+
+    两个草图都未截断（shingle数少于sketch_size）时结果是精确值。
+
+    Args:
+        a: 第一个文本的最小shingle哈希值有序列表
+        b: 第二个文本的最小shingle哈希值有序列表
+        sketch_size: 草图大小
+
+    Returns:
+        0到1之间的相似度
+    """
+    set_a, set_b = set(a), set(b)
+    union = sorted(set_a | set_b)[:sketch_size]
+    if not union:
+        return 1.0
+    shared = sum(1 for value in union if value in set_a and value in set_b)
+    return shared / len(union)
+
+
+def lsh_bands(threshold: float, max_hashes: int = 128, recall: float = 0.99) -> Tuple[int, int]:
+    """
+    选择MinHash LSH的分段数和每段行数
+
+    Jaccard相似度为s的两个文档至少有一个分段完全相同的概率为 1 - (1 - s^rows)^bands。
+    在不超过max_hashes个MinHash值的前提下取最大的行数（最能拒绝不相似的文档），
+    并取使相似度恰为threshold的文档成为候选的概率不低于recall的最少分段数。
+
+    Args:
+        threshold: 最小Jaccard相似度
+        max_hashes: MinHash值个数上限
+        recall: 相似度恰为threshold时成为候选的最小概率
+
+    Returns:
+        (分段数, 每段行数)
+    """
+    if threshold >= 1:
+        return 1, max_hashes
+    best = (max_hashes, 1)
+    for rows in range(1, max_hashes + 1):
+        bands = math.ceil(math.log(1 - recall) / math.log1p(-threshold ** rows))
+        if bands * rows > max_hashes:
+            break
+        best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    增量构建的近似重复文档索引
+
+    每个文档计算 bands * rows 个MinHash值并切分为bands个分段，只比较至少一个分段完全相同的候选，
+    分段数和行数由threshold推导（见lsh_bands），不相似的文档几乎不会成为候选，查找耗时不随索引规模线性增长。
+    候选还需通过bottom-k草图估计的shingle Jaccard相似度校验。
+    """
+
+    def __init__(self, threshold: float = 0.95, shingle_size: int = 3, sketch_size: int = 256,
+                 max_hashes: int = 128):
+        """
+        初始化索引
+
+        Args:
+            threshold: 视为近似重复的最小Jaccard相似度
+            shingle_size: 字符shingle长度
+            sketch_size: 每个文档保留的最小shingle哈希值个数
+            max_hashes: 每个文档MinHash值个数的上限
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.sketch_size = sketch_size
+        self.bands, self.rows = lsh_bands(threshold, max_hashes)
+
+        # MinHash使用的哈希族 h(x) = a * x + b (mod 2^64)，a为奇数，种子固定使签名在进程间一致
+        generator = np.random.default_rng(MINHASH_SEED)
+        count = self.bands * self.rows
+        self._multipliers = generator.integers(0, 2 ** 63, count, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._increments = generator.integers(0, 2 ** 63, count, dtype=np.uint64)
+
+        # (分段序号, 分段值) -> [条目序号]
+        self._buckets = defaultdict(list)
+        self._entries = []
+        # 累计做过相似度校验的候选数
+        self.candidates_checked = 0
+
+    @property
+    def size(self) -> int:
+        """已索引的文档数"""
+        return len(self._entries)
+
+    def signature(self, text: str) -> Signature:
+        """
+        计算文本的签名：各分段的桶键和bottom-k草图
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            (分段桶键, 草图)
+        """
+        hashes = sorted(shingle_hashes(text, self.shingle_size))
+        values = np.array(hashes, dtype=np.uint64)
+        # 乘加在uint64上按2^64取模回绕
+        minhashes = (np.outer(self._multipliers, values) + self._increments[:, None]).min(axis=1)
+        keys = tuple(minhashes[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands))
+        return keys, hashes[:self.sketch_size]
+
+    def find(self, signature: Signature) -> Optional[Any]:
+        """
+        查找与签名近似重复的已索引文档
+
+        Args:
+            signature: signature()的结果
+
+        Returns:
+            相似度最高的已索引文档的关联值，没有近似重复时返回None
+        """
+        keys, sketch = signature
+        checked = set()
+        best, best_similarity = None, self.threshold
+        for key in enumerate(keys):
+            for entry_id in self._buckets.get(key, ()):
+                if entry_id in checked:
+                    continue
+                checked.add(entry_id)
+
+                candidate_sketch, value = self._entries[entry_id]
+                similarity = sketch_similarity(sketch, candidate_sketch, self.sketch_size)
+                if similarity >= best_similarity:
+                    best, best_similarity = value, similarity
+        self.candidates_checked += len(checked)
+        return best
+
+    def add(self, signature: Signature, value: Any):
+        """
+        将文档加入索引
+
+        Args:
+            signature: signature()的结果
+            value: 关联值（如文档ID）
+        """
+        entry_id = len(self._entries)
+        self._entries.append((signature[1], value))
+        for key in enumerate(signature[0]):
+            self._buckets[key].append(entry_id)
@@ -1,9 +1,9 @@
 import logging
-import spacy
-import os
-import time
-import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+
+from algorithms.nlp_models import get_nlp, DocumentAnalysis
+from services.analysis_logger import get_analysis_logger
+from services.log_config import configure_logging
 
 logger = logging.getLogger(__name__)
 
@@ -13,54 +13,34 @@ class NERExtractor:
     def __init__(self):
         """初始化NER提取器"""
         self.setup_logging()
-        self.load_model()
         
     def setup_logging(self):
         """设置日志"""
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 配置日志格式
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(os.path.join(log_dir, "ner_extractor.log"), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging("ner_extractor.log")
     
     def load_model(self):
-        """加载NER模型"""
+        """加载NER模型，常驻进程启动时预热使用"""
         logger.info("加载SpaCy NER模型")
-        try:
-            # 加载英文模型
-            self.nlp = spacy.load("en_core_web_sm")
-            logger.info("SpaCy NER模型加载成功")
-        except Exception as e:
-            logger.error(f"加载SpaCy模型失败: {e}")
-            logger.info("尝试下载SpaCy模型...")
-            try:
-                # 如果模型不存在，尝试下载
-                import subprocess
-                subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"], check=True)
-                self.nlp = spacy.load("en_core_web_sm")
-                logger.info("SpaCy NER模型下载并加载成功")
-            except Exception as e:
-                logger.error(f"下载SpaCy模型失败: {e}")
-                # 创建一个空的管道作为后备
-                self.nlp = spacy.blank("en")
-                logger.warning("使用空白模型作为后备")
+        # 使用进程内共享的模型，避免各提取器重复加载
+        return get_nlp()
+    
+    @property
+    def nlp(self):
+        """SpaCy模型，首次使用时加载，构造提取器时不加载"""
+        return get_nlp()
     
-    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
-        """从文本中提取命名实体"""
+    def extract_entities(self, text: Union[str, DocumentAnalysis]) -> List[Dict[str, Any]]:
+        """从文本或文档分析对象中提取命名实体"""
         logger.info("开始提取命名实体")
         
-        # 使用SpaCy处理文本
-        doc = self.nlp(text)
+        # 复用文档分析对象中的Doc，避免重复解析
+        analysis = DocumentAnalysis.ensure(text, self.nlp)
+        text = analysis.text
+        doc = analysis.doc
         
         # 提取实体
         entities = []
+        entities_by_text = {}
         entity_id_counter = 1
         
         # 实体类型映射
@@ -102,7 +82,7 @@ class NERExtractor:
             })
             
             # 检查是否已存在相同文本的实体
-            existing_entity = next((e for e in entities if e["text"].lower() == ent.text.lower()), None)
+            existing_entity = entities_by_text.get(ent.text.lower())
             
             if existing_entity:
                 # 如果实体已存在，添加新的提及
@@ -122,6 +102,7 @@ class NERExtractor:
                     }]
                 }
                 entities.append(entity)
+                entities_by_text[ent.text.lower()] = entity
                 entity_id_counter += 1
         
         # 记录详细日志
@@ -132,18 +113,8 @@ class NERExtractor:
 
     def _log_detailed_analysis(self, text, entities_log):
         """记录详细的实体分析日志"""
-        # 创建日志目录
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                              "logs", "analysis_logs", "ner")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 创建日志文件名（使用时间戳）
-        timestamp = int(time.time())
-        log_file = os.path.join(log_dir, f"ner_analysis_{timestamp}.json")
-        
         # 准备日志内容
         log_content = {
-            "timestamp": timestamp,
             "text": text,
             "text_length": len(text),
             "entities_count": len(entities_log),
@@ -151,8 +122,5 @@ class NERExtractor:
             "model": "en_core_web_sm"  # 或实际使用的模型
         }
         
-        # 写入日志文件
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(log_content, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"NER详细分析日志已保存至: {log_file}") 
\ No newline at end of file
+        # 交给后台线程写入，不阻塞提取流程
+        get_analysis_logger().log("ner", log_content)
@@ -0,0 +1,169 @@
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "en_core_web_sm"
+
+# 进程内共享的SpaCy模型，按模型名称缓存
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_nlp(model_name: str = DEFAULT_MODEL):
+    """
+    获取进程内共享的SpaCy模型，首次调用时加载
+
+    Args:
+        model_name: SpaCy模型名称
+
+    Returns:
+        SpaCy语言管道
+    """
+    nlp = _models.get(model_name)
+    if nlp is not None:
+        return nlp
+
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = _load_model(model_name)
+        return _models[model_name]
+
+
+def _load_model(model_name):
+    """加载SpaCy模型，失败时尝试下载，最后退回空白模型"""
+    # SpaCy导入较慢，只在第一次需要模型时导入
+    import spacy
+
+    logger.info(f"加载SpaCy模型: {model_name}")
+    try:
+        nlp = spacy.load(model_name)
+        logger.info("SpaCy模型加载成功")
+        return nlp
+    except Exception as e:
+        logger.error(f"加载SpaCy模型失败: {e}")
+        logger.info("尝试下载SpaCy模型...")
+        try:
+            # 如果模型不存在，尝试下载
+            import subprocess
+            subprocess.run(["python", "-m", "spacy", "download", model_name], check=True)
+            nlp = spacy.load(model_name)
+            logger.info("SpaCy模型下载并加载成功")
+            return nlp
+        except Exception as e:
+            logger.error(f"下载SpaCy模型失败: {e}")
+            # 创建一个空的管道作为后备
+            logger.warning("使用空白模型作为后备")
+            return spacy.blank("en")
+
+
+class DocumentAnalysis:
+    """单个文档的分析对象，持有一次解析得到的Doc，供NER、触发词和SRL共用"""
+
+    def __init__(self, text: str, nlp=None, doc=None):
+        """
+        初始化文档分析对象
+
+        Args:
+            text: 预处理后的文本
+            nlp: 用于解析的SpaCy管道，默认为共享模型
+            doc: 已解析的Doc，为None时在首次访问时解析
+        """
+        self.text = text
+        self._nlp = nlp
+        self._doc = doc
+        self._sentences = None
+        self._sentence_starts = None
+        self._token_starts = None
+
+    @classmethod
+    def ensure(cls, text_or_analysis, nlp=None):
+        """
+        将文本或已有的分析对象统一为分析对象
+
+        Args:
+            text_or_analysis: 文本字符串或DocumentAnalysis
+            nlp: 文本需要解析时使用的SpaCy管道
+
+        Returns:
+            DocumentAnalysis
+        """
+        if isinstance(text_or_analysis, cls):
+            return text_or_analysis
+        return cls(text_or_analysis, nlp)
+
+    @property
+    def doc(self):
+        """解析后的Doc，整个文档只解析一次"""
+        if self._doc is None:
+            nlp = self._nlp if self._nlp is not None else get_nlp()
+            self._doc = nlp(self.text)
+        return self._doc
+
+    def _build_offset_index(self):
+        """构建句子起始位置和token起始位置的有序数组，每个Doc只构建一次"""
+        doc = self.doc
+        self._sentences = list(doc.sents)
+        self._sentence_starts = [sent.start_char for sent in self._sentences]
+        self._token_starts = [token.idx for token in doc]
+
+    def sentence_at(self, start: int, end: int):
+        """
+        二分查找完整包含 [start, end) 的句子
+
+        Args:
+            start: 开始位置
+            end: 结束位置
+
+        Returns:
+            句子Span，未找到时返回None
+        """
+        if self._sentence_starts is None:
+            self._build_offset_index()
+        i = bisect.bisect_right(self._sentence_starts, start) - 1
+        if i >= 0 and self._sentences[i].end_char >= end:
+            return self._sentences[i]
+        return None
+
+    def token_at(self, start: int, end: int):
+        """
+        二分查找覆盖 [start, end) 的token
+
+        Args:
+            start: 开始位置
+            end: 结束位置
+
+        Returns:
+            Token，未找到时返回None
+        """
+        if self._token_starts is None:
+            self._build_offset_index()
+        i = bisect.bisect_right(self._token_starts, start) - 1
+        if i >= 0:
+            token = self.doc[i]
+            if token.idx + len(token.text) >= end:
+                return token
+        return None
+
+
+def analyze_texts(texts, nlp=None, batch_size: int = 64, n_process: int = 1):
+    """
+    使用nlp.pipe批量解析文本
+
+    Args:
+        texts: 预处理后的文本可迭代对象，按需惰性读取
+        nlp: SpaCy管道，默认为共享模型
+        batch_size: 每批送入管道的文本数
+        n_process: SpaCy并行进程数
+
+    Returns:
+        与输入顺序一致的DocumentAnalysis生成器
+    """
+    if nlp is None:
+        nlp = get_nlp()
+
+    # 同一份文本既要送入管道，又要保存在分析对象中，借助as_tuples携带原文
+    pairs = ((text, text) for text in texts)
+    for doc, text in nlp.pipe(pairs, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        yield DocumentAnalysis(text, nlp, doc)
@@ -1,7 +1,9 @@
 import logging
-import os
+from collections import defaultdict
 from typing import List, Dict, Any
 
+from services.log_config import configure_logging
+
 logger = logging.getLogger(__name__)
 
 class RelationExtractor:
@@ -13,18 +15,7 @@ class RelationExtractor:
         
     def setup_logging(self):
         """设置日志"""
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 配置日志格式
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(os.path.join(log_dir, "relation_extractor.log"), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging("relation_extractor.log")
     
     def extract_relations(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -71,38 +62,52 @@ class RelationExtractor:
                 })
         
         # 基于共享实体的关系
-        for i, event1 in enumerate(events):
-            for j, event2 in enumerate(events):
-                if i == j:
-                    continue
-                
-                # 检查是否共享主体
-                event1_who_ids = [w["entity_id"] for w in event1["elements"]["who"]]
-                event2_who_ids = [w["entity_id"] for w in event2["elements"]["who"]]
-                
-                shared_who = set(event1_who_ids).intersection(set(event2_who_ids))
+        # 建立倒排索引：实体ID -> 以其为主体/客体的事件序号
+        agent_index = defaultdict(list)
+        patient_index = defaultdict(list)
+        for i, event in enumerate(events):
+            for entity_id in {w["entity_id"] for w in event["elements"]["who"]}:
+                agent_index[entity_id].append(i)
+            for entity_id in {w["entity_id"] for w in event["elements"]["whom"]}:
+                patient_index[entity_id].append(i)
+        
+        # 只从索引中生成候选事件对：event1 -> {event2序号: (共享主体, 客体是对方主体)}
+        candidates = defaultdict(dict)
+        for entity_id, agent_events in agent_index.items():
+            # 共享主体
+            for i in agent_events:
+                for j in agent_events:
+                    if i != j:
+                        candidates[i][j] = (True, candidates[i].get(j, (False, False))[1])
+            # 事件1的客体是事件2的主体
+            for i in patient_index.get(entity_id, []):
+                for j in agent_events:
+                    if i != j:
+                        candidates[i][j] = (candidates[i].get(j, (False, False))[0], True)
+        
+        # 每个事件维护已有关系的目标事件集合，避免重复添加
+        related_ids = [{r["related_event_id"] for r in event["relations"]} for event in events]
+        
+        for i in sorted(candidates):
+            event1 = events[i]
+            for j in sorted(candidates[i]):
+                event2 = events[j]
+                shared_agent, object_to_subject = candidates[i][j]
                 
-                if shared_who:
+                if shared_agent and event2["event_id"] not in related_ids[i]:
                     # 添加共享主体关系
-                    relation_exists = any(r["related_event_id"] == event2["event_id"] for r in event1["relations"])
-                    if not relation_exists:
-                        event1["relations"].append({
-                            "related_event_id": event2["event_id"],
-                            "relation_type": "SHARED_AGENT"
-                        })
-                
-                # 检查是否存在主体-客体关系
-                event1_whom_ids = [w["entity_id"] for w in event1["elements"]["whom"]]
+                    event1["relations"].append({
+                        "related_event_id": event2["event_id"],
+                        "relation_type": "SHARED_AGENT"
+                    })
+                    related_ids[i].add(event2["event_id"])
                 
-                # 事件1的客体是事件2的主体
-                shared_whom_who = set(event1_whom_ids).intersection(set(event2_who_ids))
-                if shared_whom_who:
-                    relation_exists = any(r["related_event_id"] == event2["event_id"] for r in event1["relations"])
-                    if not relation_exists:
-                        event1["relations"].append({
-                            "related_event_id": event2["event_id"],
-                            "relation_type": "OBJECT_TO_SUBJECT"
-                        })
+                if object_to_subject and event2["event_id"] not in related_ids[i]:
+                    event1["relations"].append({
+                        "related_event_id": event2["event_id"],
+                        "relation_type": "OBJECT_TO_SUBJECT"
+                    })
+                    related_ids[i].add(event2["event_id"])
         
         logger.info("事件关系提取完成")
         return events 
\ No newline at end of file
@@ -1,7 +1,9 @@
 import logging
-import os
-import spacy
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+
+from algorithms.nlp_models import get_nlp, DocumentAnalysis
+from algorithms.entity_index import EntityIndex
+from services.log_config import configure_logging
 
 logger = logging.getLogger(__name__)
 
@@ -11,42 +13,28 @@ class SRLExtractor:
     def __init__(self):
         """初始化语义角色标注器"""
         self.setup_logging()
-        self.load_model()
         
     def setup_logging(self):
         """设置日志"""
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 配置日志格式
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(os.path.join(log_dir, "srl_extractor.log"), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging("srl_extractor.log")
     
     def load_model(self):
-        """加载依存句法分析模型"""
+        """加载依存句法分析模型，常驻进程启动时预热使用"""
         logger.info("加载SpaCy依存句法分析模型")
-        try:
-            # 加载英文模型
-            self.nlp = spacy.load("en_core_web_sm")
-            logger.info("SpaCy依存句法分析模型加载成功")
-        except Exception as e:
-            logger.error(f"加载SpaCy模型失败: {e}")
-            # 创建一个空的管道作为后备
-            self.nlp = spacy.blank("en")
-            logger.warning("使用空白模型作为后备")
+        # 与NER共用进程内的同一个模型
+        return get_nlp()
+    
+    @property
+    def nlp(self):
+        """SpaCy模型，首次使用时加载，构造提取器时不加载"""
+        return get_nlp()
     
-    def extract_srl(self, text: str, triggers: List[Dict[str, Any]], entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def extract_srl(self, text: Union[str, DocumentAnalysis], triggers: List[Dict[str, Any]], entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         提取文本中的语义角色
         
         Args:
-            text: 输入文本
+            text: 输入文本或文档分析对象
             triggers: 事件触发词列表
             entities: 实体列表
             
@@ -55,8 +43,11 @@ class SRLExtractor:
         """
         logger.info("开始提取语义角色")
         
-        # 使用SpaCy处理文本
-        doc = self.nlp(text)
+        # 复用文档分析对象中的Doc，避免重复解析
+        analysis = DocumentAnalysis.ensure(text, self.nlp)
+        
+        # 为实体建立文本和位置索引，避免每次查找都线性扫描
+        entity_index = EntityIndex(entities)
         
         # 提取事件基本要素
         events = []
@@ -68,81 +59,59 @@ class SRLExtractor:
             trigger_start = trigger["position"][0]
             trigger_end = trigger["position"][1]
             
-            # 找到包含触发词的句子
-            trigger_sentence = None
-            for sent in doc.sents:
-                if sent.start_char <= trigger_start and sent.end_char >= trigger_end:
-                    trigger_sentence = sent
-                    break
-            
+            # 二分查找包含触发词的句子
+            trigger_sentence = analysis.sentence_at(trigger_start, trigger_end)
             if not trigger_sentence:
                 continue
             
-            # 找到触发词对应的token
-            trigger_token = None
-            for token in trigger_sentence:
-                if token.idx <= trigger_start and token.idx + len(token.text) >= trigger_end:
-                    trigger_token = token
-                    break
-            
+            # 二分查找触发词对应的token
+            trigger_token = analysis.token_at(trigger_start, trigger_end)
             if not trigger_token:
                 continue
             
-            # 提取主语（who）和宾语（whom）
+            # 提取主语（who）、宾语（whom）、时间和地点
             who = []
             whom = []
             when = ""
             where = []
             
-            # 查找主语
-            for token in trigger_sentence:
+            # 只需遍历触发词的直接依存成分，无需重复扫描整个句子
+            for token in trigger_token.children:
                 # 如果token是触发词的主语
-                if token.dep_ in ["nsubj", "nsubjpass"] and token.head == trigger_token:
-                    # 提取完整的名词短语
-                    subject_span = self._get_span_for_token(token)
-                    subject_text = subject_span.text
-                    
-                    # 查找对应的实体
-                    entity = self._find_entity_by_text(subject_text, entities)
+                if token.dep_ in ["nsubj", "nsubjpass"]:
+                    # 提取完整的名词短语，查找对应的实体
+                    entity = self._find_entity_by_text(self._get_span_for_token(token).text, entity_index)
                     if entity:
                         who.append({
                             "entity_id": entity["entity_id"],
                             "role": "AGENT"
                         })
-            
-            # 查找宾语
-            for token in trigger_sentence:
+                
                 # 如果token是触发词的宾语
-                if token.dep_ in ["dobj", "pobj", "attr"] and token.head == trigger_token:
-                    # 提取完整的名词短语
-                    object_span = self._get_span_for_token(token)
-                    object_text = object_span.text
-                    
-                    # 查找对应的实体
-                    entity = self._find_entity_by_text(object_text, entities)
+                elif token.dep_ in ["dobj", "pobj", "attr"]:
+                    entity = self._find_entity_by_text(self._get_span_for_token(token).text, entity_index)
                     if entity:
                         whom.append({
                             "entity_id": entity["entity_id"],
                             "role": "PATIENT"
                         })
-            
-            # 查找时间和地点
-            for token in trigger_sentence:
-                # 如果token是时间状语
-                if token.dep_ in ["npadvmod", "advmod"] and token.head == trigger_token:
-                    # 检查是否是时间实体
-                    entity = self._find_entity_by_token(token, entities)
+                
+                # 如果token是时间状语，检查是否是时间实体
+                elif token.dep_ in ["npadvmod", "advmod"]:
+                    entity = self._find_entity_by_token(token, entity_index)
                     if entity and entity["type"] in ["TIME", "DATE"]:
                         when = entity["text"]
                 
-                # 如果token是地点状语
-                if token.dep_ in ["pobj"] and token.head.dep_ == "prep" and token.head.head == trigger_token:
-                    # 检查是否是地点实体
-                    entity = self._find_entity_by_token(token, entities)
-                    if entity and entity["type"] == "LOCATION":
-                        where.append({
-                            "entity_id": entity["entity_id"]
-                        })
+                # 如果token是介词短语，检查其宾语是否是地点实体
+                elif token.dep_ == "prep":
+                    for prep_object in token.children:
+                        if prep_object.dep_ != "pobj":
+                            continue
+                        entity = self._find_entity_by_token(prep_object, entity_index)
+                        if entity and entity["type"] == "LOCATION":
+                            where.append({
+                                "entity_id": entity["entity_id"]
+                            })
             
             # 创建事件
             event = {
@@ -207,39 +176,10 @@ class SRLExtractor:
         # 如果没有找到完整的短语，返回token本身
         return token.doc[token.i:token.i + 1]
     
-    def _find_entity_by_text(self, text, entities):
-        """根据文本查找实体"""
-        # 规范化文本
-        text = text.strip().lower()
-        
-        # 查找完全匹配的实体
-        for entity in entities:
-            if entity["text"].lower() == text:
-                return entity
-        
-        # 查找部分匹配的实体
-        for entity in entities:
-            if text in entity["text"].lower() or entity["text"].lower() in text:
-                return entity
-        
-        return None
+    def _find_entity_by_text(self, text, entity_index):
+        """根据文本查找实体（先完全匹配，再部分匹配）"""
+        return entity_index.find_by_text(text)
     
-    def _find_entity_by_token(self, token, entities):
-        """根据token查找实体"""
-        # 获取token的文本和位置
-        token_text = token.text
-        token_start = token.idx
-        token_end = token.idx + len(token.text)
-        
-        # 查找包含token的实体
-        for entity in entities:
-            for mention in entity["mentions"]:
-                mention_start = mention["position"][0]
-                mention_end = mention["position"][1]
-                
-                # 检查token是否在实体提及的范围内
-                if (mention_start <= token_start and mention_end >= token_end) or \
-                   (token_start <= mention_start and token_end >= mention_end):
-                    return entity
-        
-        return None 
\ No newline at end of file
+    def _find_entity_by_token(self, token, entity_index):
+        """根据token查找实体，提及覆盖token或被token覆盖均视为匹配"""
+        return entity_index.find_by_span(token.idx, token.idx + len(token.text))
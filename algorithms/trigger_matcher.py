@@ -0,0 +1,89 @@
+import logging
+from collections import deque
+from typing import List, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+class AhoCorasickMatcher:
+    """Aho-Corasick多模式匹配自动机，一次线性扫描找出所有触发词出现位置"""
+
+    def __init__(self):
+        """初始化空自动机"""
+        # 每个状态的转移、失败指针、以该状态结尾的模式，以及合并后缀后的输出（模式长度与关联值）
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [[]]
+        self._output = [[]]
+        self._built = False
+        self.size = 0
+
+    def add(self, pattern: str, value: Any = None):
+        """
+        添加一个模式
+
+        Args:
+            pattern: 模式字符串（匹配时区分大小写，调用方负责规范化）
+            value: 匹配时返回的关联值
+        """
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append([])
+            state = next_state
+
+        # 同一模式重复添加时以最后一次为准
+        if not self._terminal[state]:
+            self.size += 1
+        self._terminal[state] = [(len(pattern), value)]
+        self._built = False
+
+    def build(self):
+        """按广度优先顺序计算失败指针，并合并后缀状态的输出"""
+        self._output = [list(terminal) for terminal in self._terminal]
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def finditer(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        扫描文本，返回所有匹配
+
+        Args:
+            text: 已规范化的文本
+
+        Returns:
+            (开始位置, 结束位置, 关联值) 列表，按结束位置排序
+        """
+        if not self._built:
+            self.build()
+
+        matches = []
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                matches.append((index + 1 - length, index + 1, value))
+        return matches
@@ -0,0 +1,158 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VectorIndex:
+    """
+    进程内余弦相似度向量索引
+
+    向量较少时直接用矩阵乘法暴力检索；超过ivf_threshold后用球面k-means划分为倒排列表（IVF），
+    检索时只扫描与查询最相近的nprobe个列表。向量数每翻一番重新训练一次划分，保持列表大小均衡。
+    """
+
+    def __init__(self, ivf_threshold: int = 20000, nprobe: int = 8,
+                 kmeans_iterations: int = 10, seed: int = 0):
+        """
+        初始化向量索引
+
+        Args:
+            ivf_threshold: 开始使用IVF划分的向量数
+            nprobe: IVF检索时扫描的列表数
+            kmeans_iterations: 训练划分时的k-means迭代次数
+            seed: 随机种子
+        """
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.kmeans_iterations = kmeans_iterations
+        self._rng = np.random.default_rng(seed)
+
+        self._matrix = None
+        self.size = 0
+
+        # IVF划分：质心、每个列表的行号、每行所属列表
+        self._centroids = None
+        self._lists = []
+        self._assignment = None
+        self._trained_size = 0
+
+    @staticmethod
+    def _normalize(vector):
+        """归一化为单位向量"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, vector) -> int:
+        """
+        添加向量
+
+        Args:
+            vector: 向量（内部归一化）
+
+        Returns:
+            向量的行号
+        """
+        vector = self._normalize(vector)
+        if self._matrix is None:
+            self._matrix = np.zeros((16, vector.shape[0]), dtype=np.float32)
+            self._assignment = np.zeros(16, dtype=np.int32)
+        elif self.size == self._matrix.shape[0]:
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+            self._assignment = np.concatenate([self._assignment, np.zeros_like(self._assignment)])
+
+        row = self.size
+        self._matrix[row] = vector
+        self.size += 1
+
+        if self._centroids is not None:
+            self._assign(row)
+        if self.size >= self.ivf_threshold and self.size >= 2 * self._trained_size:
+            self._train()
+        return row
+
+    def update(self, row: int, vector):
+        """
+        替换已有向量（如聚类质心移动后）
+
+        Args:
+            row: 行号
+            vector: 新向量（内部归一化）
+        """
+        self._matrix[row] = self._normalize(vector)
+        if self._centroids is not None:
+            old = self._assignment[row]
+            self._lists[old].remove(row)
+            self._assign(row)
+
+    def search(self, vector, k: int = 1) -> List[Tuple[int, float]]:
+        """
+        检索最相似的向量
+
+        Args:
+            vector: 查询向量
+            k: 返回数量
+
+        Returns:
+            (行号, 余弦相似度) 列表，按相似度降序
+        """
+        if self.size == 0:
+            return []
+        query = self._normalize(vector)
+
+        if self._centroids is None:
+            rows = None
+            scores = self._matrix[:self.size] @ query
+        else:
+            probe = np.argsort(self._centroids @ query)[::-1][:self.nprobe]
+            rows = np.fromiter((row for c in probe for row in self._lists[c]), dtype=np.int64)
+            if rows.size == 0:
+                return []
+            scores = self._matrix[rows] @ query
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in top]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def _assign(self, row):
+        """将一行分配到最近的IVF列表"""
+        list_id = int(np.argmax(self._centroids @ self._matrix[row]))
+        self._assignment[row] = list_id
+        self._lists[list_id].append(row)
+
+    def _train(self):
+        """用球面k-means训练IVF划分，并重新分配所有向量"""
+        data = self._matrix[:self.size]
+        nlist = max(1, int(np.sqrt(self.size)))
+        centroids = data[self._rng.choice(self.size, nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignment = self._nearest(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # 空列表保留原质心
+            nonempty = norms[:, 0] > 0
+            centroids[nonempty] = sums[nonempty] / norms[nonempty]
+
+        assignment = self._nearest(data, centroids)
+        self._centroids = centroids
+        self._assignment[:self.size] = assignment
+        self._lists = [[] for _ in range(nlist)]
+        for row, list_id in enumerate(assignment.tolist()):
+            self._lists[list_id].append(row)
+        self._trained_size = self.size
+        logger.info(f"向量索引IVF划分已训练: {self.size} 个向量，{nlist} 个列表")
+
+    @staticmethod
+    def _nearest(data, centroids, batch_size=8192):
+        """分批计算每个向量最近的质心，限制中间矩阵的内存占用"""
+        return np.concatenate([
+            np.argmax(data[i:i + batch_size] @ centroids.T, axis=1)
+            for i in range(0, data.shape[0], batch_size)
+        ])
@@ -0,0 +1,148 @@
+"""
+启动耗时基准
+
+在全新的解释器中分别测量导入事件提取服务、构造事件提取器、以及处理第一个短文档（rule档位，不调用LLM）
+的耗时；指定 --socket 时另外测量向常驻进程提交同一文档的往返耗时。
+
+用法:
+    python benchmarks/startup_time.py --repeat 5 --json startup.json
+    python benchmarks/startup_time.py --baseline startup.json --tolerance 0.25
+
+与基准比较时，任一场景的中位数超过基准的 (1 + tolerance) 倍即以退出码1结束。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TEXT = "3月5日，某科技公司宣布其云服务出现故障，工程师正在排查原因。"
+
+# 场景名称 -> 在全新解释器中执行的代码
+SCENARIOS = {
+    "import": "import services.event_extractor",
+    "construct": (
+        "from services.event_extractor import EventExtractor\n"
+        "EventExtractor(tier='rule', use_checkpoints=False)"
+    ),
+    "first_document": (
+        "from services.event_extractor import EventExtractor\n"
+        "extractor = EventExtractor(tier='rule', use_checkpoints=False)\n"
+        f"result = extractor.extract_events_from_text({SAMPLE_TEXT!r}, 'startup_benchmark')\n"
+        # 流水线失败时只记录日志并返回None，这里转为非零退出码以免把失败计入耗时
+        "raise SystemExit(0 if result is not None else '事件提取失败，详见日志')"
+    )
+}
+
+
+def run_scenario(code):
+    """在全新的解释器中执行代码，返回耗时（秒），失败时返回错误信息"""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f"退出码 {completed.returncode}"
+    return elapsed, None
+
+
+def run_warm(socket_path):
+    """向常驻进程提交示例文档，返回往返耗时（秒）"""
+    sys.path.insert(0, ROOT)
+    from services.warm_server import send_request
+
+    start = time.perf_counter()
+    try:
+        response = send_request({"text": SAMPLE_TEXT, "document_id": "startup_benchmark", "force": True},
+                                socket_path, timeout=300)
+    except OSError as e:
+        return None, str(e)
+    elapsed = time.perf_counter() - start
+    if not response.get("ok"):
+        return None, response.get("error")
+    return elapsed, None
+
+
+def measure(repeat, socket_path=None):
+    """
+    测量各场景的耗时
+
+    Returns:
+        场景名称 -> {"min", "median", "runs"} 或 {"error"}
+    """
+    scenarios = {name: (lambda code=code: run_scenario(code)) for name, code in SCENARIOS.items()}
+    if socket_path:
+        scenarios["warm_document"] = lambda: run_warm(socket_path)
+
+    results = {}
+    for name, run in scenarios.items():
+        runs = []
+        for _ in range(repeat):
+            elapsed, error = run()
+            if error is not None:
+                results[name] = {"error": error}
+                break
+            runs.append(elapsed)
+        else:
+            results[name] = {
+                "min": round(min(runs), 4),
+                "median": round(statistics.median(runs), 4),
+                "runs": [round(elapsed, 4) for elapsed in runs]
+            }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基准比较中位数
+
+    Returns:
+        退化的场景列表
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name, {})
+        if "median" not in result or "median" not in previous:
+            continue
+        if result["median"] > previous["median"] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件提取启动耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的重复次数")
+    parser.add_argument("--socket", default=None, help="常驻进程的本地套接字路径，指定时测量常驻进程的往返耗时")
+    parser.add_argument("--json", default=None, help="将结果写入JSON文件，可作为之后的基准")
+    parser.add_argument("--baseline", default=None, help="基准结果JSON文件")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的中位数相对增幅")
+    args = parser.parse_args()
+
+    results = measure(args.repeat, args.socket)
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:16s} 失败: {result['error']}")
+        else:
+            print(f"{name:16s} 中位数 {result['median'] * 1000:8.1f} ms   最小 {result['min'] * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"启动耗时退化（超过基准 {args.tolerance:.0%}）: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,126 @@
 import os
 import sys
 import logging
+import argparse
 from services.event_extractor import EventExtractor
-
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/main.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from services.document_sources import is_multi_document_source
+from services.pipeline_tiers import PIPELINE_TIERS
+from services.analysis_logger import set_analysis_log_verbosity, VERBOSITY_LEVELS
+from services.log_config import configure_logging
+from services.warm_server import WarmServer, send_request
 
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="舆情事件提取系统")
+    parser.add_argument("inputs", nargs="*", default=["test/test.txt"],
+                        help="输入文本文件、CSV/JSONL文件或MediaCrawler数据目录，可指定多个")
+    parser.add_argument("--document-id", default=None,
+                        help="单文件模式下的文档ID，默认使用文件名")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="批量模式的工作进程数，默认为1")
+    parser.add_argument("--force", action="store_true",
+                        help="忽略增量处理清单，重新处理未变化的文档")
+    parser.add_argument("--dedup-threshold", type=float, default=0,
+                        help="批量模式下视为近似重复的最小相似度（如0.95），近似重复文档复用代表文档的结果；"
+                             "默认为0，不去重")
+    parser.add_argument("--cluster-incidents", action="store_true",
+                        help="批量模式下将各文档的事件跨文档聚类，结果保存到output/incidents.json")
+    parser.add_argument("--pack", type=int, default=1,
+                        help="批量模式下每个LLM请求最多打包的短文档数，默认为1（不打包）")
+    parser.add_argument("--tier", choices=PIPELINE_TIERS, default="full",
+                        help="流水线档位：rule只使用规则和SpaCy，adaptive只对有歧义或高风险的文档调用LLM，"
+                             "full每个阶段都调用LLM，默认为full")
+    parser.add_argument("--no-checkpoints", action="store_true",
+                        help="不保存和复用各阶段的中间输出检查点")
+    parser.add_argument("--warm", action="store_true",
+                        help="以常驻进程模式运行：预先加载模型，通过本地套接字接收文档")
+    parser.add_argument("--connect", action="store_true",
+                        help="将输入交给已启动的常驻进程处理，常驻进程不可用时在本进程中处理")
+    parser.add_argument("--socket", default=None,
+                        help="常驻进程的本地套接字路径，默认为cache/event_extractor.sock")
+    parser.add_argument("--analysis-log", choices=VERBOSITY_LEVELS, default=None,
+                        help="分析日志详细程度，默认读取环境变量PUBLICMONITOR_ANALYSIS_LOG")
+    return parser.parse_args()
+
+def submit_to_warm_server(args):
+    """
+    将输入交给常驻进程处理
+    
+    Returns:
+        是否由常驻进程处理完成，常驻进程不可用时返回False
+    """
+    for path in args.inputs:
+        request = {"path": os.path.abspath(path), "force": args.force}
+        if args.document_id and len(args.inputs) == 1:
+            request["document_id"] = args.document_id
+        try:
+            response = send_request(request, args.socket)
+        except OSError as e:
+            logger.warning(f"无法连接常驻进程，在本进程中处理: {e}")
+            return False
+        
+        if not response.get("ok"):
+            logger.error(f"常驻进程处理失败: {path}: {response.get('error')}")
+        elif "stats" in response:
+            stats = response["stats"]
+            logger.info(f"常驻进程处理完成: {path}，成功 {stats['succeeded']}/{stats['total']} 个文档")
+        else:
+            logger.info(f"常驻进程成功提取 {len(response['result'].get('events', []))} 个事件，"
+                        f"已保存到: {response['output_file']}")
+    return True
+
 def main():
     """主函数"""
+    args = parse_args()
+    configure_logging("main.log")
+    if args.analysis_log:
+        set_analysis_log_verbosity(args.analysis_log)
 
-    input_file = "test/test.txt"
-    input_id = "123456"
-    
     # 创建输出目录
     output_dir = os.path.join(os.path.dirname(__file__), "output")
     os.makedirs(output_dir, exist_ok=True)
-    
+
     # 创建日志目录
     log_dir = os.path.join(os.path.dirname(__file__), "logs")
     os.makedirs(log_dir, exist_ok=True)
-    
+
     logger.info("舆情事件提取系统启动")
-    logger.info(f"输入文件: {input_file}")
     
-    # 初始化事件提取器
-    extractor = EventExtractor()
+    if args.connect and submit_to_warm_server(args):
+        logger.info("舆情事件提取系统结束")
+        return
     
-    # 从文件中提取事件
-    result = extractor.extract_events_from_file(input_file, input_id)
+    # 初始化事件提取器
+    extractor = EventExtractor(use_checkpoints=not args.no_checkpoints, pack_size=args.pack,
+                               tier=args.tier)
     
-    if result:
-        logger.info(f"成功提取 {len(result.get('events', []))} 个事件")
+    if args.warm:
+        # 常驻进程模式，直到收到shutdown请求或被中断
+        WarmServer(extractor, args.socket).serve_forever()
+        logger.info("舆情事件提取系统结束")
+        return
+
+    logger.info(f"输入文件: {', '.join(args.inputs)}")
+    if len(args.inputs) == 1 and args.workers == 1 and not is_multi_document_source(args.inputs[0]):
+        # 从文件中提取事件
+        result = extractor.extract_events_from_file(args.inputs[0], args.document_id, force=args.force)
+
+        if result:
+            logger.info(f"成功提取 {len(result.get('events', []))} 个事件")
+        else:
+            logger.error("事件提取失败")
     else:
-        logger.error("事件提取失败")
-    
+        # 批量从语料中提取事件
+        stats = extractor.extract_events_from_corpus(args.inputs, max_workers=args.workers,
+                                                     output_dir=output_dir, force=args.force,
+                                                     dedup_threshold=args.dedup_threshold or None,
+                                                     cluster_incidents=args.cluster_incidents)
+        logger.info(f"批量处理完成，成功 {stats['succeeded']}/{stats['total']} 个文档，"
+                    f"未变化跳过 {stats['skipped']} 个，近似重复 {stats['duplicates']} 个")
+
     logger.info("舆情事件提取系统结束")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,229 @@
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# 分析日志详细程度：off 不记录，summary 只记录标量字段，full 记录完整内容
+VERBOSITY_LEVELS = ("off", "summary", "full")
+
+# 摘要模式下字符串字段保留的最大长度
+SUMMARY_MAX_STRING = 200
+
+# 队列中要求关闭分段文件的标记
+_FLUSH = object()
+
+class AnalysisLogWriter:
+    """后台分析日志写入器，由队列驱动，按类别写入压缩的追加式JSONL分段文件"""
+
+    def __init__(self, log_dir: str = None, verbosity: str = "full",
+                 segment_max_bytes: int = 64 * 1024 * 1024, queue_size: int = 10000,
+                 idle_close_seconds: float = 5.0):
+        """
+        初始化分析日志写入器
+
+        Args:
+            log_dir: 日志根目录，默认为项目根目录下的logs/analysis
+            verbosity: 详细程度，off / summary / full
+            segment_max_bytes: 单个分段文件的最大字节数，超出后切换到新分段
+            queue_size: 待写入队列的最大长度，队列满时写入方阻塞等待
+            idle_close_seconds: 没有新日志多少秒后关闭压缩流，使分段文件可以被完整读取
+        """
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"未知的分析日志详细程度: {verbosity}")
+        if log_dir is None:
+            log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "analysis")
+
+        self.log_dir = log_dir
+        self.verbosity = verbosity
+        self.segment_max_bytes = segment_max_bytes
+        self.idle_close_seconds = idle_close_seconds
+        self.pid = os.getpid()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._segments = {}
+        self._segment_seq = 0
+        self._thread = None
+        if verbosity != "off":
+            self._thread = threading.Thread(target=self._run, name="analysis-log-writer", daemon=True)
+            self._thread.start()
+
+    def log(self, category: str, record: Dict[str, Any]):
+        """
+        提交一条分析日志，由后台线程写入
+
+        Args:
+            category: 日志类别，对应logs/analysis下的子目录
+            record: 日志内容
+        """
+        if self.verbosity == "off":
+            return
+        if self.verbosity == "summary":
+            record = summarize_record(record)
+
+        record = dict(record)
+        record.setdefault("timestamp", time.time())
+        record["pid"] = self.pid
+
+        # 在调用方线程中序列化，记录中的列表和字典之后被修改也不影响日志内容
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        self._queue.put((category, line))
+
+    def flush(self):
+        """等待队列中的日志全部写入并关闭压缩流"""
+        if self._thread is not None:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self):
+        """写完剩余日志并关闭所有分段文件"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """后台写入循环"""
+        while True:
+            # 空闲超过idle_close_seconds时关闭压缩流，每次关闭都会写出一个完整的gzip成员，
+            # 下次写入以追加方式重新打开；连续写入的日志留在同一个gzip成员中，保持压缩率
+            timeout = self.idle_close_seconds if self._has_open_files() else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._close_files()
+                continue
+
+            try:
+                if item is None:
+                    self._close_files()
+                    return
+                if item is _FLUSH:
+                    self._close_files()
+                    continue
+
+                category, line = item
+                self._write(category, line)
+            except Exception as e:
+                logger.error(f"写入分析日志失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _has_open_files(self):
+        """是否有打开的分段文件"""
+        return any(segment["file"] is not None for segment in self._segments.values())
+
+    def _close_files(self):
+        """关闭所有已打开的分段文件"""
+        for segment in self._segments.values():
+            if segment["file"] is not None:
+                segment["file"].close()
+                segment["file"] = None
+
+    def _write(self, category, line):
+        """将一行记录追加到类别的当前分段"""
+        segment = self._segments.get(category)
+        if segment is None or self._segment_size(segment) >= self.segment_max_bytes:
+            if segment is not None and segment["file"] is not None:
+                segment["file"].close()
+            segment = self._new_segment(category)
+            self._segments[category] = segment
+
+        if segment["file"] is None:
+            segment["file"] = gzip.open(segment["path"], "ab")
+
+        segment["file"].write(line.encode("utf-8"))
+
+    @staticmethod
+    def _segment_size(segment):
+        """分段文件当前的压缩后大小"""
+        if segment["file"] is not None:
+            # 以追加方式打开的文件位置从已有内容的末尾开始，已包含之前写入的字节
+            return segment["file"].fileobj.tell()
+        return os.path.getsize(segment["path"]) if os.path.exists(segment["path"]) else 0
+
+    def _new_segment(self, category):
+        """创建新的分段，文件名包含进程ID和序号，避免并发写入互相覆盖"""
+        category_dir = os.path.join(self.log_dir, category)
+        os.makedirs(category_dir, exist_ok=True)
+
+        self._segment_seq += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.pid}-{self._segment_seq}.jsonl.gz"
+        path = os.path.join(category_dir, name)
+        logger.info(f"分析日志分段已创建: {path}")
+        return {"path": path, "file": None}
+
+
+def summarize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    生成摘要记录：保留标量字段，截断长字符串，列表和字典只记录长度
+
+    Args:
+        record: 完整日志内容
+
+    Returns:
+        摘要日志内容
+    """
+    summary = {}
+    for key, value in record.items():
+        if isinstance(value, (list, tuple, dict)):
+            summary[f"{key}_size"] = len(value)
+        elif isinstance(value, str) and len(value) > SUMMARY_MAX_STRING:
+            summary[key] = value[:SUMMARY_MAX_STRING] + "..."
+        else:
+            summary[key] = value
+    return summary
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_analysis_logger() -> AnalysisLogWriter:
+    """
+    获取进程内共享的分析日志写入器
+
+    详细程度由环境变量 PUBLICMONITOR_ANALYSIS_LOG 控制（off / summary / full，默认full）。
+    进程fork后会为子进程重新创建写入器。
+
+    Returns:
+        AnalysisLogWriter
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            verbosity = os.environ.get("PUBLICMONITOR_ANALYSIS_LOG", "full").lower()
+            if verbosity not in VERBOSITY_LEVELS:
+                logger.warning(f"未知的分析日志详细程度 {verbosity}，使用full")
+                verbosity = "full"
+            _writer = AnalysisLogWriter(verbosity=verbosity)
+        return _writer
+
+
+def set_analysis_log_verbosity(verbosity: str):
+    """
+    重新设置分析日志的详细程度，之后创建的子进程同样生效
+
+    Args:
+        verbosity: off / summary / full
+    """
+    global _writer
+    os.environ["PUBLICMONITOR_ANALYSIS_LOG"] = verbosity
+    with _writer_lock:
+        if _writer is not None and _writer.pid == os.getpid():
+            _writer.close()
+        _writer = AnalysisLogWriter(verbosity=verbosity)
+
+
+@atexit.register
+def _close_analysis_logger():
+    """进程退出前写完剩余的分析日志"""
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.close()
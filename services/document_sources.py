@@ -0,0 +1,227 @@
+import os
+import csv
+import sys
+import json
+import logging
+from typing import Iterator, Tuple, Dict, Any, Sequence
+
+logger = logging.getLogger(__name__)
+
+# (document_id, text, metadata)
+Document = Tuple[str, str, Dict[str, Any]]
+
+# 舆情监控导出CSV的默认文本列
+MONITOR_TEXT_COLUMNS = ("事件描述", "详细描述")
+
+# MediaCrawler存储记录中的ID字段和文本字段（按优先级排列）
+MEDIACRAWLER_ID_FIELDS = ("comment_id", "note_id", "aweme_id", "video_id", "content_id")
+MEDIACRAWLER_TEXT_FIELDS = ("title", "desc", "content", "content_text")
+
+# 单个JSON数组元素读取时每次读入的字符数
+JSON_READ_SIZE = 64 * 1024
+
+# 允许超长的CSV字段（长帖子、长评论）
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def iter_text_file(path: str) -> Iterator[Document]:
+    """读取单个文本文件作为一个文档"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    yield os.path.basename(path), text, {"source": path}
+
+
+def iter_csv_documents(path: str, id_column: str = "id",
+                       text_columns: Sequence[str] = MONITOR_TEXT_COLUMNS,
+                       encoding: str = "utf-8-sig") -> Iterator[Document]:
+    """
+    逐行读取CSV文件，每行作为一个文档
+
+    Args:
+        path: CSV文件路径
+        id_column: 文档ID列，不存在或为空时使用 文件名_行号
+        text_columns: 拼接为文档文本的列
+        encoding: 文件编码，默认兼容带BOM的UTF-8
+
+    Returns:
+        (document_id, text, metadata) 生成器，metadata包含其余各列
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            text = "\n".join(row[c].strip() for c in text_columns if row.get(c) and row[c].strip())
+            if not text:
+                continue
+            document_id = row.get(id_column) or f"{name}_{line_number}"
+            metadata = {k: v for k, v in row.items() if k not in text_columns and k is not None}
+            metadata["source"] = path
+            yield document_id, text, metadata
+
+
+def iter_jsonl_documents(path: str, id_field: str = "id",
+                         text_fields: Sequence[str] = ("text", "content")) -> Iterator[Document]:
+    """
+    逐行读取JSONL文件，每行一个JSON对象作为一个文档
+
+    Args:
+        path: JSONL文件路径
+        id_field: 文档ID字段，不存在时使用 文件名_行号
+        text_fields: 拼接为文档文本的字段
+
+    Returns:
+        (document_id, text, metadata) 生成器
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"跳过无法解析的JSONL行 {path}:{line_number}: {e}")
+                continue
+            text = _join_fields(record, text_fields)
+            if not text:
+                continue
+            document_id = str(record.get(id_field) or f"{name}_{line_number}")
+            metadata = {k: v for k, v in record.items() if k not in text_fields}
+            metadata["source"] = path
+            yield document_id, text, metadata
+
+
+def iter_json_array(path: str) -> Iterator[Any]:
+    """
+    增量读取JSON数组文件中的元素，内存占用只与单个元素大小相关
+
+    Args:
+        path: 内容为JSON数组的文件路径
+
+    Returns:
+        数组元素生成器
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(JSON_READ_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"文件不是JSON数组: {path}")
+        buffer = buffer[1:]
+        eof = False
+
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+                # 元素恰好结束在缓冲区末尾时可能被截断（如数字），先读入更多内容
+                complete = eof or end < len(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    if buffer.strip():
+                        raise
+                    return
+                complete = False
+            if not complete:
+                chunk = f.read(JSON_READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def iter_mediacrawler_documents(data_dir: str) -> Iterator[Document]:
+    """
+    读取MediaCrawler的存储目录（json或csv存储方式）
+
+    目录结构为 data/{platform}/json/*.json 与 data/{platform}/*.csv，
+    文件名形如 {crawler_type}_{contents|comments|creator}_{date}，creator文件不含正文，会被跳过。
+
+    Args:
+        data_dir: MediaCrawler的data目录或某个平台的子目录
+
+    Returns:
+        (document_id, text, metadata) 生成器
+    """
+    for root, _, files in os.walk(data_dir):
+        for file_name in sorted(files):
+            if "_creator_" in file_name or not file_name.endswith((".json", ".csv")):
+                continue
+            path = os.path.join(root, file_name)
+            platform = _mediacrawler_platform(data_dir, root)
+            store_type = "comments" if "_comments_" in file_name else "contents"
+
+            if file_name.endswith(".json"):
+                records = iter_json_array(path)
+            else:
+                records = _iter_csv_records(path)
+
+            for record in records:
+                text = _join_fields(record, MEDIACRAWLER_TEXT_FIELDS)
+                if not text:
+                    continue
+                record_id = next((record[f] for f in MEDIACRAWLER_ID_FIELDS if record.get(f)), None)
+                if record_id is None:
+                    continue
+                metadata = {k: v for k, v in record.items() if k not in MEDIACRAWLER_TEXT_FIELDS}
+                metadata.update({"source": path, "platform": platform, "store_type": store_type})
+                yield f"{platform}_{store_type}_{record_id}", text, metadata
+
+
+def is_multi_document_source(path: str) -> bool:
+    """路径是否为包含多个文档的数据源（目录、CSV或JSONL）"""
+    return os.path.isdir(path) or path.endswith((".csv", ".jsonl"))
+
+
+def iter_documents(path: str) -> Iterator[Document]:
+    """
+    根据路径类型选择文档源
+
+    - 目录：MediaCrawler存储目录
+    - .csv：舆情监控导出CSV
+    - .jsonl：每行一个JSON对象
+    - 其他：单个文本文件
+
+    Args:
+        path: 文件或目录路径
+
+    Returns:
+        (document_id, text, metadata) 生成器
+    """
+    if os.path.isdir(path):
+        return iter_mediacrawler_documents(path)
+    if path.endswith(".csv"):
+        return iter_csv_documents(path)
+    if path.endswith(".jsonl"):
+        return iter_jsonl_documents(path)
+    return iter_text_file(path)
+
+
+def _iter_csv_records(path):
+    """逐行读取CSV记录"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def _join_fields(record, fields):
+    """拼接记录中的非空文本字段，跳过与已有内容重复的字段"""
+    parts = []
+    for field in fields:
+        value = record.get(field)
+        if not isinstance(value, str):
+            continue
+        value = value.strip()
+        if value and not any(value in part for part in parts):
+            # 标题常常是正文的截断，保留更完整的一段
+            parts = [part for part in parts if part not in value]
+            parts.append(value)
+    return "\n".join(parts)
+
+
+def _mediacrawler_platform(data_dir, root):
+    """从存储路径中解析平台名称"""
+    relative = os.path.relpath(root, data_dir)
+    parts = [p for p in relative.split(os.sep) if p not in (".", "json", "csv")]
+    return parts[0] if parts else os.path.basename(os.path.normpath(data_dir))
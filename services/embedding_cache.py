@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+
+from services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache(SQLiteStore):
+    """
+    嵌入向量磁盘缓存
+
+    每个模型的向量按行追加写入一个float32文件，读取时通过内存映射访问；
+    文本哈希到行号的索引保存在SQLite中。
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS models (
+            model TEXT PRIMARY KEY,
+            dim INTEGER NOT NULL,
+            rows INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS vectors (
+            model TEXT NOT NULL,
+            key TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            PRIMARY KEY (model, key)
+        )
+        """
+    )
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化嵌入向量缓存
+
+        Args:
+            cache_dir: 缓存目录，默认为项目根目录下的cache/embeddings
+        """
+        if cache_dir is None:
+            cache_dir = self.default_path("embeddings")
+        super().__init__(os.path.join(cache_dir, "index.sqlite"))
+
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+        # 模型 -> (内存映射, 映射的行数)
+        self._maps = {}
+        logger.info(f"嵌入向量缓存已就绪: {cache_dir}")
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """
+        计算文本的缓存键
+
+        Args:
+            text: 文本
+
+        Returns:
+            SHA-256十六进制摘要
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _vector_file(self, model):
+        """模型的向量文件路径"""
+        safe_name = re.sub(r"[^0-9A-Za-z_.-]", "_", model)
+        return os.path.join(self.cache_dir, f"{safe_name}.f32")
+
+    def _model_info(self, model):
+        """读取模型的 (维度, 行数)，未缓存过时返回None"""
+        return self._conn.execute("SELECT dim, rows FROM models WHERE model = ?", (model,)).fetchone()
+
+    def _memmap(self, model, dim, rows):
+        """获取覆盖至少rows行的只读内存映射，文件增长后重新映射"""
+        mapped = self._maps.get(model)
+        if mapped is None or mapped[1] < rows:
+            array = np.memmap(self._vector_file(model), dtype=np.float32, mode="r", shape=(rows, dim))
+            mapped = (array, rows)
+            self._maps[model] = mapped
+        return mapped[0]
+
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        批量读取缓存的向量
+
+        Args:
+            model: 嵌入模型
+            keys: 缓存键列表
+
+        Returns:
+            缓存键 -> 向量（命中的部分）
+        """
+        if not keys:
+            return {}
+        with self._lock:
+            info = self._model_info(model)
+            if info is None:
+                self.misses += len(keys)
+                return {}
+            dim, rows = info
+
+            found = {}
+            # SQLite单条语句的参数个数有上限，分批查询
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT key, row FROM vectors WHERE model = ? AND key IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall())
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if not found:
+                return {}
+            array = self._memmap(model, dim, rows)
+            return {key: np.array(array[row]) for key, row in found.items()}
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        """
+        追加写入向量
+
+        Args:
+            model: 嵌入模型
+            vectors: 缓存键 -> 向量
+        """
+        if not vectors:
+            return
+        keys = list(vectors)
+        matrix = np.asarray([vectors[key] for key in keys], dtype=np.float32)
+
+        with self._lock:
+            info = self._model_info(model)
+            if info is None:
+                dim, rows = matrix.shape[1], 0
+            else:
+                dim, rows = info
+                if matrix.shape[1] != dim:
+                    logger.error(f"嵌入维度 {matrix.shape[1]} 与缓存中的维度 {dim} 不一致，跳过写入")
+                    return
+
+            # 先追加向量再更新索引，中途失败时索引不会指向不存在的行
+            with open(self._vector_file(model), "ab") as f:
+                f.seek(rows * dim * 4)
+                f.truncate()
+                f.write(matrix.tobytes())
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (model, key, row) VALUES (?, ?, ?)",
+                [(model, key, rows + i) for i, key in enumerate(keys)]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO models (model, dim, rows) VALUES (?, ?, ?)",
+                (model, dim, rows + len(keys))
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """获取缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
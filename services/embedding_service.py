@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import List
+
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# 默认嵌入模型
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+class EmbeddingService:
+    """
+    批量嵌入服务，建立在LLMService.get_embeddings之上
+
+    输入先去重并查询磁盘缓存，未命中的文本按接口允许的批大小切分后并发请求，
+    并发数由LLMService的信号量限制。
+    """
+
+    def __init__(self, llm_service, model: str = None, batch_size: int = None, cache_dir: str = None):
+        """
+        初始化嵌入服务
+
+        Args:
+            llm_service: LLM服务
+            model: 嵌入模型，默认读取配置中的embedding_model
+            batch_size: 单次请求的最大文本数，默认读取配置中的embedding_batch_size
+            cache_dir: 缓存目录，默认读取配置中的embedding_cache_dir
+        """
+        config = llm_service.config
+        self.llm_service = llm_service
+        self.model = model or config.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+        self.batch_size = batch_size or config.get("embedding_batch_size", 256)
+
+        self.cache = None
+        if config.get("cache_enabled", True):
+            try:
+                self.cache = EmbeddingCache(cache_dir or config.get("embedding_cache_dir"))
+            except Exception as e:
+                logger.error(f"初始化嵌入向量缓存失败: {e}")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        获取文本嵌入（同步接口）
+
+        内部启动新的事件循环执行aembed，只能在没有运行中事件循环的线程中调用，
+        协程中（如aquery调用链）请直接await aembed。
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            float32矩阵，每行对应一个输入文本；获取失败的文本为全零行
+
+        Raises:
+            RuntimeError: 在运行中的事件循环内调用
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed(texts))
+        raise RuntimeError("EmbeddingService.embed不能在运行中的事件循环内调用，请改用 await aembed(texts)")
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        获取文本嵌入
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            float32矩阵，每行对应一个输入文本；获取失败的文本为全零行
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # 相同文本只请求一次
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = {}
+        keys = {}
+        if self.cache is not None:
+            keys = {text: EmbeddingCache.make_key(text) for text in unique_texts}
+            cached = self.cache.get_many(self.model, list(keys.values()))
+            vectors = {text: cached[keys[text]] for text in unique_texts if keys[text] in cached}
+
+        missing = [text for text in unique_texts if text not in vectors]
+        if missing:
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            results = await asyncio.gather(*[
+                self.llm_service.get_embeddings(batch, self.model) for batch in batches
+            ])
+
+            fetched = {}
+            for batch, embeddings in zip(batches, results):
+                if len(embeddings) != len(batch):
+                    logger.error(f"获取嵌入失败，{len(batch)} 个文本没有向量")
+                    continue
+                for text, embedding in zip(batch, embeddings):
+                    fetched[text] = np.asarray(embedding, dtype=np.float32)
+            vectors.update(fetched)
+
+            if self.cache is not None and fetched:
+                self.cache.put_many(self.model, {keys[text]: vector for text, vector in fetched.items()})
+
+        logger.info(f"获取嵌入: {len(texts)} 个文本，去重后 {len(unique_texts)} 个，"
+                    f"缓存命中 {len(unique_texts) - len(missing)} 个")
+
+        if not vectors:
+            return np.zeros((len(texts), 0), dtype=np.float32)
+        dim = next(iter(vectors.values())).shape[0]
+        matrix = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vector = vectors.get(text)
+            if vector is not None:
+                matrix[i] = vector
+        return matrix
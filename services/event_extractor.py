@@ -1,85 +1,231 @@
 import os
+import copy
 import json
 import logging
 import uuid
 import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from typing import Dict, List, Any
 
 from services.llm_service import LLMService
 from services.text_processor import TextProcessor
+from services.prompt_builder import PromptBuilder
+from services.analysis_logger import get_analysis_logger
+from services.document_sources import iter_documents, is_multi_document_source
+from services.output_manifest import OutputManifest
+from services.stage_checkpoints import StageCheckpointStore
+from services.pipeline_tiers import TierGate, PIPELINE_TIERS
+from services.response_parser import parse_response, repair_json, validate_response, ResponseParseError
+from services.text_chunker import (TextChunker, shift_entities, shift_triggers,
+                                   entities_in_chunk, triggers_in_chunk)
 from algorithms.ner_extractor import NERExtractor
 from algorithms.event_trigger import EventTriggerExtractor
 from algorithms.srl_extractor import SRLExtractor
 from algorithms.relation_extractor import RelationExtractor
+from algorithms.nlp_models import DocumentAnalysis, analyze_texts
+from algorithms.near_duplicate import NearDuplicateIndex
+from services.log_config import configure_logging
 
 logger = logging.getLogger(__name__)
 
+# 流水线版本，提取逻辑变化导致输出不同时递增，使已处理的文档在下次运行时重新处理
+PIPELINE_VERSION = "1"
+
+# 流水线的检查点阶段及其提示词模板，按执行顺序排列
+PIPELINE_STAGES = {
+    "extraction": "entity_extraction",
+    "construction": "event_construction",
+    "integration": "event_integration"
+}
+
+# 各LLM阶段使用的提示词模板
+PROMPT_NAMES = tuple(PIPELINE_STAGES.values())
+
+# 各LLM阶段的系统消息
+SYSTEM_PROMPTS = {
+    "extraction": "You are an expert in entity and event trigger extraction.",
+    "construction": "You are an expert in event analysis and construction.",
+    "integration": "You are an expert in event integration and quality control."
+}
+
+# 响应截断时请求模型继续输出
+CONTINUATION_PROMPT = "你上一次的回复在中途被截断了。请从截断处开始继续输出剩余的JSON，不要重复已经输出的内容，不要添加任何说明。"
+
+# 响应不是有效JSON时请求模型修正
+CORRECTION_PROMPT = "你上一次的回复不是符合要求的JSON（{error}）。请按原要求的格式重新返回完整、有效的JSON，不要添加任何说明。"
+
 class EventExtractor:
     """事件提取服务，负责从文本中提取事件结构"""
     
-    def __init__(self):
-        """初始化事件提取器"""
+    def __init__(self, chunk_size=6000, chunk_overlap=1, token_budgets=None, manifest_path=None,
+                 checkpoint_path=None, use_checkpoints=True, pack_size=1, pack_max_chars=4000,
+                 pack_text_chars=1000, tier="full"):
+        """
+        初始化事件提取器
+        
+        Args:
+            chunk_size: LLM阶段单个文本块的最大字符数，超出时按句子切分并行处理
+            chunk_overlap: 相邻文本块之间重叠的句子数
+            token_budgets: 各阶段提示词的token预算，如 {"event_construction": 8000}
+            manifest_path: 增量处理清单路径，默认为项目根目录下的cache/manifest.sqlite
+            checkpoint_path: 阶段检查点路径，默认为项目根目录下的cache/checkpoints.sqlite
+            use_checkpoints: 是否保存各阶段的中间输出，中断或只修改部分提示词后从已完成的阶段继续
+            pack_size: 批量提取时每个LLM请求最多打包的短文档数，为1时不打包
+            pack_max_chars: 一个打包请求中各文档文本的最大总字符数
+            pack_text_chars: 可以打包的文档的最大字符数，更长的文档单独请求
+            tier: 流水线档位，rule只使用规则和SpaCy，adaptive只对有歧义或高风险的文档调用LLM，
+                full每个阶段都调用LLM
+        """
         self.llm_service = LLMService()
         self.text_processor = TextProcessor()
+        self.text_chunker = TextChunker(chunk_size, chunk_overlap)
+        self.prompt_builder = PromptBuilder(token_budgets)
+        # 最近一次合并各阶段的计数和耗时
+        self.merge_stats = {}
         self.ner_extractor = NERExtractor()
         self.trigger_extractor = EventTriggerExtractor()
         self.srl_extractor = SRLExtractor()
         self.relation_extractor = RelationExtractor()
+        # 增量处理清单只在写出结果的进程中使用，首次访问时打开
+        self.manifest_path = manifest_path
+        self._manifest = None
+        self._prompt_hash = None
+        self.checkpoint_path = checkpoint_path
+        self.use_checkpoints = use_checkpoints
+        self._checkpoints = None
+        self._stage_hashes = {}
+        # LLM响应解析或合并失败的次数，阶段执行期间有失败时不保存检查点
+        self.llm_failures = 0
+        self.pack_size = pack_size
+        self.pack_max_chars = pack_max_chars
+        self.pack_text_chars = pack_text_chars
+        if tier not in PIPELINE_TIERS:
+            logger.warning(f"未知的流水线档位 {tier}，使用full")
+            tier = "full"
+        self.tier = tier
+        self.tier_gate = TierGate()
+        # 工作进程中按相同配置创建事件提取器
+        self.worker_settings = {
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "token_budgets": token_budgets,
+            "checkpoint_path": checkpoint_path,
+            "use_checkpoints": use_checkpoints,
+            "pack_size": pack_size,
+            "pack_max_chars": pack_max_chars,
+            "pack_text_chars": pack_text_chars,
+            "tier": tier
+        }
         self.setup_logging()
     
     def setup_logging(self):
         """设置日志"""
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 配置日志格式
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(os.path.join(log_dir, "event_extractor.log"), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging("event_extractor.log")
     
-    def extract_entities_and_triggers(self, text):
+    def extract_entities_and_triggers(self, text, analysis=None, packed_result=None):
         """
         使用传统NLP方法提取实体和事件触发词
         
         Args:
             text: 预处理后的文本
+            analysis: 文档分析对象，为None时基于text创建
+            packed_result: 打包请求中本文档的LLM结果，提供时不再单独请求
             
         Returns:
             实体和触发词信息
         """
+        result = self._extract_traditional(text, analysis)
+        if not self._use_llm("extraction", lambda: self.tier_gate.extraction_reason(
+                text, result["entities"], result["event_triggers"])):
+            return result
+        
+        # 使用LLM补充和优化提取结果
+        enhanced_result = self.enhance_extraction_with_llm(text, result, packed_result)
+        
+        return enhanced_result
+    
+    def _extract_traditional(self, text, analysis=None):
+        """使用NER和触发词提取器提取实体和事件触发词（不调用LLM）"""
         logger.info("开始使用传统NLP方法提取实体和事件触发词")
         
+        if analysis is None:
+            analysis = DocumentAnalysis(text)
+        
         # 使用NER提取实体
-        entities = self.ner_extractor.extract_entities(text)
+        entities = self.ner_extractor.extract_entities(analysis)
         
         # 使用触发词提取器提取事件触发词
-        triggers = self.trigger_extractor.extract_triggers(text)
+        triggers = self.trigger_extractor.extract_triggers(analysis)
         
-        # 整合结果
-        result = {
+        logger.info(f"传统方法成功提取 {len(entities)} 个实体和 {len(triggers)} 个事件触发词")
+        return {
             "entities": entities,
             "event_triggers": triggers
         }
+    
+    def _use_llm(self, stage, reason):
+        """
+        按流水线档位决定阶段是否调用LLM
         
-        logger.info(f"传统方法成功提取 {len(entities)} 个实体和 {len(triggers)} 个事件触发词")
+        Args:
+            stage: 阶段名称
+            reason: 无参函数，返回adaptive档位下需要LLM的原因，不需要时返回None
+            
+        Returns:
+            是否调用LLM
+        """
+        if self.tier == "full":
+            return True
+        if self.tier == "rule":
+            return False
+        why = reason()
+        if why is None:
+            logger.info(f"阶段 {stage} 的传统方法结果已足够，跳过LLM")
+            return False
+        logger.info(f"阶段 {stage} 调用LLM: {why}")
+        return True
+    
+    def extract_traditional_batch(self, texts, batch_size=64, n_process=1):
+        """
+        批量使用传统NLP方法提取实体、触发词和语义角色框架（不调用LLM）
         
-        # 使用LLM补充和优化提取结果
-        enhanced_result = self.enhance_extraction_with_llm(text, result)
+        文本经过预处理后通过nlp.pipe批量解析，每个文档只解析一次。
         
-        return enhanced_result
+        Args:
+            texts: 原始文本可迭代对象
+            batch_size: 每批送入SpaCy管道的文本数
+            n_process: SpaCy并行进程数
+            
+        Returns:
+            与输入顺序一致的结果生成器，每项包含entities、event_triggers和events
+        """
+        logger.info(f"开始批量传统NLP提取，batch_size={batch_size}, n_process={n_process}")
+        
+        processed_texts = (self.text_processor.preprocess_text(text) for text in texts)
+        analyses = analyze_texts(processed_texts, self.ner_extractor.nlp,
+                                 batch_size=batch_size, n_process=n_process)
+        
+        for analysis in analyses:
+            entities = self.ner_extractor.extract_entities(analysis)
+            triggers = self.trigger_extractor.extract_triggers(analysis)
+            events = self.srl_extractor.extract_srl(analysis, triggers, entities)
+            yield {
+                "entities": entities,
+                "event_triggers": triggers,
+                "events": events
+            }
     
-    def enhance_extraction_with_llm(self, text, extraction_result):
+    def enhance_extraction_with_llm(self, text, extraction_result, packed_result=None):
         """
         使用LLM补充和优化传统方法的提取结果
         
+        长文本按句子切分为文本块并行提取，再合并各块结果。
+        
         Args:
             text: 预处理后的文本
             extraction_result: 传统方法提取的结果
+            packed_result: 打包请求中本文档的LLM结果，提供时作为唯一文本块的响应
             
         Returns:
             增强后的提取结果
@@ -89,32 +235,53 @@ class EventExtractor:
         # 记录传统方法结果
         self._log_extraction_comparison("pre_llm", extraction_result)
         
-        # 加载提示词模板
-        prompt_template = self.text_processor.load_prompt("entity_extraction")
+        if packed_result is not None:
+            chunks, responses = self._packed_chunks(text, packed_result)
+            message_batches = [None]
+        else:
+            # 加载提示词模板
+            prompt_template = self.text_processor.load_prompt("entity_extraction")
+            
+            # 每个文本块构建一个请求
+            chunks = self.text_chunker.split(text)
+            message_batches = []
+            for chunk in chunks:
+                prompt = self.prompt_builder.build_extraction_prompt(prompt_template, chunk["text"])
+                message_batches.append([
+                    {"role": "system", "content": SYSTEM_PROMPTS["extraction"]},
+                    {"role": "user", "content": prompt}
+                ])
+            
+            # 并行调用LLM服务
+            responses = self.llm_service.query_many(
+                message_batches,
+                response_format={"type": "json_object"}
+            )
+        
+        # 解析响应，并将位置映射回原文
+        chunk_results = []
+        for chunk, messages, response in zip(chunks, message_batches, responses):
+            try:
+                chunk_result = self._parse_stage_response("extraction", response, messages)
+                chunk_results.append({
+                    "entities": shift_entities(chunk_result.get("entities", []), chunk["start"]),
+                    "event_triggers": shift_triggers(chunk_result.get("event_triggers", []), chunk["start"])
+                })
+            except Exception as e:
+                logger.error(f"解析LLM提取结果失败（文本块 {chunk['chunk_id']}）: {e}")
+                self.llm_failures += 1
+                logger.error(f"原始响应: {response}")
+        
+        if not chunk_results:
+            return extraction_result
         
-        # 使用f-string而不是format方法
-        prompt = f"{prompt_template}".replace("{text}", text)
+        llm_result = chunk_results[0] if len(chunk_results) == 1 else self._merge_chunk_extractions(chunk_results)
+        logger.info(f"LLM成功提取 {len(llm_result.get('entities', []))} 个实体和 {len(llm_result.get('event_triggers', []))} 个事件触发词")
         
-        # 构建消息
-        messages = [
-            {"role": "system", "content": "You are an expert in entity and event trigger extraction."},
-            {"role": "user", "content": prompt}
-        ]
+        # 记录LLM结果
+        self._log_extraction_comparison("llm_only", llm_result)
         
-        # 调用LLM服务
-        response = self.llm_service.query(
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
-        
-        # 解析响应
         try:
-            llm_result = json.loads(response)
-            logger.info(f"LLM成功提取 {len(llm_result.get('entities', []))} 个实体和 {len(llm_result.get('event_triggers', []))} 个事件触发词")
-            
-            # 记录LLM结果
-            self._log_extraction_comparison("llm_only", llm_result)
-            
             # 合并传统方法和LLM的结果
             merged_result = self.merge_extraction_results(extraction_result, llm_result)
             logger.info(f"合并后共有 {len(merged_result.get('entities', []))} 个实体和 {len(merged_result.get('event_triggers', []))} 个事件触发词")
@@ -124,35 +291,61 @@ class EventExtractor:
             
             return merged_result
         except Exception as e:
-            logger.error(f"解析LLM提取结果失败: {e}")
-            logger.error(f"原始响应: {response}")
+            logger.error(f"合并LLM提取结果失败: {e}")
+            self.llm_failures += 1
             return extraction_result
     
-    def _log_extraction_comparison(self, stage, result):
-        """记录不同阶段的提取结果对比"""
-        # 创建日志目录
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                              "logs", "analysis_logs", "llm_enhancement")
-        os.makedirs(log_dir, exist_ok=True)
+    def _merge_chunk_extractions(self, chunk_results):
+        """
+        合并各文本块的LLM提取结果
         
-        # 创建日志文件名（使用时间戳）
-        timestamp = int(time.time())
-        log_file = os.path.join(log_dir, f"{stage}_extraction_{timestamp}.json")
+        实体按文本去重并合并提及，触发词按文本和位置去重；重叠区域的重复项只保留一次。
         
+        Args:
+            chunk_results: 已映射回原文位置的各文本块提取结果
+            
+        Returns:
+            合并后的提取结果
+        """
+        entities = {}
+        mention_keys = {}
+        triggers = {}
+        
+        for chunk_result in chunk_results:
+            for entity in chunk_result.get("entities", []):
+                key = entity.get("text", "").lower()
+                if key not in entities:
+                    entities[key] = dict(entity, entity_id=f"E{len(entities) + 1}", mentions=[])
+                    mention_keys[key] = set()
+                for mention in entity.get("mentions", []):
+                    mention_key = (mention.get("text", ""), str(mention.get("position")))
+                    if mention_key not in mention_keys[key]:
+                        mention_keys[key].add(mention_key)
+                        entities[key]["mentions"].append(mention)
+            
+            for trigger in chunk_result.get("event_triggers", []):
+                key = (trigger.get("text", "").lower(), str(trigger.get("position")))
+                if key not in triggers:
+                    triggers[key] = dict(trigger, trigger_id=f"T{len(triggers) + 1}")
+        
+        logger.info(f"合并 {len(chunk_results)} 个文本块的提取结果: {len(entities)} 个实体, {len(triggers)} 个触发词")
+        return {
+            "entities": list(entities.values()),
+            "event_triggers": list(triggers.values())
+        }
+    
+    def _log_extraction_comparison(self, stage, result):
+        """记录不同阶段的提取结果对比"""
         # 准备日志内容
         log_content = {
-            "timestamp": timestamp,
             "stage": stage,
             "entities_count": len(result.get("entities", [])),
             "triggers_count": len(result.get("event_triggers", [])),
             "result": result
         }
         
-        # 写入日志文件
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(log_content, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"{stage}阶段提取结果已保存至: {log_file}")
+        # 交给后台线程写入，不阻塞提取流程
+        get_analysis_logger().log("llm_enhancement", log_content)
     
     def merge_extraction_results(self, traditional_result, llm_result):
         """
@@ -166,6 +359,7 @@ class EventExtractor:
             合并后的结果
         """
         logger.info("开始合并传统方法和LLM的提取结果")
+        start_time = time.perf_counter()
         
         # 获取传统方法的实体和触发词
         traditional_entities = traditional_result.get("entities", [])
@@ -175,9 +369,9 @@ class EventExtractor:
         llm_entities = llm_result.get("entities", [])
         llm_triggers = llm_result.get("event_triggers", [])
         
-        # 合并实体
+        # 合并实体，已有实体文本放入集合中做常数时间判重
         merged_entities = traditional_entities.copy()
-        entity_texts = [e["text"].lower() for e in merged_entities]
+        entity_texts = {e["text"].lower() for e in merged_entities}
         
         # 添加LLM提取的新实体
         entity_id_counter = len(merged_entities) + 1
@@ -186,12 +380,12 @@ class EventExtractor:
                 # 更新实体ID
                 llm_entity["entity_id"] = f"E{entity_id_counter}"
                 merged_entities.append(llm_entity)
-                entity_texts.append(llm_entity["text"].lower())
+                entity_texts.add(llm_entity["text"].lower())
                 entity_id_counter += 1
         
-        # 合并触发词
+        # 合并触发词，以 (文本, 开始位置, 结束位置) 为键判重
         merged_triggers = traditional_triggers.copy()
-        trigger_texts = [(t["text"].lower(), t["position"][0], t["position"][1]) for t in merged_triggers]
+        trigger_texts = {(t["text"].lower(), t["position"][0], t["position"][1]) for t in merged_triggers}
         
         # 添加LLM提取的新触发词
         trigger_id_counter = len(merged_triggers) + 1
@@ -201,7 +395,7 @@ class EventExtractor:
                 # 更新触发词ID
                 llm_trigger["trigger_id"] = f"T{trigger_id_counter}"
                 merged_triggers.append(llm_trigger)
-                trigger_texts.append(trigger_key)
+                trigger_texts.add(trigger_key)
                 trigger_id_counter += 1
         
         # 返回合并后的结果
@@ -210,9 +404,24 @@ class EventExtractor:
             "event_triggers": merged_triggers
         }
         
+        self._record_merge_stats("extraction", start_time, {
+            "traditional_entities": len(traditional_entities),
+            "llm_entities": len(llm_entities),
+            "added_entities": len(merged_entities) - len(traditional_entities),
+            "traditional_triggers": len(traditional_triggers),
+            "llm_triggers": len(llm_triggers),
+            "added_triggers": len(merged_triggers) - len(traditional_triggers)
+        })
+        
         return merged_result
     
-    def construct_events(self, text, entities, triggers):
+    def _record_merge_stats(self, stage, start_time, counts):
+        """记录合并阶段的计数和耗时，可通过 merge_stats 属性获取"""
+        counts["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 3)
+        self.merge_stats[stage] = counts
+        logger.info(f"{stage}合并统计: {counts}")
+    
+    def construct_events(self, text, entities, triggers, analysis=None, packed_result=None):
         """
         构建事件结构
         
@@ -220,70 +429,115 @@ class EventExtractor:
             text: 预处理后的文本
             entities: 提取的实体信息
             triggers: 提取的触发词信息
+            analysis: 文档分析对象，为None时基于text创建
+            packed_result: 打包请求中本文档的LLM结果，提供时不再单独请求
             
         Returns:
             事件结构
         """
         logger.info("开始构建事件结构")
         
+        if analysis is None:
+            analysis = DocumentAnalysis(text)
+        
         # 使用SRL提取事件基本要素
-        basic_events = self.srl_extractor.extract_srl(text, triggers, entities)
+        basic_events = self.srl_extractor.extract_srl(analysis, triggers, entities)
+        if not self._use_llm("construction", lambda: self.tier_gate.construction_reason(
+                text, basic_events, triggers)):
+            return {"events": basic_events}
         
         # 使用LLM补充和优化事件结构
-        enhanced_events = self.enhance_events_with_llm(text, basic_events, entities, triggers)
+        enhanced_events = self.enhance_events_with_llm(text, basic_events, entities, triggers, packed_result)
         
         return {"events": enhanced_events}
     
-    def enhance_events_with_llm(self, text, basic_events, entities, triggers):
+    def enhance_events_with_llm(self, text, basic_events, entities, triggers, packed_result=None):
         """
         使用LLM补充和优化事件结构
         
+        长文本按句子切分为文本块，每块只携带块内的实体和触发词，并行构建后合并。
+        
         Args:
             text: 预处理后的文本
             basic_events: 基本事件结构
             entities: 提取的实体信息
             triggers: 提取的触发词信息
+            packed_result: 打包请求中本文档的LLM结果，提供时作为唯一文本块的响应
             
         Returns:
             增强后的事件结构
         """
         logger.info("开始使用LLM补充和优化事件结构")
         
-        # 加载提示词模板
-        prompt_template = self.text_processor.load_prompt("event_construction")
-        
-        # 使用安全的替换方法而不是format
-        prompt = prompt_template
-        prompt = prompt.replace("{text}", text)
-        prompt = prompt.replace("{entities}", json.dumps(entities, ensure_ascii=False, indent=2))
-        prompt = prompt.replace("{triggers}", json.dumps(triggers, ensure_ascii=False, indent=2))
-        
-        # 构建消息
-        messages = [
-            {"role": "system", "content": "You are an expert in event analysis and construction."},
-            {"role": "user", "content": prompt}
-        ]
+        if packed_result is not None:
+            chunks, responses = self._packed_chunks(text, packed_result)
+            message_batches = [None]
+        else:
+            # 加载提示词模板
+            prompt_template = self.text_processor.load_prompt("event_construction")
+            
+            chunks = self.text_chunker.split(text)
+            message_batches = []
+            for chunk in chunks:
+                if len(chunks) == 1:
+                    chunk_entities, chunk_triggers = entities, triggers
+                else:
+                    chunk_entities = entities_in_chunk(entities, chunk)
+                    chunk_triggers = triggers_in_chunk(triggers, chunk)
+                
+                # 紧凑序列化实体和触发词，超出token预算时裁剪低价值上下文
+                prompt = self.prompt_builder.build_construction_prompt(
+                    prompt_template, chunk["text"], chunk_entities, chunk_triggers
+                )
+                
+                # 构建消息
+                message_batches.append([
+                    {"role": "system", "content": SYSTEM_PROMPTS["construction"]},
+                    {"role": "user", "content": prompt}
+                ])
+            
+            # 并行调用LLM服务
+            responses = self.llm_service.query_many(
+                message_batches,
+                response_format={"type": "json_object"}
+            )
+        
+        # 解析响应，重叠区域中同一触发词构建的事件只保留一次
+        llm_events = []
+        seen_triggers = set()
+        parsed = False
+        for chunk, messages, response in zip(chunks, message_batches, responses):
+            try:
+                chunk_events = self._parse_stage_response("construction", response, messages)["events"]
+                parsed = True
+            except Exception as e:
+                logger.error(f"解析LLM事件构建结果失败（文本块 {chunk['chunk_id']}）: {e}")
+                self.llm_failures += 1
+                logger.error(f"原始响应: {response}")
+                continue
+            
+            for event in chunk_events:
+                trigger = event.get("trigger") or {}
+                key = trigger.get("trigger_id") or trigger.get("text", "").lower()
+                if len(chunks) > 1 and key in seen_triggers:
+                    continue
+                seen_triggers.add(key)
+                llm_events.append(event)
+        
+        if not parsed:
+            return basic_events
         
-        # 调用LLM服务
-        response = self.llm_service.query(
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
+        logger.info(f"LLM成功构建 {len(llm_events)} 个事件")
         
-        # 解析响应
         try:
-            llm_result = json.loads(response)
-            llm_events = llm_result.get("events", [])
-            logger.info(f"LLM成功构建 {len(llm_events)} 个事件")
-            
             # 合并基本事件和LLM构建的事件
             merged_events = self.merge_events(basic_events, llm_events)
             logger.info(f"合并后共有 {len(merged_events)} 个事件")
             
             return merged_events
         except Exception as e:
-            logger.error(f"解析LLM事件构建结果失败: {e}")
-            logger.error(f"原始响应: {response}")
+            logger.error(f"合并LLM事件构建结果失败: {e}")
+            self.llm_failures += 1
             return basic_events
     
     def merge_events(self, basic_events, llm_events):
@@ -298,45 +552,52 @@ class EventExtractor:
             合并后的事件结构
         """
         logger.info("开始合并基本事件和LLM构建的事件")
+        start_time = time.perf_counter()
         
-        # 创建事件ID到事件的映射
-        basic_event_map = {event["event_id"]: event for event in basic_events}
+        # 创建触发词文本到第一个基本事件的映射，触发词相同认为是同一事件
+        basic_event_by_trigger = {}
+        for event in basic_events:
+            basic_event_by_trigger.setdefault(event["trigger"]["text"].lower(), event)
         
         # 合并事件
         merged_events = basic_events.copy()
+        updated_count = 0
         
         # 添加LLM构建的新事件
         event_id_counter = len(merged_events) + 1
         for llm_event in llm_events:
             # 检查是否有匹配的基本事件
-            matched = False
-            for basic_event in basic_events:
-                # 如果触发词相同，认为是同一事件
-                if (basic_event["trigger"]["text"].lower() == llm_event["trigger"]["text"].lower()):
-                    # 更新基本事件的信息
-                    basic_event_map[basic_event["event_id"]].update({
-                        "summary": llm_event.get("summary", ""),
-                        "type": llm_event.get("type", basic_event["type"]),
-                        "sentiment": llm_event.get("sentiment", {"polarity": "NEUTRAL", "intensity": 0.5}),
-                        "importance": llm_event.get("importance", 3),
-                        "confidence": llm_event.get("confidence", 0.8)
-                    })
-                    
-                    # 补充事件要素
-                    for key in ["why", "how"]:
-                        if key in llm_event["elements"] and llm_event["elements"][key]:
-                            basic_event_map[basic_event["event_id"]]["elements"][key] = llm_event["elements"][key]
-                    
-                    matched = True
-                    break
-            
-            # 如果没有匹配的基本事件，添加为新事件
-            if not matched:
+            basic_event = basic_event_by_trigger.get(llm_event["trigger"]["text"].lower())
+            if basic_event is not None:
+                # 更新基本事件的信息
+                basic_event.update({
+                    "summary": llm_event.get("summary", ""),
+                    "type": llm_event.get("type", basic_event["type"]),
+                    "sentiment": llm_event.get("sentiment", {"polarity": "NEUTRAL", "intensity": 0.5}),
+                    "importance": llm_event.get("importance", 3),
+                    "confidence": llm_event.get("confidence", 0.8)
+                })
+                
+                # 补充事件要素
+                for key in ["why", "how"]:
+                    if key in llm_event["elements"] and llm_event["elements"][key]:
+                        basic_event["elements"][key] = llm_event["elements"][key]
+                
+                updated_count += 1
+            else:
+                # 如果没有匹配的基本事件，添加为新事件
                 # 更新事件ID
                 llm_event["event_id"] = f"EV{event_id_counter}"
                 merged_events.append(llm_event)
                 event_id_counter += 1
         
+        self._record_merge_stats("events", start_time, {
+            "basic_events": len(basic_events),
+            "llm_events": len(llm_events),
+            "updated_events": updated_count,
+            "added_events": len(merged_events) - len(basic_events)
+        })
+        
         return merged_events
     
     def integrate_events(self, text, events, entities, document_id=None):
@@ -356,58 +617,85 @@ class EventExtractor:
         
         # 提取事件关系
         events_with_relations = self.relation_extractor.extract_relations(events)
+        if not self._use_llm("integration", lambda: self.tier_gate.integration_reason(
+                text, events_with_relations)):
+            return {
+                "document_id": document_id,
+                "events": events_with_relations,
+                "entities": entities
+            }
         
         # 使用LLM进行最终整合
         final_result = self.final_integration_with_llm(text, events_with_relations, entities, document_id)
         
         return final_result
     
-    def final_integration_with_llm(self, text, events, entities, document_id):
+    def final_integration_with_llm(self, text, events, entities, document_id, packed_result=None):
         """
         使用LLM进行最终整合
         
+        长文本按句子切分为文本块，每个事件分配给包含其原文片段的文本块，并行整合后合并。
+        
         Args:
             text: 预处理后的文本
             events: 带有关系的事件
             entities: 提取的实体信息
             document_id: 文档ID
+            packed_result: 打包请求中本文档的LLM结果，提供时作为唯一文本块的响应
             
         Returns:
             最终整合的结果
         """
         logger.info("开始使用LLM进行最终整合")
         
-        # 加载提示词模板
-        prompt_template = self.text_processor.load_prompt("event_integration")
-        
-        # 使用安全的替换方法而不是format
-        prompt = prompt_template
-        prompt = prompt.replace("{text}", text)
-        prompt = prompt.replace("{events}", json.dumps(events, ensure_ascii=False, indent=2))
-        prompt = prompt.replace("{entities}", json.dumps(entities, ensure_ascii=False, indent=2))
-        prompt = prompt.replace("{document_id}", str(document_id) if document_id else "")
-        
-        # 构建消息
-        messages = [
-            {"role": "system", "content": "You are an expert in event integration and quality control."},
-            {"role": "user", "content": prompt}
-        ]
-        
-        # 调用LLM服务
-        response = self.llm_service.query(
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
+        if packed_result is not None:
+            chunks, responses = self._packed_chunks(text, packed_result)
+            message_batches = [None]
+            chunk_inputs = [(chunks[0], events, entities)]
+        else:
+            # 加载提示词模板
+            prompt_template = self.text_processor.load_prompt("event_integration")
+            
+            chunks = self.text_chunker.split(text)
+            if len(chunks) == 1:
+                chunk_inputs = [(chunks[0], events, entities)]
+            else:
+                chunk_inputs = [
+                    (chunk, chunk_events, entities_in_chunk(entities, chunk))
+                    for chunk, chunk_events in zip(chunks, self._assign_events_to_chunks(events, chunks))
+                    if chunk_events
+                ]
+            
+            message_batches = []
+            for chunk, chunk_events, chunk_entities in chunk_inputs:
+                # 紧凑序列化事件和实体，超出token预算时裁剪低价值上下文
+                prompt = self.prompt_builder.build_integration_prompt(
+                    prompt_template, chunk["text"], chunk_events, chunk_entities, document_id
+                )
+                
+                # 构建消息
+                message_batches.append([
+                    {"role": "system", "content": SYSTEM_PROMPTS["integration"]},
+                    {"role": "user", "content": prompt}
+                ])
+            
+            # 并行调用LLM服务
+            responses = self.llm_service.query_many(
+                message_batches,
+                response_format={"type": "json_object"}
+            )
         
         # 解析响应
-        try:
-            final_result = json.loads(response)
-            logger.info(f"LLM成功整合 {len(final_result.get('events', []))} 个事件")
-            return final_result
-        except Exception as e:
-            logger.error(f"解析LLM事件整合结果失败: {e}")
-            logger.error(f"原始响应: {response}")
-            
+        chunk_results = []
+        for (chunk, _, _), messages, response in zip(chunk_inputs, message_batches, responses):
+            try:
+                chunk_results.append((chunk, self._parse_stage_response("integration", response, messages)))
+            except Exception as e:
+                logger.error(f"解析LLM事件整合结果失败（文本块 {chunk['chunk_id']}）: {e}")
+                self.llm_failures += 1
+                logger.error(f"原始响应: {response}")
+        
+        if not chunk_results or len(chunk_results) < len(chunk_inputs):
             # 如果LLM整合失败，返回基本整合结果
             basic_result = {
                 "document_id": document_id,
@@ -415,90 +703,555 @@ class EventExtractor:
                 "entities": entities
             }
             return basic_result
+        
+        if len(chunks) == 1:
+            final_result = chunk_results[0][1]
+            # 打包请求中模型看到的是包内ID
+            final_result["document_id"] = document_id
+        else:
+            final_result = self._merge_chunk_integrations(chunk_results, document_id)
+        self._restore_positions(final_result, events, entities)
+        logger.info(f"LLM成功整合 {len(final_result.get('events', []))} 个事件")
+        return final_result
     
-    def extract_events_from_text(self, text, document_id=None):
-        """从文本中提取事件结构的主流程"""
-        logger.info("开始从文本中提取事件结构")
+    @staticmethod
+    def _restore_positions(final_result, events, entities):
+        """
+        从整合的输入中补回触发词位置和实体提及
+        
+        整合提示词不包含位置信息，也不要求模型输出位置。触发词按ID（其次按文本）对应到输入事件的触发词，
+        实体按ID（其次按文本）对应到输入实体；对应不上的触发词去掉模型给出的位置。
+        
+        Args:
+            final_result: 整合结果，原地修改
+            events: 整合输入的事件（位置相对于整个文档）
+            entities: 整合输入的实体
+        """
+        triggers_by_id, triggers_by_text = {}, {}
+        for event in events:
+            trigger = event.get("trigger") or {}
+            if "position" not in trigger:
+                continue
+            if trigger.get("trigger_id"):
+                triggers_by_id.setdefault(trigger["trigger_id"], trigger)
+            triggers_by_text.setdefault(str(trigger.get("text", "")).lower(), trigger)
+        
+        for event in final_result.get("events", []):
+            trigger = event.get("trigger")
+            if not isinstance(trigger, dict):
+                continue
+            source = triggers_by_id.get(trigger.get("trigger_id")) \
+                or triggers_by_text.get(str(trigger.get("text", "")).lower())
+            if source is not None:
+                trigger["position"] = list(source["position"])
+            else:
+                trigger.pop("position", None)
+        
+        entities_by_id = {e["entity_id"]: e for e in entities if e.get("entity_id")}
+        entities_by_text = {}
+        for entity in entities:
+            entities_by_text.setdefault(str(entity.get("text", "")).lower(), entity)
+        
+        for entity in final_result.get("entities", []):
+            source = entities_by_id.get(entity.get("entity_id")) \
+                or entities_by_text.get(str(entity.get("text", "")).lower())
+            if source is not None:
+                entity["mentions"] = copy.deepcopy(source.get("mentions", []))
+    
+    def _assign_events_to_chunks(self, events, chunks):
+        """
+        将事件分配给文本块
         
-        # 创建分析会话ID
-        session_id = str(uuid.uuid4())
-        logger.info(f"分析会话ID: {session_id}")
+        每个事件只分配给第一个包含其原文片段（或触发词）的文本块，避免在重叠区域重复整合。
         
-        # 记录初始文本
-        self._log_analysis_session(session_id, "input", {
-            "text": text,
+        Args:
+            events: 事件列表
+            chunks: 文本块列表
+            
+        Returns:
+            与文本块一一对应的事件列表
+        """
+        assigned = [[] for _ in chunks]
+        for event in events:
+            source_text = event.get("source_text", "")
+            trigger_text = (event.get("trigger") or {}).get("text", "")
+            target = 0
+            for index, chunk in enumerate(chunks):
+                if source_text and source_text in chunk["text"]:
+                    target = index
+                    break
+            else:
+                for index, chunk in enumerate(chunks):
+                    if trigger_text and trigger_text in chunk["text"]:
+                        target = index
+                        break
+            assigned[target].append(event)
+        return assigned
+    
+    def _merge_chunk_integrations(self, chunk_results, document_id):
+        """
+        合并各文本块的LLM整合结果
+        
+        各文本块的请求各自为事件编号，事件按 (文本块, 事件ID) 去重后统一重新编号，
+        块内的事件关系随之改为新的事件ID；实体按文本去重。位置信息在合并后从整合输入中补回。
+        
+        Args:
+            chunk_results: (文本块, 整合结果) 列表
+            document_id: 文档ID
+            
+        Returns:
+            合并后的整合结果
+        """
+        events = []
+        entities = {}
+        
+        for _, result in chunk_results:
+            # 本块的事件ID -> 合并后的事件ID
+            id_map = {}
+            chunk_events = []
+            for event in result.get("events", []):
+                event_id = event.get("event_id")
+                if not isinstance(event_id, (str, int)):
+                    event_id = None
+                elif event_id in id_map:
+                    continue
+                event = dict(event, event_id=f"EV{len(events) + len(chunk_events) + 1}")
+                if event_id is not None:
+                    id_map[event_id] = event["event_id"]
+                chunk_events.append(event)
+            
+            for event in chunk_events:
+                if isinstance(event.get("relations"), list):
+                    event["relations"] = [self._remap_relation(relation, id_map) for relation in event["relations"]]
+            events.extend(chunk_events)
+            
+            for entity in result.get("entities", []):
+                entities.setdefault(entity.get("text", "").lower(), entity)
+        
+        logger.info(f"合并 {len(chunk_results)} 个文本块的整合结果: {len(events)} 个事件, {len(entities)} 个实体")
+        return {
             "document_id": document_id,
-            "text_length": len(text)
-        })
+            "events": events,
+            "entities": list(entities.values())
+        }
+    
+    @staticmethod
+    def _remap_relation(relation, id_map):
+        """将关系指向的本块事件ID改为合并后的事件ID"""
+        if not isinstance(relation, dict):
+            return relation
+        related_event_id = relation.get("related_event_id")
+        if isinstance(related_event_id, (str, int)) and related_event_id in id_map:
+            return dict(relation, related_event_id=id_map[related_event_id])
+        return relation
+    
+    def extract_events_from_text(self, text, document_id=None):
+        """从文本中提取事件结构的主流程"""
+        return self.extract_events_from_texts([(document_id, text)])[0]
+    
+    def extract_events_from_texts(self, documents):
+        """
+        从多个文本中提取事件结构
         
-        # 文本预处理
-        processed_text = self.text_processor.preprocess_text(text)
+        各文档按阶段同步推进：每个阶段先复用检查点，未命中的文档通过nlp.pipe批量解析，
+        再将待处理的短文档打包为共享的LLM请求，打包结果缺失或无法解析的文档退回单文档请求。
         
-        # 记录预处理文本
-        self._log_analysis_session(session_id, "preprocessing", {
-            "processed_text": processed_text,
-            "processed_length": len(processed_text)
-        })
+        Args:
+            documents: (document_id, text) 列表
+            
+        Returns:
+            与输入顺序一致的事件结构列表，提取失败的文档为None
+        """
+        logger.info(f"开始从 {len(documents)} 个文本中提取事件结构")
+        
+        states = []
+        for document_id, text in documents:
+            # 创建分析会话ID
+            session_id = str(uuid.uuid4())
+            logger.info(f"分析会话ID: {session_id}")
+            
+            # 记录初始文本
+            self._log_analysis_session(session_id, "input", {
+                "text": text,
+                "document_id": document_id,
+                "text_length": len(text)
+            })
+            
+            # 文本预处理
+            processed_text = self.text_processor.preprocess_text(text)
+            
+            # 记录预处理文本
+            self._log_analysis_session(session_id, "preprocessing", {
+                "processed_text": processed_text,
+                "processed_length": len(processed_text)
+            })
+            
+            # 整个流程共用一次SpaCy解析结果，由需要解析的阶段对未命中检查点的文档批量解析，
+            # 阶段全部命中检查点时不解析
+            states.append({
+                "document_id": document_id,
+                "session_id": session_id,
+                "text": processed_text,
+                "analysis": None,
+                "key": OutputManifest.fingerprint(processed_text),
+                "failed": False
+            })
         
         # 步骤1: 提取实体和触发词
-        extraction_result = self.extract_entities_and_triggers(processed_text)
-        entities = extraction_result.get("entities", [])
-        triggers = extraction_result.get("event_triggers", [])
-        
-        # 记录实体和触发词
-        self._log_analysis_session(session_id, "extraction", {
-            "entities_count": len(entities),
-            "triggers_count": len(triggers),
-            "entities": entities,
-            "triggers": triggers
-        })
+        def extraction_input(state):
+            state["basic"] = self._extract_traditional(state["text"], state["analysis"])
+            if not self._use_llm("extraction", lambda: self.tier_gate.extraction_reason(
+                    state["text"], state["basic"]["entities"], state["basic"]["event_triggers"])):
+                return None
+            return {}
+        
+        self._run_batch_stage(
+            "extraction", states,
+            extraction_input,
+            lambda state, packed: self.enhance_extraction_with_llm(state["text"], state["basic"], packed),
+            needs_analysis=True
+        )
+        for state in states:
+            if state["failed"]:
+                continue
+            state["entities"] = state["output"].get("entities", [])
+            state["triggers"] = state["output"].get("event_triggers", [])
+            
+            # 记录实体和触发词
+            self._log_analysis_session(state["session_id"], "extraction", {
+                "entities_count": len(state["entities"]),
+                "triggers_count": len(state["triggers"]),
+                "entities": state["entities"],
+                "triggers": state["triggers"]
+            })
         
         # 步骤2: 构建事件结构
-        construction_result = self.construct_events(processed_text, entities, triggers)
-        events = construction_result.get("events", [])
+        def construction_input(state):
+            logger.info("开始构建事件结构")
+            state["basic"] = {
+                "events": self.srl_extractor.extract_srl(state["analysis"], state["triggers"], state["entities"])
+            }
+            if not self._use_llm("construction", lambda: self.tier_gate.construction_reason(
+                    state["text"], state["basic"]["events"], state["triggers"])):
+                return None
+            return {
+                "context": {
+                    "entities": PromptBuilder.compact_entities(state["entities"]),
+                    "triggers": PromptBuilder.compact_triggers(state["triggers"])
+                }
+            }
         
-        # 步骤3: 整合事件结构
-        final_result = self.integrate_events(processed_text, events, entities, document_id)
+        self._run_batch_stage(
+            "construction", states,
+            construction_input,
+            lambda state, packed: {"events": self.enhance_events_with_llm(
+                state["text"], state["basic"]["events"], state["entities"], state["triggers"], packed
+            )},
+            needs_analysis=True
+        )
+        for state in states:
+            if state["failed"]:
+                continue
+            state["events"] = state["output"].get("events", [])
+            # 文档ID会写入结果，是整合阶段输入的一部分
+            state["key"] = OutputManifest.fingerprint(state["key"], str(state["document_id"]))
+        
+        # 步骤3: 整合事件结构，提取事件关系后使用LLM进行最终整合
+        def integration_input(state):
+            logger.info("开始整合事件结构")
+            state["events"] = self.relation_extractor.extract_relations(state["events"])
+            if not self._use_llm("integration", lambda: self.tier_gate.integration_reason(
+                    state["text"], state["events"])):
+                state["basic"] = {
+                    "document_id": state["document_id"],
+                    "events": state["events"],
+                    "entities": state["entities"]
+                }
+                return None
+            return {
+                "context": {
+                    "events": PromptBuilder.compact_events(state["events"]),
+                    "entities": PromptBuilder.compact_entities(state["entities"])
+                }
+            }
         
-        # 记录最终结果
-        self._log_analysis_session(session_id, "final", {
-            "document_id": document_id,
-            "events_count": len(final_result.get("events", [])),
-            "entities_count": len(final_result.get("entities", [])),
-            "complete_result": final_result
-        })
+        self._run_batch_stage(
+            "integration", states,
+            integration_input,
+            lambda state, packed: self.final_integration_with_llm(
+                state["text"], state["events"], state["entities"], state["document_id"], packed
+            )
+        )
+        
+        results = []
+        for state in states:
+            if state["failed"]:
+                results.append(None)
+                continue
+            final_result = state["output"]
+            
+            # 记录最终结果
+            self._log_analysis_session(state["session_id"], "final", {
+                "document_id": state["document_id"],
+                "events_count": len(final_result.get("events", [])),
+                "entities_count": len(final_result.get("entities", [])),
+                "complete_result": final_result
+            })
+            results.append(final_result)
         
         logger.info("事件结构提取完成")
-        return final_result
+        return results
     
-    def _log_analysis_session(self, session_id, stage, data):
-        """记录分析会话的各个阶段"""
-        # 创建日志目录
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                              "logs", "analysis_sessions", session_id)
-        os.makedirs(log_dir, exist_ok=True)
+    def _run_batch_stage(self, stage, states, prepare, run, needs_analysis=False):
+        """
+        对多个文档执行一个流水线阶段
+        
+        阶段键是上游阶段键与本阶段配置指纹的链式哈希，某个阶段的提示词变化时，
+        该阶段及其下游阶段的键都会变化，上游阶段仍然命中检查点。
+        
+        Args:
+            stage: 阶段名称
+            states: 文档状态列表，key为阶段输入的键，阶段完成后更新为本阶段的键，输出写入output
+            prepare: 根据文档状态执行阶段的传统方法部分并准备打包请求字段（context、extra_fields）的函数，
+                只对未命中检查点的文档调用；返回None表示不需要LLM，阶段输出为state["basic"]
+            run: 根据文档状态和打包结果（可能为None）执行阶段LLM部分的函数，返回可JSON序列化的输出；
+                执行期间有LLM失败时不保存检查点
+            needs_analysis: 阶段是否需要SpaCy解析结果，为True时在准备前批量解析未命中检查点的文档
+        """
+        pending = []
+        for state in states:
+            if state["failed"]:
+                continue
+            state["key"] = OutputManifest.fingerprint(state["key"], self._stage_hash(stage))
+            output = self._load_checkpoint(stage, state["key"])
+            if output is not None:
+                state["output"] = output
+            else:
+                pending.append(state)
+        
+        if needs_analysis:
+            self._analyze_documents(pending)
+        
+        # 准备各文档的阶段输入，失败的文档不再进入后续阶段
+        prepared = []
+        for state in pending:
+            try:
+                prepared.append((state, prepare(state)))
+            except Exception as e:
+                logger.error(f"文档 {state['document_id']} 阶段 {stage} 执行失败: {e}")
+                state["failed"] = True
+        
+        # 两个以上的短文档打包请求，打包失败时全部逐个文档处理
+        packed_results = [None] * len(prepared)
+        packable = [i for i, (state, fields) in enumerate(prepared)
+                    if fields is not None and len(state["text"]) <= self.pack_text_chars]
+        if self.pack_size > 1 and len(packable) > 1:
+            try:
+                inputs = [dict(prepared[i][1], text=prepared[i][0]["text"]) for i in packable]
+                for i, packed in zip(packable, self._query_packed(stage, inputs)):
+                    packed_results[i] = packed
+            except Exception as e:
+                logger.warning(f"阶段 {stage} 打包请求失败，逐个文档处理: {e}")
+        
+        for (state, fields), packed in zip(prepared, packed_results):
+            failures = self.llm_failures
+            try:
+                state["output"] = state["basic"] if fields is None else run(state, packed)
+            except Exception as e:
+                logger.error(f"文档 {state['document_id']} 阶段 {stage} 执行失败: {e}")
+                state["failed"] = True
+                continue
+            if self.llm_failures > failures:
+                # 部分LLM结果缺失时的回退输出不保存，下次运行重新执行该阶段
+                logger.warning(f"阶段 {stage} 的LLM结果不完整，不保存检查点")
+                continue
+            self._save_checkpoint(stage, state["key"], state["output"])
+    
+    def _analyze_documents(self, states):
+        """
+        批量解析尚未解析的文档，所有文本通过一次nlp.pipe送入SpaCy
+        
+        批量解析失败时退回逐个文档在首次使用时解析。
+        
+        Args:
+            states: 文档状态列表，解析结果写入analysis
+        """
+        unparsed = [state for state in states if state["analysis"] is None]
+        if not unparsed:
+            return
+        
+        try:
+            analyses = analyze_texts((state["text"] for state in unparsed), self.ner_extractor.nlp)
+            for state, analysis in zip(unparsed, analyses):
+                state["analysis"] = analysis
+        except Exception as e:
+            logger.warning(f"批量解析 {len(unparsed)} 个文档失败，逐个文档解析: {e}")
+            for state in unparsed:
+                if state["analysis"] is None:
+                    state["analysis"] = DocumentAnalysis(state["text"])
+    
+    def _query_packed(self, stage, documents):
+        """
+        将多个短文档打包为共享的LLM请求
         
-        # 创建日志文件
-        log_file = os.path.join(log_dir, f"{stage}.json")
+        文档按顺序分组，每组最多pack_size个文档、文本总长不超过pack_max_chars，
+        组内文档使用包内ID（D1、D2……）标识，模型按ID返回各文档的结果。
         
+        Args:
+            stage: 阶段名称
+            documents: 文档列表，每项包含 text、context 和 extra_fields（见PromptBuilder.build_packed_prompt）
+            
+        Returns:
+            与输入顺序一致的单文档结果列表，未打包、结果缺失、被截断或不符合阶段结构的文档为None
+        """
+        packs = []
+        current, current_chars = [], 0
+        for i, document in enumerate(documents):
+            if current and (len(current) >= self.pack_size
+                            or current_chars + len(document["text"]) > self.pack_max_chars):
+                packs.append(current)
+                current, current_chars = [], 0
+            current.append(i)
+            current_chars += len(document["text"])
+        packs.append(current)
+        # 只有一个文档的组直接走单文档请求
+        packs = [pack for pack in packs if len(pack) > 1]
+        
+        results = [None] * len(documents)
+        if not packs:
+            return results
+        
+        template = self.text_processor.load_prompt(PIPELINE_STAGES[stage])
+        message_batches = []
+        for pack in packs:
+            pack_documents = []
+            for position, i in enumerate(pack):
+                extra_fields = dict(documents[i].get("extra_fields", {}))
+                if "{document_id}" in template:
+                    extra_fields["document_id"] = f"D{position + 1}"
+                pack_documents.append({
+                    "document_id": f"D{position + 1}",
+                    "text": documents[i]["text"],
+                    "context": documents[i].get("context", {}),
+                    "extra_fields": extra_fields
+                })
+            message_batches.append([
+                {"role": "system", "content": SYSTEM_PROMPTS[stage]},
+                {"role": "user", "content": self.prompt_builder.build_packed_prompt(template, pack_documents)}
+            ])
+        
+        logger.info(f"阶段 {stage} 将 {sum(len(pack) for pack in packs)} 个短文档打包为 {len(packs)} 个请求")
+        responses = self.llm_service.query_many(
+            message_batches,
+            response_format={"type": "json_object"}
+        )
+        
+        for pack, response in zip(packs, responses):
+            try:
+                parsed, truncated = repair_json(response)
+                packed = parsed.get("documents", {})
+            except Exception as e:
+                logger.warning(f"解析打包响应失败，{len(pack)} 个文档退回单文档请求: {e}")
+                continue
+            if not isinstance(packed, dict):
+                logger.warning(f"打包响应缺少documents对象，{len(pack)} 个文档退回单文档请求")
+                continue
+            if truncated and packed:
+                # 截断发生在最后一个出现的文档中，它的结果可能不完整
+                packed = dict(packed)
+                packed.pop(list(packed)[-1])
+            
+            missing = 0
+            for position, i in enumerate(pack):
+                results[i] = self._packed_document_result(stage, packed.get(f"D{position + 1}"))
+                if results[i] is None:
+                    missing += 1
+            if missing:
+                logger.warning(f"打包响应中 {missing}/{len(pack)} 个文档的结果缺失、被截断或不符合结构，退回单文档请求")
+        return results
+    
+    @staticmethod
+    def _packed_document_result(stage, result):
+        """
+        校验打包响应中单个文档的结果
+        
+        Returns:
+            校验后的结果，缺失、不符合阶段结构或有条目被丢弃时返回None
+        """
+        if not isinstance(result, dict):
+            return None
+        try:
+            result, dropped = validate_response(stage, result)
+        except ResponseParseError:
+            return None
+        return result if not dropped else None
+    
+    @staticmethod
+    def _packed_chunks(text, packed_result):
+        """打包结果对应的文本块和响应：整个文档作为唯一的文本块"""
+        return [{"chunk_id": 0, "text": text, "start": 0, "end": len(text)}], [packed_result]
+    
+    def _parse_stage_response(self, stage, response, messages=None):
+        """
+        解析并校验阶段响应，无法修复时追加一次请求
+        
+        响应截断时请求模型从截断处继续输出并与原响应拼接，其他无法修复的情况请求模型返回修正后的完整JSON。
+        
+        Args:
+            stage: 阶段名称
+            response: 响应文本，或打包请求中已解析的单文档结果
+            messages: 产生该响应的输入消息，为None时不追加请求
+            
+        Returns:
+            校验后的阶段响应
+            
+        Raises:
+            ResponseParseError: 追加请求后仍无法解析
+        """
+        try:
+            return parse_response(stage, response)[0]
+        except ResponseParseError as e:
+            # 请求本身失败（空响应）时不追加请求
+            if messages is None or not isinstance(response, str) or not response.strip():
+                raise
+            error = e
+        
+        history = messages + [{"role": "assistant", "content": response}]
+        if error.truncated:
+            logger.warning(f"{stage}阶段响应被截断且无法修复（{error}），请求继续输出")
+            # JSON模式下模型只能返回完整的JSON对象，续写内容必须以纯文本返回才能与原响应拼接
+            continuation = self.llm_service.query(
+                history + [{"role": "user", "content": CONTINUATION_PROMPT}],
+                response_format={"type": "text"}
+            )
+            return parse_response(stage, response + continuation)[0]
+        
+        logger.warning(f"{stage}阶段响应无法修复（{error}），请求修正")
+        corrected = self.llm_service.query(
+            history + [{"role": "user", "content": CORRECTION_PROMPT.format(error=error)}],
+            response_format={"type": "json_object"}
+        )
+        return parse_response(stage, corrected)[0]
+    
+    def _log_analysis_session(self, session_id, stage, data):
+        """记录分析会话的各个阶段"""
         # 添加元数据
-        data["timestamp"] = int(time.time())
         data["session_id"] = session_id
         data["stage"] = stage
         
-        # 写入日志文件
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"分析会话 {session_id} 的 {stage} 阶段日志已保存")
+        # 交给后台线程写入，不阻塞提取流程
+        get_analysis_logger().log("analysis_sessions", data)
     
-    def extract_events_from_file(self, file_path, document_id=None):
+    def extract_events_from_file(self, file_path, document_id=None, force=False):
         """
         从文件中提取事件结构
         
+        内容、提示词模板和流水线版本都未变化的文档直接返回上次的输出，不再重新处理。
+        
         Args:
             file_path: 文本文件路径
             document_id: 文档ID
+            force: 是否忽略增量处理清单，强制重新处理
             
         Returns:
             完整的事件结构
@@ -515,16 +1268,448 @@ class EventExtractor:
         if document_id is None:
             document_id = os.path.basename(file_path)
         
+        return self.extract_and_save(text, document_id, force)
+    
+    def extract_and_save(self, text, document_id, force=False):
+        """
+        提取单个文档的事件结构并保存到输出目录
+        
+        内容、提示词模板和流水线版本都未变化的文档直接返回上次的输出，不再重新处理。
+        
+        Args:
+            text: 文档文本
+            document_id: 文档ID
+            force: 是否忽略增量处理清单，强制重新处理
+            
+        Returns:
+            完整的事件结构，提取失败时返回None
+        """
+        # 文档未变化时复用上次的输出
+        content_hash = OutputManifest.fingerprint(text)
+        if not force:
+            cached = self._load_unchanged_result(document_id, content_hash)
+            if cached is not None:
+                return cached
+        
         # 提取事件结构
         result = self.extract_events_from_text(text, document_id)
+        if result is None:
+            logger.error(f"文档 {document_id} 事件提取失败")
+            return None
         
         # 保存结果到JSON文件
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
-        os.makedirs(output_dir, exist_ok=True)
+        self._save_result(document_id, result, content_hash=content_hash)
+        return result
+    
+    def _output_dir(self, output_dir=None):
+        """输出目录，默认为项目根目录下的output"""
+        if output_dir is None:
+            output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output")
+        return output_dir
+    
+    def _output_file(self, document_id, output_dir=None):
+        """文档的输出文件路径"""
+        return os.path.join(self._output_dir(output_dir), f"{document_id}_events.json")
+    
+    def _save_result(self, document_id, result, output_dir=None, content_hash=None):
+        """
+        保存事件结构到JSON文件
+        
+        Args:
+            document_id: 文档ID
+            result: 事件结构
+            output_dir: 输出目录，默认为项目根目录下的output
+            content_hash: 文档内容指纹，提供时同时更新增量处理清单
+            
+        Returns:
+            输出文件路径
+        """
+        output_file = self._output_file(document_id, output_dir)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        output_file = os.path.join(output_dir, f"{document_id}_events.json")
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
         
+        if content_hash is not None:
+            self.manifest.record(document_id, content_hash, self.prompt_hash, PIPELINE_VERSION, output_file)
+        
         logger.info(f"事件结构已保存到: {output_file}")
-        return result 
\ No newline at end of file
+        return output_file
+    
+    @property
+    def manifest(self):
+        """增量处理清单"""
+        if self._manifest is None:
+            self._manifest = OutputManifest(self.manifest_path)
+        return self._manifest
+    
+    @property
+    def prompt_hash(self):
+        """
+        提示词指纹：各阶段提示词模板加上影响阶段输出的配置（模型、分块、token预算、档位和词典）
+        """
+        if self._prompt_hash is None:
+            templates = [self.text_processor.load_prompt(name) for name in PROMPT_NAMES]
+            self._prompt_hash = OutputManifest.fingerprint(*templates, self._stage_settings())
+        return self._prompt_hash
+    
+    def _stage_settings(self):
+        """影响阶段输出的配置：提示词相关配置、档位，以及触发词词典和风险关键词文件的内容摘要"""
+        return json.dumps({
+            "deployment_name": self.llm_service.config.get("deployment_name", "gpt-4o"),
+            "chunk_size": self.text_chunker.max_chars,
+            "chunk_overlap": self.text_chunker.overlap_sentences,
+            "token_budgets": self.prompt_builder.token_budgets,
+            "tier": self.tier,
+            "trigger_lexicons": self.trigger_extractor.lexicon_digests,
+            "risk_keywords": self.tier_gate.risk_keywords_digest
+        }, sort_keys=True)
+    
+    @property
+    def checkpoints(self):
+        """阶段检查点存储"""
+        if self._checkpoints is None:
+            self._checkpoints = StageCheckpointStore(self.checkpoint_path)
+        return self._checkpoints
+    
+    def _stage_hash(self, stage):
+        """阶段配置指纹：流水线版本、阶段提示词模板和影响阶段输出的配置"""
+        if stage not in self._stage_hashes:
+            template = self.text_processor.load_prompt(PIPELINE_STAGES[stage])
+            self._stage_hashes[stage] = OutputManifest.fingerprint(
+                PIPELINE_VERSION, stage, template, self._stage_settings()
+            )
+        return self._stage_hashes[stage]
+    
+    def _load_checkpoint(self, stage, key):
+        """读取阶段检查点，未启用检查点或不存在时返回None"""
+        if not self.use_checkpoints:
+            return None
+        try:
+            output = self.checkpoints.get(key)
+        except Exception as e:
+            logger.warning(f"读取阶段检查点失败: {stage}: {e}")
+            return None
+        if output is not None:
+            logger.info(f"阶段 {stage} 命中检查点，跳过执行")
+        return output
+    
+    def _save_checkpoint(self, stage, key, output):
+        """保存阶段检查点，未启用检查点时不保存"""
+        if not self.use_checkpoints:
+            return
+        try:
+            self.checkpoints.put(key, stage, output)
+        except Exception as e:
+            logger.warning(f"保存阶段检查点失败: {stage}: {e}")
+    
+    def _is_unchanged(self, document_id, content_hash, output_dir=None):
+        """文档是否已按相同内容、提示词和流水线版本处理过"""
+        return self.manifest.is_current(document_id, content_hash, self.prompt_hash, PIPELINE_VERSION,
+                                        self._output_file(document_id, output_dir))
+    
+    def _load_unchanged_result(self, document_id, content_hash, output_dir=None):
+        """
+        读取未变化文档的上次输出
+        
+        Returns:
+            上次的事件结构，文档有变化或输出无法读取时返回None
+        """
+        if not self._is_unchanged(document_id, content_hash, output_dir):
+            return None
+        output_file = self._output_file(document_id, output_dir)
+        result = self._load_result(output_file)
+        if result is not None:
+            logger.info(f"文档 {document_id} 未变化，跳过处理并复用: {output_file}")
+        return result
+    
+    def _load_result(self, output_file):
+        """读取已保存的事件结构，读取失败时返回None"""
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取已保存的输出失败，重新处理: {output_file}: {e}")
+            return None
+    
+    def _iter_corpus_documents(self, documents):
+        """
+        将语料输入统一为 (document_id, text, metadata) 序列
+        
+        Args:
+            documents: 路径或 (document_id, text[, metadata]) 元组的可迭代对象；
+                目录、CSV和JSONL路径会被展开为其中的每条记录
+            
+        Returns:
+            (document_id, text, metadata) 生成器
+        """
+        for item in documents:
+            if isinstance(item, (tuple, list)):
+                metadata = item[2] if len(item) > 2 else {}
+                yield item[0], item[1], metadata
+            elif is_multi_document_source(item):
+                try:
+                    yield from iter_documents(item)
+                except Exception as e:
+                    logger.error(f"数据源读取失败，跳过剩余记录: {item}: {e}")
+            else:
+                text = self.text_processor.read_text_file(item)
+                if text is None:
+                    logger.error(f"文件读取失败，跳过: {item}")
+                    continue
+                yield os.path.basename(item), text, {"source": item}
+    
+    def extract_events_from_corpus(self, documents, max_workers=None, output_dir=None, force=False,
+                                   dedup_threshold=None, cluster_incidents=False):
+        """
+        批量从语料中提取事件结构
+        
+        文档被分发到工作进程池中处理，每个工作进程只初始化一次事件提取器
+        （即只加载一次SpaCy模型），结果在每个文档完成后立即写入输出目录。
+        启用打包（pack_size大于1）时每次分发pack_size个文档，其中的短文档共享LLM请求。
+        转发和轻度改写的近似重复文档不再单独提取，直接复用其代表文档的结果。
+        
+        Args:
+            documents: 路径或 (document_id, text[, metadata]) 元组的可迭代对象，按需惰性读取，
+                CSV、JSONL和MediaCrawler目录逐条流式读取
+            max_workers: 工作进程数，默认为CPU核数；为1时在当前进程中顺序处理
+            output_dir: 输出目录，默认为项目根目录下的output
+            force: 是否忽略增量处理清单，强制重新处理所有文档
+            dedup_threshold: 视为近似重复的最小shingle Jaccard相似度（如0.95），为None时不做去重（默认）
+            cluster_incidents: 是否将各文档的事件跨文档聚类为全局舆情事件簇，
+                结果保存到输出目录下的incidents.json
+            
+        Returns:
+            处理统计信息，skipped为内容、提示词和流水线版本都未变化而跳过的文档数，
+            duplicates为复用代表文档结果的近似重复文档数，incidents为聚类得到的事件簇数，
+            llm_cache为本次运行的LLM响应缓存命中统计
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        logger.info(f"开始批量提取语料事件结构，工作进程数: {max_workers}")
+        
+        stats = {"total": 0, "succeeded": 0, "failed": 0, "skipped": 0, "duplicates": 0}
+        start_time = time.time()
+        # 本次运行的LLM响应缓存命中计数，工作进程按批次汇报
+        cache_before = self.llm_service.cache_stats()
+        cache_counts = {"hits": 0, "misses": 0}
+        
+        # 近似重复索引在主进程中增量构建，关联值为代表文档ID
+        dedup_index = NearDuplicateIndex(dedup_threshold) if dedup_threshold else None
+        # 已有输出的代表文档 -> 输出文件
+        representative_outputs = {}
+        # 代表文档仍在处理中时等待其结果的近似重复文档
+        waiting = defaultdict(list)
+        # 代表文档失败后改由其第一个近似重复文档代表
+        replaced = {}
+        # 代表文档失败后需要自行处理的文档
+        orphans = deque()
+        # 已提交但尚未完成的文档
+        in_flight = set()
+        # 跨文档事件聚类随文档完成增量进行，聚类依赖的NumPy只在启用时导入
+        clusterer = None
+        if cluster_incidents:
+            from services.incident_clusterer import IncidentClusterer
+            from services.embedding_service import EmbeddingService
+            clusterer = IncidentClusterer(EmbeddingService(self.llm_service))
+        
+        def save(document_id, metadata, content_hash, result):
+            if metadata:
+                result["source_metadata"] = metadata
+            output_file = self._save_result(document_id, result, output_dir, content_hash)
+            stats["succeeded"] += 1
+            if clusterer is not None:
+                clusterer.add_document(document_id, result)
+            return output_file
+        
+        def save_duplicate(item, representative_id, result):
+            document_id, _, metadata, content_hash = item
+            duplicate = copy.deepcopy(result)
+            duplicate.pop("source_metadata", None)
+            duplicate["document_id"] = document_id
+            duplicate["duplicate_of"] = representative_id
+            save(document_id, metadata, content_hash, duplicate)
+            stats["duplicates"] += 1
+        
+        def record(item, result):
+            document_id = item[0]
+            duplicates = waiting.pop(document_id, [])
+            if result is None:
+                stats["failed"] += 1
+                if duplicates:
+                    # 第一个近似重复文档接替为代表，其余继续等待
+                    successor = duplicates[0]
+                    replaced[document_id] = successor[0]
+                    waiting[successor[0]].extend(duplicates[1:])
+                    in_flight.add(successor[0])
+                    orphans.append(successor)
+                return
+            
+            representative_outputs[document_id] = save(document_id, item[2], item[3], result)
+            for duplicate in duplicates:
+                save_duplicate(duplicate, document_id, result)
+        
+        def resolve(representative_id):
+            while representative_id in replaced:
+                representative_id = replaced[representative_id]
+            return representative_id
+        
+        def handle_duplicate(item, representative_id):
+            """返回True表示文档作为近似重复处理，无需提取"""
+            representative_id = resolve(representative_id)
+            if representative_id in representative_outputs:
+                result = self._load_result(representative_outputs[representative_id])
+                if result is None:
+                    return False
+                save_duplicate(item, representative_id, result)
+                return True
+            if representative_id in in_flight:
+                waiting[representative_id].append(item)
+                return True
+            # 代表文档失败且没有接替者，当前文档接替为代表
+            replaced[representative_id] = item[0]
+            return False
+        
+        def changed_documents():
+            # 在主进程中比对清单和近似重复索引，只有需要提取的文档进入工作进程
+            for document_id, text, metadata in self._iter_corpus_documents(documents):
+                stats["total"] += 1
+                content_hash = OutputManifest.fingerprint(text)
+                unchanged = not force and self._is_unchanged(document_id, content_hash, output_dir)
+                
+                if dedup_index is not None:
+                    signature = dedup_index.signature(text)
+                    representative_id = dedup_index.find(signature)
+                    if unchanged or representative_id is None:
+                        dedup_index.add(signature, document_id)
+                
+                if unchanged:
+                    stats["skipped"] += 1
+                    output_file = self._output_file(document_id, output_dir)
+                    representative_outputs[document_id] = output_file
+                    if clusterer is not None:
+                        previous = self._load_result(output_file)
+                        if previous is not None:
+                            clusterer.add_document(document_id, previous)
+                    continue
+                
+                item = (document_id, text, metadata, content_hash)
+                if dedup_index is not None and representative_id is not None \
+                        and handle_duplicate(item, representative_id):
+                    continue
+                in_flight.add(document_id)
+                yield item
+        
+        def next_document(source):
+            if orphans:
+                return orphans.popleft()
+            return next(source, None)
+        
+        def next_batch(source):
+            batch = []
+            while len(batch) < max(self.pack_size, 1):
+                item = next_document(source)
+                if item is None:
+                    break
+                batch.append(item)
+            return batch
+        
+        source = changed_documents()
+        if max_workers == 1:
+            while True:
+                batch = next_batch(source)
+                if not batch:
+                    break
+                try:
+                    results = self.extract_events_from_texts([(item[0], item[1]) for item in batch])
+                except Exception as e:
+                    logger.error(f"文档 {', '.join(str(item[0]) for item in batch)} 事件提取失败: {e}")
+                    results = [None] * len(batch)
+                for item, result in zip(batch, results):
+                    in_flight.discard(item[0])
+                    record(item, result)
+            cache_counts = _cache_delta(cache_before, self.llm_service.cache_stats())
+        else:
+            # 限制同时在途的批次数量，避免一次性把整个语料读入内存
+            max_pending = max_workers * 2
+            pending = {}
+            
+            def collect():
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for finished in done:
+                    batch = pending.pop(finished)
+                    results, batch_cache = _future_result(finished, [item[0] for item in batch])
+                    for name in cache_counts:
+                        cache_counts[name] += batch_cache.get(name, 0)
+                    for item, result in zip(batch, results):
+                        in_flight.discard(item[0])
+                        record(item, result)
+            
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_corpus_worker,
+                                     initargs=(self.worker_settings,)) as executor:
+                while True:
+                    batch = next_batch(source)
+                    if not batch:
+                        if not pending:
+                            break
+                        collect()
+                        continue
+                    
+                    future = executor.submit(_extract_corpus_batch, [(item[0], item[1]) for item in batch])
+                    # 结果写出前只保留文档ID、元数据和指纹，文本随提交交给工作进程
+                    pending[future] = [(item[0], None, item[2], item[3]) for item in batch]
+                    if len(pending) >= max_pending:
+                        collect()
+        
+        if clusterer is not None:
+            clusterer.save(os.path.join(self._output_dir(output_dir), "incidents.json"))
+            stats["incidents"] = len(clusterer.clusters)
+        
+        lookups = cache_counts["hits"] + cache_counts["misses"]
+        stats["llm_cache"] = dict(cache_counts, hit_rate=round(cache_counts["hits"] / lookups, 4) if lookups else 0.0)
+        stats["elapsed"] = round(time.time() - start_time, 2)
+        logger.info(f"语料事件提取完成: 共 {stats['total']} 个文档，成功 {stats['succeeded']} 个，"
+                    f"失败 {stats['failed']} 个，未变化跳过 {stats['skipped']} 个，"
+                    f"近似重复 {stats['duplicates']} 个，耗时 {stats['elapsed']} 秒")
+        logger.info(f"LLM响应缓存: 命中 {cache_counts['hits']} 次，未命中 {cache_counts['misses']} 次，"
+                    f"命中率 {stats['llm_cache']['hit_rate']:.1%}")
+        return stats
+
+
+# 工作进程内的事件提取器，每个进程只初始化一次
+_worker_extractor = None
+
+
+def _init_corpus_worker(settings):
+    """初始化语料处理工作进程"""
+    global _worker_extractor
+    _worker_extractor = EventExtractor(**settings)
+
+
+def _extract_corpus_batch(documents):
+    """
+    在工作进程中提取一批 (document_id, text) 文档的事件结构
+    
+    Returns:
+        (结果列表, 本批的LLM响应缓存命中计数)
+    """
+    cache_before = _worker_extractor.llm_service.cache_stats()
+    try:
+        results = _worker_extractor.extract_events_from_texts(documents)
+        return results, _cache_delta(cache_before, _worker_extractor.llm_service.cache_stats())
+    finally:
+        # 工作进程退出时不会执行atexit，每个文档完成后写完分析日志
+        get_analysis_logger().flush()
+
+
+def _cache_delta(before, after):
+    """两次LLM响应缓存统计之间的命中和未命中次数"""
+    return {name: after[name] - before[name] for name in ("hits", "misses")}
+
+
+def _future_result(future, document_ids):
+    """获取工作进程的处理结果，失败时整批文档的结果为None、缓存计数为空"""
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"文档 {', '.join(str(document_id) for document_id in document_ids)} 事件提取失败: {e}")
+        return [None] * len(document_ids), {}
@@ -0,0 +1,160 @@
+import os
+import json
+import logging
+from typing import Dict, Any, List
+
+import numpy as np
+
+from algorithms.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+class IncidentClusterer:
+    """
+    跨文档事件聚类：将各文档的事件按摘要嵌入合并为全局舆情事件簇
+
+    事件摘要累积到batch_size后批量获取嵌入，每个事件与向量索引中最相似的簇质心比较，
+    相似度不低于threshold时加入该簇并更新质心，否则新建簇。聚类随文档到达增量进行。
+    """
+
+    def __init__(self, embedding_service, threshold: float = 0.88, batch_size: int = 64):
+        """
+        初始化事件聚类器
+
+        Args:
+            embedding_service: 嵌入服务
+            threshold: 事件加入簇的最小余弦相似度
+            batch_size: 每次获取嵌入的事件摘要数
+        """
+        self.embedding_service = embedding_service
+        self.threshold = threshold
+        self.batch_size = batch_size
+
+        self.index = VectorIndex()
+        # 簇列表，第i个簇对应向量索引的第i行（质心）
+        self.clusters = []
+        self._centroid_sums = []
+        self._buffer = []
+        self.stats = {"events": 0, "clustered": 0, "embedding_failures": 0}
+
+    @staticmethod
+    def event_summary(event: Dict[str, Any]) -> str:
+        """
+        生成用于嵌入的事件摘要文本
+
+        Args:
+            event: 整合后的事件
+
+        Returns:
+            摘要文本，事件没有可用描述时返回空字符串
+        """
+        summary = event.get("summary") or event.get("source_text")
+        if not summary:
+            trigger = event.get("trigger")
+            summary = trigger.get("text") if isinstance(trigger, dict) else trigger
+        if not summary or not isinstance(summary, str):
+            return ""
+        event_type = event.get("type")
+        return f"{event_type}: {summary}" if event_type else summary
+
+    def add_document(self, document_id: str, result: Dict[str, Any]):
+        """
+        加入一个文档的事件，缓冲区满时批量聚类
+
+        Args:
+            document_id: 文档ID
+            result: 文档的事件结构
+        """
+        for event in result.get("events", []):
+            if not isinstance(event, dict):
+                continue
+            text = self.event_summary(event)
+            if not text:
+                continue
+            self.stats["events"] += 1
+            self._buffer.append({
+                "document_id": document_id,
+                "event_id": event.get("event_id"),
+                "summary": text
+            })
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """为缓冲区中的事件获取嵌入并聚类"""
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            embeddings = self.embedding_service.embed([member["summary"] for member in batch])
+            if embeddings.shape[1] == 0:
+                logger.error(f"获取事件摘要嵌入失败，{len(batch)} 个事件未参与聚类")
+                self.stats["embedding_failures"] += len(batch)
+                continue
+
+            for member, embedding in zip(batch, embeddings):
+                self._assign(member, embedding)
+
+    def _assign(self, member, embedding):
+        """将事件加入最相似的簇或新建簇"""
+        norm = np.linalg.norm(embedding)
+        # 获取失败的嵌入为全零行
+        if not norm:
+            self.stats["embedding_failures"] += 1
+            return
+        embedding = embedding / norm
+
+        nearest = self.index.search(embedding, 1)
+        if nearest and nearest[0][1] >= self.threshold:
+            cluster_id, similarity = nearest[0]
+            member["similarity"] = round(similarity, 4)
+            self.clusters[cluster_id]["members"].append(member)
+            # 质心为成员单位向量之和的方向
+            self._centroid_sums[cluster_id] += embedding
+            self.index.update(cluster_id, self._centroid_sums[cluster_id])
+        else:
+            cluster_id = self.index.add(embedding)
+            self.clusters.append({
+                "incident_id": f"incident_{cluster_id + 1}",
+                "summary": member["summary"],
+                "members": [member]
+            })
+            self._centroid_sums.append(embedding.copy())
+        self.stats["clustered"] += 1
+
+    def incidents(self) -> List[Dict[str, Any]]:
+        """
+        获取聚类结果
+
+        Returns:
+            舆情事件簇列表，按事件数降序
+        """
+        self.flush()
+        incidents = []
+        for cluster in self.clusters:
+            members = cluster["members"]
+            incidents.append({
+                "incident_id": cluster["incident_id"],
+                "summary": cluster["summary"],
+                "event_count": len(members),
+                "document_count": len({member["document_id"] for member in members}),
+                "members": members
+            })
+        incidents.sort(key=lambda incident: incident["event_count"], reverse=True)
+        return incidents
+
+    def save(self, output_file: str) -> str:
+        """
+        保存聚类结果到JSON文件
+
+        Args:
+            output_file: 输出文件路径
+
+        Returns:
+            输出文件路径
+        """
+        incidents = self.incidents()
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump({"incidents": incidents, "stats": self.stats}, f, ensure_ascii=False, indent=2)
+        logger.info(f"跨文档事件聚类完成: {self.stats['clustered']} 个事件归入 {len(incidents)} 个簇，"
+                    f"已保存到: {output_file}")
+        return output_file
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+class LLMCache(SQLiteStore):
+    """LLM响应持久化缓存，按请求内容寻址，存储在SQLite中"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+    )
+
+    def __init__(self, cache_path: str = None, ttl: float = 7 * 24 * 3600, max_entries: int = 10000):
+        """
+        初始化LLM响应缓存
+
+        Args:
+            cache_path: SQLite数据库路径，默认为项目根目录下的cache/llm_cache.sqlite
+            ttl: 缓存有效期（秒），为None或0时永不过期
+            max_entries: 最大缓存条目数，超出时按最近最少使用淘汰
+        """
+        if cache_path is None:
+            cache_path = self.default_path("llm_cache.sqlite")
+        super().__init__(cache_path)
+
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"LLM响应缓存已就绪: {cache_path}")
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """
+        计算请求参数的缓存键
+
+        Args:
+            params: chat completions请求参数（包含部署名称和消息）
+
+        Returns:
+            SHA-256十六进制摘要
+        """
+        payload = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存的响应
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的响应文本，未命中或已过期时返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: str):
+        """
+        写入响应并在超出容量时淘汰最近最少使用的条目
+
+        Args:
+            key: 缓存键
+            response: 响应文本
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._evict_overflow("responses", "key", "accessed_at", self.max_entries)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
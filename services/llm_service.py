@@ -1,11 +1,45 @@
+import asyncio
 import logging
+import random
 import time
 import json
 import os
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable
+
+from services.llm_cache import LLMCache
+from services.rate_limiter import AdaptiveRateLimiter, estimate_request_tokens
+from services.response_parser import JsonArrayStreamParser
+from services.analysis_logger import get_analysis_logger
 
 logger = logging.getLogger(__name__)
 
+# 进程内共享的Azure OpenAI客户端，按连接参数缓存
+_clients = {}
+_clients_lock = threading.Lock()
+
+# 重试也不会成功的HTTP状态码
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+
+def _error_status(error) -> int:
+    """异常对应的HTTP状态码，非HTTP错误时返回None"""
+    return getattr(error, "status_code", None)
+
+def _retry_after(error) -> float:
+    """从429响应头中读取Retry-After秒数，没有时返回None"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
 class LLMService:
     """Azure OpenAI服务实现"""
     
@@ -14,7 +48,19 @@ class LLMService:
         # 加载配置
         self.config = self._load_config()
         self.max_attempts = 5
-        self.init_client()
+        # 异步查询时同时在途的最大请求数
+        self.max_concurrency = self.config.get("max_concurrent_requests", 16)
+        self._semaphore = None
+        self._semaphore_loop = None
+        # 按部署的RPM/TPM配额限流，收到429时自适应降速
+        self.rate_limiter = AdaptiveRateLimiter(
+            rpm=self.config.get("rate_limit_rpm"),
+            tpm=self.config.get("rate_limit_tpm")
+        )
+        # 响应缓存在首次查询时打开
+        self._cache = None
+        self._cache_loaded = False
+        self._cache_lock = threading.Lock()
         
     def _load_config(self) -> Dict[str, Any]:
         """从配置文件加载设置"""
@@ -33,20 +79,152 @@ class LLMService:
             return {}
         
     def init_client(self):
-        """初始化Azure OpenAI客户端"""
+        """
+        获取Azure OpenAI客户端，首次调用时导入openai并创建，同一进程中相同连接参数的服务共用
+        
+        Returns:
+            (同步客户端, 异步客户端)，初始化失败时为 (None, None)
+        """
+        client_args = {
+            "api_key": self.config.get("azure_api_key"),
+            "api_version": self.config.get("azure_api_version"),
+            "azure_endpoint": self.config.get("azure_api_base")
+        }
+        key = tuple(sorted((name, str(value)) for name, value in client_args.items()))
+        clients = _clients.get(key)
+        if clients is not None:
+            return clients
+        
+        with _clients_lock:
+            if key not in _clients:
+                try:
+                    from openai import AzureOpenAI, AsyncAzureOpenAI
+                    
+                    _clients[key] = (AzureOpenAI(**client_args), AsyncAzureOpenAI(**client_args))
+                    logger.info("成功初始化Azure OpenAI客户端")
+                    
+                except Exception as e:
+                    logger.error(f"初始化Azure OpenAI客户端失败: {e}")
+                    _clients[key] = (None, None)
+            return _clients[key]
+    
+    @property
+    def client(self):
+        """同步客户端，首次请求时创建"""
+        return self.init_client()[0]
+    
+    @property
+    def async_client(self):
+        """异步客户端，首次请求时创建"""
+        return self.init_client()[1]
+    
+    def init_cache(self):
+        """
+        打开LLM响应缓存，已打开时直接返回
+        
+        Returns:
+            LLM响应缓存，未启用或打开失败时为None
+        """
+        if self._cache_loaded:
+            return self._cache
+        
+        with self._cache_lock:
+            if not self._cache_loaded:
+                if not self.config.get("cache_enabled", True):
+                    logger.info("LLM响应缓存已禁用")
+                else:
+                    try:
+                        self._cache = LLMCache(
+                            cache_path=self.config.get("cache_path"),
+                            ttl=self.config.get("cache_ttl", 7 * 24 * 3600),
+                            max_entries=self.config.get("cache_max_entries", 10000)
+                        )
+                    except Exception as e:
+                        logger.error(f"初始化LLM响应缓存失败: {e}")
+                self._cache_loaded = True
+            return self._cache
+    
+    @property
+    def cache(self):
+        """LLM响应缓存，首次查询时打开"""
+        return self.init_cache()
+    
+    @cache.setter
+    def cache(self, cache):
+        """替换响应缓存，设为None时不使用缓存"""
+        self._cache = cache
+        self._cache_loaded = True
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """LLM响应缓存的命中统计，缓存未打开或未启用时计数为0"""
+        if not self._cache_loaded or not self._cache:
+            return {"hits": 0, "misses": 0, "hit_rate": 0.0}
+        return self._cache.stats()
+
+    def _cache_get(self, params: Dict[str, Any]):
+        """查询响应缓存，返回 (缓存键, 缓存的响应)"""
+        if not self.cache:
+            return None, None
         try:
-            from openai import AzureOpenAI
-            
-            self.client = AzureOpenAI(
-                api_key=self.config.get("azure_api_key"),
-                api_version=self.config.get("azure_api_version"),
-                azure_endpoint=self.config.get("azure_api_base")
-            )
-            logger.info("成功初始化Azure OpenAI客户端")
-            
+            key = LLMCache.make_key(params)
+            return key, self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"读取LLM响应缓存失败: {e}")
+            return None, None
+    
+    def _cache_put(self, key, response_text):
+        """将非空响应写入缓存"""
+        if not self.cache or not key or not response_text:
+            return
+        try:
+            self.cache.put(key, response_text)
         except Exception as e:
-            logger.error(f"初始化Azure OpenAI客户端失败: {e}")
-            self.client = None
+            logger.warning(f"写入LLM响应缓存失败: {e}")
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环的并发信号量"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    def _build_params(self, deployment_name, messages, max_tokens, response_format, kwargs) -> Dict[str, Any]:
+        """构建chat completions请求参数"""
+        params = {
+            "model": deployment_name,
+            "messages": messages,
+            "temperature": 0,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"} if response_format is None else response_format,
+            "frequency_penalty": 0,
+            "presence_penalty": 0,
+            "stop": None,
+            "seed": 42
+        }
+        
+        # 合并额外参数
+        params.update(kwargs)
+        return params
+    
+    def _retry_wait(self, error, attempt) -> float:
+        """
+        处理失败的请求，返回重试前需要等待的秒数，不应重试时返回None
+        
+        429由限流器统一暂停（下次请求前在限流器中等待），其他可重试错误使用带随机抖动的指数退避，
+        避免并发请求同时重试。
+        """
+        status = _error_status(error)
+        if status == 429:
+            self.rate_limiter.on_throttled(_retry_after(error))
+            return 0
+        if status in NON_RETRYABLE_STATUS:
+            return None
+        return random.uniform(1, 2 ** (attempt + 1))
+    
+    def _write_log(self, log_data):
+        """提交查询日志，由后台线程写入"""
+        get_analysis_logger().log("llm_queries", log_data)
     
     def query(self, 
                    messages: List[Dict[str, str]], 
@@ -54,6 +232,9 @@ class LLMService:
                    temperature: float = 0,
                    max_tokens: int = 10000,
                    response_format: Dict = None,
+                   stream: bool = False,
+                   on_element: Callable[[str, Any], None] = None,
+                   stream_fields: Iterable[str] = None,
                    **kwargs) -> str:
         """
         查询Azure OpenAI
@@ -64,9 +245,13 @@ class LLMService:
             temperature: 温度参数
             max_tokens: 最大生成token数
             response_format: 响应格式
+            stream: 是否流式接收响应，流式时响应中顶层数组的每个元素一结束就传给on_element
+            on_element: 流式元素回调，参数为 (字段名, 元素)；重试时已传出的元素不会重复传出。
+                传出的元素未经校验，响应可能在之后截断或被判为无效，调用方应以返回的完整响应为准
+            stream_fields: 需要流式解析的顶层数组字段，为None时解析所有顶层数组字段
             
         Returns:
-            LLM响应文本
+            LLM响应文本（流式时为拼接后的完整文本）
         """
         if not self.client:
             logger.error("Azure OpenAI客户端未初始化")
@@ -75,94 +260,255 @@ class LLMService:
         # 使用指定模型或配置中的部署名称
         deployment_name = model if model else self.config.get("deployment_name", "gpt-4o")
         
-        # 记录当前时间戳，用于日志文件名
+        # 记录当前时间戳，用于关联同一查询的多次尝试
         timestamp = int(time.time())
         
+        # 准备请求参数
+        params = self._build_params(deployment_name, messages, max_tokens, response_format, kwargs)
+        
+        # 相同请求直接返回缓存的响应
+        cache_key, cached = self._cache_get(params)
+        if cached is not None:
+            logger.info(f"LLM响应缓存命中: {cache_key[:12]}")
+            if stream and on_element is not None:
+                self._emit_elements(JsonArrayStreamParser(stream_fields), cached, on_element, [0])
+            return cached
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+        # 已传出的流式元素数，跨重试累计
+        emitted = [0]
+        
         for attempt in range(self.max_attempts):
-            try:
-                # 准备请求参数
-                params = {
-                    "model": deployment_name,
+            # 记录输入
+            log_data = {
+                "timestamp": timestamp,
+                "attempt": attempt,
+                "input": {
                     "messages": messages,
-                    "temperature": 0,
-                    "max_tokens": max_tokens,
-                    "response_format": {"type": "json_object"} if response_format is None else response_format,
-                    "frequency_penalty": 0,
-                    "presence_penalty": 0,
-                    "stop": None,
-                    "seed": 42
+                    "params": params
                 }
+            }
+            
+            try:
+                # 执行查询，请求前按估算的token数预占配额
+                self.rate_limiter.acquire(request_tokens)
+                if stream:
+                    response_text = self._stream_completion(params, JsonArrayStreamParser(stream_fields),
+                                                            on_element, emitted)
+                else:
+                    response = self.client.chat.completions.create(**params)
+                    response_text = response.choices[0].message.content
+                self.rate_limiter.on_success()
                 
-                # 合并额外参数
-                params.update(kwargs)
+                # 记录输出
+                log_data["output"] = {
+                    "response": response_text
+                }
                 
-                # 将输入保存到日志
-                log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "llm_queries")
-                os.makedirs(log_dir, exist_ok=True)
+                # 保存日志
+                self._write_log(log_data)
                 
-                log_file = os.path.join(log_dir, f"llm_query_{timestamp}_{attempt}.json")
+                self._cache_put(cache_key, response_text)
+                return response_text
                 
-                # 记录输入
-                log_data = {
-                    "timestamp": timestamp,
-                    "attempt": attempt,
-                    "input": {
-                        "messages": messages,
-                        "params": params
-                    }
-                }
+            except Exception as e:
+                logger.warning(f"Azure OpenAI查询失败（尝试 {attempt+1}/{self.max_attempts}）: {e}")
+                
+                # 记录错误
+                log_data["error"] = str(e)
+                self._write_log(log_data)
                 
-                # 执行查询
-                response = self.client.chat.completions.create(**params)
+                wait_time = self._retry_wait(e, attempt)
+                if wait_time is None:
+                    logger.error(f"请求错误不可重试，查询失败")
+                    return ""
+                if attempt < self.max_attempts - 1:
+                    if wait_time > 0:
+                        logger.info(f"等待 {wait_time:.1f} 秒后重试...")
+                        time.sleep(wait_time)
+                else:
+                    logger.error(f"达到最大尝试次数，查询失败")
+                    return ""
+    
+    def _stream_completion(self, params, parser, on_element, emitted) -> str:
+        """
+        流式执行一次查询
+        
+        Args:
+            params: 请求参数
+            parser: 增量JSON数组元素解析器
+            on_element: 流式元素回调
+            emitted: 单元素列表，已传出的元素数；重试时跳过上次已传出的元素
+            
+        Returns:
+            拼接后的完整响应文本
+        """
+        parts = []
+        for chunk in self.client.chat.completions.create(**params, stream=True):
+            # Azure的首个数据块只包含内容过滤结果，没有choices
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            if on_element is not None:
+                self._emit_elements(parser, delta, on_element, emitted)
+        return "".join(parts)
+    
+    @staticmethod
+    def _emit_elements(parser, text, on_element, emitted):
+        """将新文本送入解析器，并传出尚未传出过的元素"""
+        start = parser.count
+        for index, (field, element) in enumerate(parser.feed(text), start + 1):
+            if index <= emitted[0]:
+                continue
+            emitted[0] = index
+            try:
+                on_element(field, element)
+            except Exception as e:
+                logger.error(f"流式元素回调失败: {e}")
+    
+    def query_many(self, message_batches: List[List[Dict[str, str]]], **kwargs) -> List[str]:
+        """
+        在线程池中并发执行多个同步查询
+        
+        Args:
+            message_batches: 每个请求的输入消息列表
+            **kwargs: 传递给query的其他参数
+            
+        Returns:
+            与输入顺序一致的响应文本列表
+        """
+        if len(message_batches) <= 1:
+            return [self.query(messages, **kwargs) for messages in message_batches]
+        
+        max_workers = min(len(message_batches), self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda messages: self.query(messages, **kwargs), message_batches))
+    
+    async def aquery(self, 
+                     messages: List[Dict[str, str]], 
+                     model: str = None,
+                     temperature: float = 0,
+                     max_tokens: int = 10000,
+                     response_format: Dict = None,
+                     **kwargs) -> str:
+        """
+        异步查询Azure OpenAI
+        
+        同时在途的请求数受 max_concurrent_requests 配置限制，退避等待不会阻塞事件循环。
+        
+        Args:
+            messages: 输入消息
+            model: 模型名称，如果为None则使用配置中的deployment_name
+            temperature: 温度参数
+            max_tokens: 最大生成token数
+            response_format: 响应格式
+            
+        Returns:
+            LLM响应文本
+        """
+        if not self.async_client:
+            logger.error("Azure OpenAI客户端未初始化")
+            return ""
+            
+        # 使用指定模型或配置中的部署名称
+        deployment_name = model if model else self.config.get("deployment_name", "gpt-4o")
+        
+        # 记录当前时间戳，用于关联同一查询的多次尝试
+        timestamp = int(time.time())
+        semaphore = self._get_semaphore()
+        
+        params = self._build_params(deployment_name, messages, max_tokens, response_format, kwargs)
+        cache_key, cached = self._cache_get(params)
+        if cached is not None:
+            logger.info(f"LLM响应缓存命中: {cache_key[:12]}")
+            return cached
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+        
+        for attempt in range(self.max_attempts):
+            log_data = {
+                "timestamp": timestamp,
+                "attempt": attempt,
+                "input": {
+                    "messages": messages,
+                    "params": params
+                }
+            }
+            
+            try:
+                # 在限流器中等待配额时不占用并发名额
+                await self.rate_limiter.aacquire(request_tokens)
+                async with semaphore:
+                    response = await self.async_client.chat.completions.create(**params)
+                self.rate_limiter.on_success()
                 response_text = response.choices[0].message.content
                 
-                # 记录输出
                 log_data["output"] = {
                     "response": response_text
                 }
+                self._write_log(log_data)
                 
-                # 保存日志
-                with open(log_file, 'w', encoding='utf-8') as f:
-                    json.dump(log_data, f, ensure_ascii=False, indent=2)
-                    
-                logger.info(f"LLM查询日志已保存至: {log_file}")
-                
+                self._cache_put(cache_key, response_text)
                 return response_text
                 
             except Exception as e:
-                logger.warning(f"Azure OpenAI查询失败（尝试 {attempt+1}/{self.max_attempts}）: {e}")
+                logger.warning(f"Azure OpenAI异步查询失败（尝试 {attempt+1}/{self.max_attempts}）: {e}")
                 
-                # 记录错误
-                if 'log_data' in locals() and 'log_file' in locals():
-                    log_data["error"] = str(e)
-                    with open(log_file, 'w', encoding='utf-8') as f:
-                        json.dump(log_data, f, ensure_ascii=False, indent=2)
-                        
+                log_data["error"] = str(e)
+                self._write_log(log_data)
+                
+                wait_time = self._retry_wait(e, attempt)
+                if wait_time is None:
+                    logger.error(f"请求错误不可重试，查询失败")
+                    return ""
                 if attempt < self.max_attempts - 1:
-                    # 指数退避
-                    wait_time = (2 ** attempt) + 1
-                    logger.info(f"等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
+                    # 退避等待期间释放并发名额
+                    if wait_time > 0:
+                        logger.info(f"等待 {wait_time:.1f} 秒后重试...")
+                        await asyncio.sleep(wait_time)
                 else:
                     logger.error(f"达到最大尝试次数，查询失败")
                     return ""
     
+    async def aquery_many(self, message_batches: List[List[Dict[str, str]]], **kwargs) -> List[str]:
+        """
+        并发执行多个异步查询
+        
+        Args:
+            message_batches: 每个请求的输入消息列表
+            **kwargs: 传递给aquery的其他参数
+            
+        Returns:
+            与输入顺序一致的响应文本列表
+        """
+        return await asyncio.gather(*(self.aquery(messages, **kwargs) for messages in message_batches))
+    
     async def get_embeddings(self, texts: List[str], model: str = None) -> List[List[float]]:
         """获取文本嵌入"""
-        if not self.client:
+        if not self.async_client:
             logger.error("Azure OpenAI客户端未初始化")
             return []
             
         embedding_model = model if model else "text-embedding-ada-002"
         
-        try:
-            response = await self.client.embeddings.create(
-                model=embedding_model,
-                input=texts
-            )
-            
-            return [item.embedding for item in response.data]
-            
-        except Exception as e:
-            logger.error(f"获取嵌入失败: {e}")
-            return [] 
\ No newline at end of file
+        request_tokens = estimate_request_tokens([{"content": text} for text in texts])
+        for attempt in range(self.max_attempts):
+            try:
+                await self.rate_limiter.aacquire(request_tokens)
+                async with self._get_semaphore():
+                    response = await self.async_client.embeddings.create(
+                        model=embedding_model,
+                        input=texts
+                    )
+                self.rate_limiter.on_success()
+                return [item.embedding for item in response.data]
+                
+            except Exception as e:
+                # 只有被限流时重试，其他错误直接返回
+                if _error_status(e) != 429 or attempt == self.max_attempts - 1:
+                    logger.error(f"获取嵌入失败: {e}")
+                    return []
+                logger.warning(f"获取嵌入被限流（尝试 {attempt+1}/{self.max_attempts}）")
+                self.rate_limiter.on_throttled(_retry_after(e))
+        return [] 
\ No newline at end of file
@@ -0,0 +1,40 @@
+import logging
+import os
+import threading
+
+# 日志只在进程内配置一次，之后创建的服务不再重复打开日志文件
+_configured = False
+_lock = threading.Lock()
+
+def configure_logging(log_file: str = "main.log", level: int = logging.INFO):
+    """
+    配置进程的日志输出（控制台和logs目录下的日志文件），重复调用不生效
+
+    宿主程序已经为根日志器配置了处理器时保留其配置。
+
+    Args:
+        log_file: logs目录下的日志文件名，只有第一次调用时生效
+        level: 日志级别
+    """
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        if logging.getLogger().handlers:
+            return
+
+        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
+        os.makedirs(log_dir, exist_ok=True)
+
+        # 配置日志格式
+        logging.basicConfig(
+            level=level,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(os.path.join(log_dir, log_file), encoding='utf-8'),
+                logging.StreamHandler()
+            ]
+        )
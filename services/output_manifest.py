@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
+
+from services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+class OutputManifest(SQLiteStore):
+    """输出清单，记录每个已处理文档的内容指纹、提示词指纹和流水线版本，用于增量处理"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS documents (
+            document_id TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            prompt_hash TEXT NOT NULL,
+            pipeline_version TEXT NOT NULL,
+            output_file TEXT NOT NULL,
+            processed_at REAL NOT NULL
+        )
+        """,
+    )
+
+    def __init__(self, manifest_path: str = None):
+        """
+        初始化输出清单
+
+        Args:
+            manifest_path: SQLite数据库路径，默认为项目根目录下的cache/manifest.sqlite
+        """
+        if manifest_path is None:
+            manifest_path = self.default_path("manifest.sqlite")
+        super().__init__(manifest_path)
+
+        self.manifest_path = manifest_path
+        logger.info(f"输出清单已就绪: {manifest_path}")
+
+    @staticmethod
+    def fingerprint(*parts: str) -> str:
+        """
+        计算文本内容的指纹
+
+        Args:
+            parts: 参与计算的文本片段，按顺序拼接
+
+        Returns:
+            SHA-256十六进制摘要
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            # 片段之间加入分隔符，避免不同切分方式得到相同指纹
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取文档的清单记录
+
+        Args:
+            document_id: 文档ID
+
+        Returns:
+            清单记录，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, prompt_hash, pipeline_version, output_file, processed_at "
+                "FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "document_id": document_id,
+            "content_hash": row[0],
+            "prompt_hash": row[1],
+            "pipeline_version": row[2],
+            "output_file": row[3],
+            "processed_at": row[4]
+        }
+
+    def is_current(self, document_id: str, content_hash: str, prompt_hash: str,
+                   pipeline_version: str, output_file: str) -> bool:
+        """
+        判断文档是否已按相同的内容、提示词和流水线版本处理过，且输出文件仍然存在
+
+        Args:
+            document_id: 文档ID
+            content_hash: 文档内容指纹
+            prompt_hash: 提示词模板指纹
+            pipeline_version: 流水线版本
+            output_file: 本次运行的输出文件路径
+
+        Returns:
+            是否可以跳过该文档
+        """
+        entry = self.get(document_id)
+        return (
+            entry is not None
+            and entry["content_hash"] == content_hash
+            and entry["prompt_hash"] == prompt_hash
+            and entry["pipeline_version"] == pipeline_version
+            and os.path.abspath(entry["output_file"]) == os.path.abspath(output_file)
+            and os.path.exists(output_file)
+        )
+
+    def record(self, document_id: str, content_hash: str, prompt_hash: str,
+               pipeline_version: str, output_file: str):
+        """
+        记录文档的处理结果
+
+        Args:
+            document_id: 文档ID
+            content_hash: 文档内容指纹
+            prompt_hash: 提示词模板指纹
+            pipeline_version: 流水线版本
+            output_file: 输出文件路径
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(document_id, content_hash, prompt_hash, pipeline_version, output_file, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (document_id, content_hash, prompt_hash, pipeline_version, output_file, time.time())
+            )
+            self._conn.commit()
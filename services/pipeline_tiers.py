@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+from typing import List, Dict, Any, Optional
+
+from algorithms.trigger_matcher import AhoCorasickMatcher
+
+logger = logging.getLogger(__name__)
+
+# 流水线档位：rule只使用规则和SpaCy，adaptive只对有歧义或高风险的文档调用LLM，full每个阶段都调用LLM
+PIPELINE_TIERS = ("rule", "adaptive", "full")
+
+class TierGate:
+    """
+    adaptive档位的LLM门控
+
+    根据触发词和实体数量、SRL要素覆盖率、文档长度和风险关键词等廉价信号，
+    判断传统方法的结果是否已经足够，不够时才调用LLM增强。
+    """
+
+    def __init__(self, max_rule_chars: int = 1500, max_rule_triggers: int = 5, min_srl_coverage: float = 0.5,
+                 risk_keywords_path: str = None):
+        """
+        初始化门控
+
+        Args:
+            max_rule_chars: 只用规则处理的文档的最大字符数
+            max_rule_triggers: 只用规则处理的文档的最大触发词数
+            min_srl_coverage: 只用规则构建事件时，SRL找到施事或受事的事件所占的最小比例
+            risk_keywords_path: 风险关键词文件，默认为config/risk_keywords.json
+        """
+        self.max_rule_chars = max_rule_chars
+        self.max_rule_triggers = max_rule_triggers
+        self.min_srl_coverage = min_srl_coverage
+        self.load_risk_keywords(risk_keywords_path)
+
+    def load_risk_keywords(self, path=None):
+        """
+        加载风险关键词和风险事件类型
+
+        文件格式: {"event_types": ["事件类型", ...], "keywords": ["关键词", ...]}
+
+        Args:
+            path: 风险关键词文件路径，为None时加载config/risk_keywords.json
+        """
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "risk_keywords.json")
+
+        self.risk_event_types = set()
+        self.matcher = AhoCorasickMatcher()
+        # 风险关键词文件内容的SHA-256摘要，文件变化时阶段检查点随之失效
+        self.risk_keywords_digest = None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            self.risk_keywords_digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            config = json.loads(content)
+            self.risk_event_types = set(config.get("event_types", []))
+            for keyword in config.get("keywords", []):
+                self.matcher.add(keyword.lower(), keyword)
+            logger.info(f"加载了 {self.matcher.size} 个风险关键词")
+        except Exception as e:
+            logger.error(f"加载风险关键词失败 {path}: {e}")
+        self.matcher.build()
+
+    def _document_reason(self, text):
+        """文档本身需要LLM的原因：过长或包含风险关键词"""
+        if len(text) > self.max_rule_chars:
+            return f"文档长度 {len(text)} 超过 {self.max_rule_chars}"
+        matches = self.matcher.finditer(text.lower())
+        if matches:
+            return f"包含风险关键词: {matches[0][2]}"
+        return None
+
+    def _risk_type_reason(self, items, type_key):
+        """触发词或事件属于风险事件类型时需要LLM"""
+        for item in items:
+            if item.get(type_key) in self.risk_event_types:
+                return f"风险事件类型: {item.get(type_key)}"
+        return None
+
+    def extraction_reason(self, text: str, entities: List[Dict[str, Any]],
+                          triggers: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        判断实体和触发词提取是否需要LLM增强
+
+        Args:
+            text: 预处理后的文本
+            entities: 传统方法提取的实体
+            triggers: 传统方法提取的触发词
+
+        Returns:
+            需要LLM的原因，传统方法的结果已经足够时返回None
+        """
+        reason = self._document_reason(text) or self._risk_type_reason(triggers, "potential_type")
+        if reason:
+            return reason
+        if len(triggers) > self.max_rule_triggers:
+            return f"触发词数 {len(triggers)} 超过 {self.max_rule_triggers}"
+        if triggers and not entities:
+            return "有触发词但没有识别到实体"
+        return None
+
+    def construction_reason(self, text: str, events: List[Dict[str, Any]],
+                            triggers: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        判断事件构建是否需要LLM增强
+
+        Args:
+            text: 预处理后的文本
+            events: SRL构建的基本事件
+            triggers: 触发词
+
+        Returns:
+            需要LLM的原因，基本事件已经足够时返回None
+        """
+        reason = self._document_reason(text) or self._risk_type_reason(events, "type")
+        if reason:
+            return reason
+        if triggers and not events:
+            return "有触发词但SRL没有构建出事件"
+        if events:
+            covered = sum(1 for event in events
+                          if event.get("elements", {}).get("who") or event.get("elements", {}).get("whom"))
+            coverage = covered / len(events)
+            if coverage < self.min_srl_coverage:
+                return f"SRL要素覆盖率 {coverage:.0%} 低于 {self.min_srl_coverage:.0%}"
+        return None
+
+    def integration_reason(self, text: str, events: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        判断事件整合是否需要LLM
+
+        Args:
+            text: 预处理后的文本
+            events: 带有关系的事件
+
+        Returns:
+            需要LLM的原因，不需要跨事件整合时返回None
+        """
+        reason = self._document_reason(text) or self._risk_type_reason(events, "type")
+        if reason:
+            return reason
+        if len(events) > 1:
+            return f"有 {len(events)} 个事件需要整合"
+        return None
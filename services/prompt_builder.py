@@ -0,0 +1,289 @@
+import re
+import json
+import logging
+import threading
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# 各阶段提示词的默认token预算（不含模型输出）
+DEFAULT_TOKEN_BUDGETS = {
+    "entity_extraction": 12000,
+    "event_construction": 12000,
+    "event_integration": 12000
+}
+
+# 打包请求中各占位符对应的字段名称
+PACKED_FIELD_LABELS = {
+    "text": "文本内容",
+    "entities": "已识别的实体",
+    "triggers": "识别的事件触发词",
+    "events": "初步识别的事件",
+    "document_id": "文档ID"
+}
+
+# 用于估算token数的中日韩字符
+CJK_PATTERN = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+# 进程内共享的tokenizer，按编码名称缓存（加载失败时为None）
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+class PromptBuilder:
+    """提示词构建器，负责以紧凑格式填充模板并控制各阶段的token预算"""
+
+    def __init__(self, token_budgets: Dict[str, int] = None, encoding_name: str = "o200k_base"):
+        """
+        初始化提示词构建器
+
+        Args:
+            token_budgets: 各阶段的token预算，未指定的阶段使用默认值
+            encoding_name: tiktoken编码名称
+        """
+        self.token_budgets = dict(DEFAULT_TOKEN_BUDGETS)
+        if token_budgets:
+            self.token_budgets.update(token_budgets)
+        self.encoding_name = encoding_name
+
+    @property
+    def encoder(self):
+        """进程内共享的tokenizer，首次统计token时加载"""
+        if self.encoding_name not in _encoders:
+            with _encoders_lock:
+                if self.encoding_name not in _encoders:
+                    _encoders[self.encoding_name] = self._load_encoder(self.encoding_name)
+        return _encoders[self.encoding_name]
+
+    def _load_encoder(self, encoding_name):
+        """加载本地tokenizer，不可用时退回字符数估算"""
+        try:
+            import tiktoken
+            return tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning(f"加载tiktoken编码失败，使用字符数估算token: {e}")
+            return None
+
+    def count_tokens(self, text: str) -> int:
+        """
+        统计文本的token数
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            token数
+        """
+        if self.encoder is not None:
+            return len(self.encoder.encode(text, disallowed_special=()))
+
+        # 估算：中日韩字符约1个token，其他字符约4个字符1个token
+        cjk_count = len(CJK_PATTERN.findall(text))
+        return cjk_count + (len(text) - cjk_count + 3) // 4
+
+    @staticmethod
+    def dumps(obj) -> str:
+        """紧凑JSON序列化，不缩进、不转义非ASCII字符"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def compact_entities(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """实体只保留ID、文本和类型，提及位置不进入提示词"""
+        return [
+            {"entity_id": e.get("entity_id"), "text": e.get("text"), "type": e.get("type")}
+            for e in entities
+        ]
+
+    @staticmethod
+    def compact_triggers(triggers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """触发词只保留ID、文本和可能的事件类型"""
+        return [
+            {"trigger_id": t.get("trigger_id"), "text": t.get("text"), "potential_type": t.get("potential_type")}
+            for t in triggers
+        ]
+
+    @staticmethod
+    def compact_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """事件去掉空要素、与原文重复的source_text和触发词位置，位置在整合后从输入中补回"""
+        compacted = []
+        for event in events:
+            event = {k: v for k, v in event.items() if k != "source_text" and v not in (None, "", [], {})}
+            trigger = event.get("trigger")
+            if isinstance(trigger, dict):
+                event["trigger"] = {k: v for k, v in trigger.items() if k != "position"}
+            elements = event.get("elements")
+            if isinstance(elements, dict):
+                event["elements"] = {k: v for k, v in elements.items() if v not in (None, "", [], {})}
+            compacted.append(event)
+        return compacted
+
+    @staticmethod
+    def _entity_value(entity):
+        """实体价值：提及次数越多越重要，OTHER类型价值较低"""
+        return len(entity.get("mentions", [])) + (0 if entity.get("type") == "OTHER" else 1)
+
+    @staticmethod
+    def _trigger_values(triggers):
+        """触发词价值：同一触发词文本的重复出现价值较低"""
+        seen = set()
+        values = []
+        for trigger in triggers:
+            key = str(trigger.get("text", "")).lower()
+            values.append(0 if key in seen else 1)
+            seen.add(key)
+        return values
+
+    @staticmethod
+    def _event_value(event):
+        """事件价值：重要性乘以置信度"""
+        try:
+            return float(event.get("importance", 3)) * float(event.get("confidence", 0.5))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def fill(self, template: str, fields: Dict[str, str]) -> str:
+        """使用安全的替换方法填充模板"""
+        prompt = template
+        for name, value in fields.items():
+            prompt = prompt.replace("{" + name + "}", value)
+        return prompt
+
+    def build(self, stage: str, template: str, text: str, context: Dict[str, List[Dict[str, Any]]] = None,
+              values: Dict[str, List[float]] = None, weights: Dict[str, float] = None,
+              extra_fields: Dict[str, str] = None) -> str:
+        """
+        构建提示词，超出预算时按价值从低到高裁剪上下文列表
+
+        Args:
+            stage: 阶段名称，对应token预算
+            template: 提示词模板
+            text: 文本内容，不参与裁剪
+            context: 占位符名称到紧凑上下文列表的映射
+            values: 与context中各列表一一对应的价值，在列表内归一化
+            weights: 各上下文列表的权重，默认为1
+            extra_fields: 其他直接替换的占位符
+
+        Returns:
+            填充后的提示词
+        """
+        context = context or {}
+        values = values or {}
+        weights = weights or {}
+        base_fields = {"text": text}
+        base_fields.update(extra_fields or {})
+
+        def render(kept):
+            fields = dict(base_fields)
+            for name, items in context.items():
+                fields[name] = self.dumps([item for i, item in enumerate(items) if (name, i) in kept])
+            return self.fill(template, fields)
+
+        everything = {(name, i) for name, items in context.items() for i in range(len(items))}
+        prompt = render(everything)
+        budget = self.token_budgets.get(stage)
+        if not budget or not everything or self.count_tokens(prompt) <= budget:
+            return prompt
+
+        # 各列表的价值归一化后乘以列表权重，使不同列表的条目可以互相比较
+        scores = {}
+        for name, items in context.items():
+            item_values = values.get(name) or [1] * len(items)
+            top = max(item_values) or 1
+            for i, value in enumerate(item_values):
+                scores[(name, i)] = value / top * weights.get(name, 1)
+
+        # 所有上下文条目按价值升序排列，二分查找最少需要丢弃的条目数
+        ranked = sorted(everything, key=lambda key: (scores[key], -key[1]))
+        low, high = 1, len(ranked)
+        while low < high:
+            middle = (low + high) // 2
+            if self.count_tokens(render(everything - set(ranked[:middle]))) <= budget:
+                high = middle
+            else:
+                low = middle + 1
+
+        prompt = render(everything - set(ranked[:low]))
+        logger.info(f"{stage}阶段提示词超出预算 {budget} tokens，裁剪了 {low}/{len(ranked)} 条上下文")
+        return prompt
+
+    def build_extraction_prompt(self, template: str, text: str) -> str:
+        """构建实体与触发词提取提示词"""
+        return self.build("entity_extraction", template, text)
+
+    def build_construction_prompt(self, template: str, text: str, entities, triggers) -> str:
+        """构建事件构建提示词"""
+        return self.build(
+            "event_construction", template, text,
+            context={
+                "entities": self.compact_entities(entities),
+                "triggers": self.compact_triggers(triggers)
+            },
+            values={
+                "entities": [self._entity_value(e) for e in entities],
+                "triggers": self._trigger_values(triggers)
+            },
+            # 事件围绕触发词构建，触发词优先保留
+            weights={"triggers": 2}
+        )
+
+    def build_integration_prompt(self, template: str, text: str, events, entities, document_id) -> str:
+        """构建事件整合提示词"""
+        return self.build(
+            "event_integration", template, text,
+            context={
+                "events": self.compact_events(events),
+                "entities": self.compact_entities(entities)
+            },
+            values={
+                "events": [self._event_value(e) for e in events],
+                "entities": [self._entity_value(e) for e in entities]
+            },
+            weights={"events": 2},
+            extra_fields={"document_id": str(document_id) if document_id else ""}
+        )
+
+    def build_packed_prompt(self, template: str, documents: List[Dict[str, Any]]) -> str:
+        """
+        将多个短文档打包为一个提示词，模板中的任务说明只出现一次
+
+        Args:
+            template: 提示词模板
+            documents: 文档列表，每项包含 document_id（包内ID）、text、
+                context（占位符名称到紧凑上下文列表的映射）和 extra_fields（其他占位符）
+
+        Returns:
+            打包后的提示词，要求以 {"documents": {包内ID: 单文档结果}} 格式返回
+        """
+        names = ["text"]
+        for document in documents:
+            for name in list(document.get("context", {})) + list(document.get("extra_fields", {})):
+                if name not in names:
+                    names.append(name)
+
+        # 模板中的占位符改为指向各文档对应字段的说明
+        references = {name: f"<见各文档的{PACKED_FIELD_LABELS.get(name, name)}>" for name in names}
+        instructions = self.fill(template, references)
+
+        blocks = []
+        for document in documents:
+            document_id = document["document_id"]
+            lines = [f"<<<文档 {document_id}>>>"]
+            for name in names:
+                if name == "text":
+                    value = document["text"]
+                elif name in document.get("context", {}):
+                    value = self.dumps(document["context"][name])
+                else:
+                    value = document.get("extra_fields", {}).get(name, "")
+                lines.append(f"{PACKED_FIELD_LABELS.get(name, name)}:\n{value}")
+            lines.append(f"<<<文档结束 {document_id}>>>")
+            blocks.append("\n".join(lines))
+
+        ids = ", ".join(document["document_id"] for document in documents)
+        return (
+            f"{instructions}\n\n"
+            f"以下共有 {len(documents)} 个文档，每个文档以 <<<文档 ID>>> 开始、以 <<<文档结束 ID>>> 结束。"
+            f"请按上述要求分别独立处理每个文档，不要混用不同文档的信息，位置均相对于该文档自身的文本内容计算。\n"
+            f"请返回一个JSON对象，格式为 {{\"documents\": {{\"文档ID\": 该文档按上述JSON格式的结果}}}}，"
+            f"必须包含全部文档ID: {ids}\n\n"
+            + "\n\n".join(blocks)
+        )
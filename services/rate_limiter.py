@@ -0,0 +1,179 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import List, Dict, Optional
+
+from services.prompt_builder import CJK_PATTERN
+
+logger = logging.getLogger(__name__)
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """
+    估算一次请求占用的token配额
+
+    Azure OpenAI按请求的提示词长度加上max_tokens预估TPM占用，这里采用相同的口径，
+    提示词按中日韩字符约1个token、其他字符约4个字符1个token估算。
+
+    Args:
+        messages: 输入消息
+        max_tokens: 最大生成token数
+
+    Returns:
+        估算的token数
+    """
+    tokens = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = str(content)
+        cjk_count = len(CJK_PATTERN.findall(content))
+        # 每条消息的角色和格式开销约4个token
+        tokens += cjk_count + (len(content) - cjk_count + 3) // 4 + 4
+    return tokens + (max_tokens or 0)
+
+
+class TokenBucket:
+    """令牌桶，按速率持续补充，容量为允许的突发量"""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        """
+        初始化令牌桶
+
+        Args:
+            per_minute: 每分钟配额
+            burst_seconds: 桶容量对应的补充时长（秒）
+        """
+        self.per_minute = per_minute
+        self.burst_seconds = burst_seconds
+        self.tokens = self.capacity(1.0)
+        self.updated = time.monotonic()
+
+    def capacity(self, scale: float) -> float:
+        """当前速率比例下的桶容量"""
+        return self.per_minute / 60 * self.burst_seconds * scale
+
+    def refill(self, now: float, scale: float):
+        """按经过的时间补充令牌"""
+        self.tokens = min(self.capacity(scale), self.tokens + (now - self.updated) * self.per_minute / 60 * scale)
+        self.updated = now
+
+    def wait_time(self, amount: float, scale: float) -> float:
+        """令牌足够前需要等待的秒数（已补充到当前时刻）"""
+        # 超过桶容量的请求在桶满时放行，避免永远等不到
+        amount = min(amount, self.capacity(scale))
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / (self.per_minute / 60 * scale)
+
+
+class AdaptiveRateLimiter:
+    """
+    Azure OpenAI客户端限流器
+
+    按配置的RPM/TPM维护两个令牌桶，请求前按估算的token数预占配额。
+    收到429时遵守Retry-After暂停所有请求，并将速率按乘法减小（AIMD），
+    之后每次成功按加法逐步恢复到配额上限。
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, burst_seconds: float = 10,
+                 min_scale: float = 0.1, increase_step: float = 0.02, decrease_factor: float = 0.5,
+                 default_retry_after: float = 5):
+        """
+        初始化限流器
+
+        Args:
+            rpm: 每分钟请求数配额，为None时不限制
+            tpm: 每分钟token数配额，为None时不限制
+            burst_seconds: 允许的突发量对应的时长（秒），Azure按较短的时间窗口计算配额
+            min_scale: 速率比例下限
+            increase_step: 每次成功后速率比例的增加量
+            decrease_factor: 每次被限流后速率比例的乘数
+            default_retry_after: 429响应没有Retry-After时暂停的秒数
+        """
+        self.request_bucket = TokenBucket(rpm, burst_seconds) if rpm else None
+        self.token_bucket = TokenBucket(tpm, burst_seconds) if tpm else None
+        self.min_scale = min_scale
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.default_retry_after = default_retry_after
+
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """配额足够时预占并返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            buckets = [(bucket, amount) for bucket, amount in
+                       ((self.request_bucket, 1), (self.token_bucket, tokens)) if bucket is not None]
+            for bucket, _ in buckets:
+                bucket.refill(now, self.scale)
+            wait = max((bucket.wait_time(amount, self.scale) for bucket, amount in buckets), default=0.0)
+            if wait > 0:
+                return wait
+
+            for bucket, amount in buckets:
+                bucket.tokens -= min(amount, bucket.capacity(self.scale))
+            return 0.0
+
+    def acquire(self, tokens: int):
+        """
+        阻塞等待直到配额足够
+
+        Args:
+            tokens: 估算的请求token数
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int):
+        """
+        异步等待直到配额足够
+
+        Args:
+            tokens: 估算的请求token数
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        """请求成功，速率比例加法恢复"""
+        with self._lock:
+            self.scale = min(1.0, self.scale + self.increase_step)
+
+    def on_throttled(self, retry_after: float = None):
+        """
+        请求被限流（429），暂停所有请求并将速率比例乘法减小
+
+        Args:
+            retry_after: 响应头中的Retry-After秒数
+        """
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            # 同一暂停期内陆续返回的429来自同一次超额，只减速一次
+            if now >= self.paused_until:
+                self.scale = max(self.min_scale, self.scale * self.decrease_factor)
+            # 加入少量随机抖动，避免暂停结束后所有请求同时重试
+            pause = (retry_after if retry_after is not None else self.default_retry_after) \
+                * (1 + random.uniform(0, 0.1))
+            self.paused_until = max(self.paused_until, now + pause)
+            scale = self.scale
+        logger.warning(f"请求被限流，暂停 {pause:.1f} 秒，速率降至配额的 {scale:.0%}")
+
+    def stats(self) -> Dict[str, float]:
+        """获取限流统计"""
+        return {"scale": round(self.scale, 3), "throttled": self.throttled}
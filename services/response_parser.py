@@ -0,0 +1,403 @@
+import json
+import logging
+import re
+from typing import Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _is_trigger(value: Any) -> bool:
+    """触发词：带文本的对象"""
+    return isinstance(value, dict) and isinstance(value.get("text"), str)
+
+
+def _is_position(value: Any) -> bool:
+    """位置：恰好两个整数的 [开始位置, 结束位置]"""
+    return isinstance(value, list) and len(value) == 2 and all(
+        isinstance(offset, int) and not isinstance(offset, bool) for offset in value)
+
+
+# 各阶段响应的结构约束：列表字段 -> 条目的必需字段和可选字段及其类型（或判断函数），
+# 必需字段覆盖合并时直接读取的所有字段
+RESPONSE_SCHEMAS = {
+    "extraction": {
+        "entities": {"required": {"text": str}, "optional": {"type": str, "mentions": list}},
+        "event_triggers": {"required": {"text": str, "position": _is_position}, "optional": {}}
+    },
+    "construction": {
+        "events": {"required": {"trigger": _is_trigger, "elements": dict}, "optional": {"sentiment": dict}}
+    },
+    "integration": {
+        "events": {"required": {"trigger": _is_trigger, "elements": dict},
+                   "optional": {"sentiment": dict, "relations": list}},
+        "entities": {"required": {"text": str}, "optional": {"type": str, "mentions": list}}
+    }
+}
+
+# Markdown代码块围栏
+CODE_FENCE_PATTERN = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?")
+# 字面量及模型常见的Python写法
+LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+
+class ResponseParseError(ValueError):
+    """LLM响应无法修复为符合阶段结构的JSON"""
+
+    def __init__(self, message: str, truncated: bool = False):
+        """
+        Args:
+            message: 错误信息
+            truncated: 响应是否在JSON结构中途结束（通常是达到max_tokens）
+        """
+        super().__init__(message)
+        self.truncated = truncated
+
+
+def repair_json(text: str) -> Tuple[Any, bool]:
+    """
+    容错解析JSON
+
+    在一次扫描中规范化为合法JSON：去掉代码块围栏和首尾多余文本、尾随逗号，补全相邻元素间缺失的逗号，
+    转换Python风格的字面量；响应中途截断时退回到最外层数组中最后一个完整的元素（不在数组中时为最后一个
+    完整的值）并补全未闭合的括号，写了一半的元素整个丢弃。
+
+    Args:
+        text: LLM响应文本
+
+    Returns:
+        (解析结果, 是否因截断丢弃了末尾内容)
+
+    Raises:
+        ResponseParseError: 无法修复
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ResponseParseError("响应为空")
+    text = CODE_FENCE_PATTERN.sub("", text.strip())
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ResponseParseError("响应中没有JSON对象")
+
+    output = []
+    # 每层容器: [括号, 期望的下一个记号]，对象为 key/colon/value/comma，数组为 value/comma
+    stack = []
+    # 截断时可以退回的位置 (输出长度, 需要补全的括号)
+    safe_point = None
+    truncated = False
+    i = min(starts)
+    length = len(text)
+
+    def closers():
+        return "".join("}" if frame[0] == "{" else "]" for frame in reversed(stack))
+
+    def value_done():
+        nonlocal safe_point
+        if stack:
+            stack[-1][1] = "comma"
+        # 只有最外层数组的元素（或不在任何数组中的值）结束时才是完整的记录，
+        # 元素内部的字段和嵌套数组结束时元素本身仍不完整
+        arrays = sum(1 for frame in stack if frame[0] == "[")
+        if arrays == 0 or (arrays == 1 and stack[-1][0] == "["):
+            safe_point = (len(output), closers())
+
+    def before_value():
+        """在需要值的位置补全缺失的逗号，返回当前位置能否放置值"""
+        frame = stack[-1] if stack else None
+        if frame is None:
+            return not output
+        if frame[1] == "comma":
+            output.append(",")
+            frame[1] = "key" if frame[0] == "{" else "value"
+        return frame[1] in ("key", "value")
+
+    while i < length:
+        char = text[i]
+        if char.isspace():
+            i += 1
+            continue
+        if stack == [] and output:
+            # 顶层值已经结束，忽略之后的说明文字
+            break
+
+        if char in "{[":
+            if not before_value() or (stack and stack[-1][1] == "key"):
+                raise ResponseParseError(f"位置 {i} 处不应出现 {char}")
+            output.append(char)
+            stack.append([char, "key" if char == "{" else "value"])
+            i += 1
+        elif char in "}]":
+            if not stack:
+                raise ResponseParseError(f"位置 {i} 处的 {char} 没有对应的开括号")
+            expected = "}" if stack[-1][0] == "{" else "]"
+            if char != expected or stack[-1][1] == "colon":
+                raise ResponseParseError(f"位置 {i} 处的 {char} 与开括号不匹配")
+            if stack[-1][1] == "value" and stack[-1][0] == "{":
+                # 键后缺少值，无法可靠修复
+                raise ResponseParseError(f"位置 {i} 处的键缺少值")
+            if output[-1] == ",":
+                output.pop()
+            stack.pop()
+            output.append(char)
+            value_done()
+            i += 1
+        elif char == ",":
+            if stack and stack[-1][1] == "comma":
+                output.append(",")
+                stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+            # 其他位置的逗号（重复或多余）直接忽略
+            i += 1
+        elif char == ":":
+            if not stack or stack[-1][1] != "colon":
+                raise ResponseParseError(f"位置 {i} 处不应出现冒号")
+            output.append(":")
+            stack[-1][1] = "value"
+            i += 1
+        elif char in "\"'":
+            # 逐字符查找结束引号，单引号字符串转换为双引号
+            j = i + 1
+            chars = []
+            while j < length and text[j] != char:
+                if text[j] == "\\" and j + 1 < length:
+                    chars.append(text[j:j + 2])
+                    j += 2
+                    continue
+                chars.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            if j >= length:
+                truncated = True
+                break
+            is_key = bool(stack) and stack[-1][0] == "{" and stack[-1][1] in ("key", "comma")
+            if not before_value():
+                raise ResponseParseError(f"位置 {i} 处不应出现字符串")
+            content = "".join(chars)
+            if char == "'":
+                content = content.replace("\\'", "'")
+            output.append('"' + content + '"')
+            if is_key:
+                stack[-1][1] = "colon"
+            else:
+                value_done()
+            i = j + 1
+        else:
+            match = NUMBER_PATTERN.match(text, i)
+            token = match.group(0) if match else None
+            if token is None:
+                word = re.match(r"[A-Za-z]+", text[i:])
+                token = word.group(0) if word else None
+                if token not in LITERALS:
+                    if word and i + len(token) >= length and any(
+                            literal.startswith(token) for literal in LITERALS):
+                        truncated = True
+                        break
+                    raise ResponseParseError(f"位置 {i} 处无法解析: {text[i:i + 20]!r}")
+                value = LITERALS[token]
+            else:
+                value = token
+            if i + len(token) >= length and stack:
+                # 数值或字面量恰好在响应末尾，可能不完整
+                truncated = True
+                break
+            if not before_value() or (stack and stack[-1][1] == "key"):
+                raise ResponseParseError(f"位置 {i} 处不应出现值 {token}")
+            output.append(value)
+            value_done()
+            i += len(token)
+
+    if stack:
+        truncated = True
+    if truncated:
+        if safe_point is None or safe_point[0] == 0:
+            raise ResponseParseError("响应在第一个完整的值之前截断", truncated=True)
+        output = output[:safe_point[0]]
+        output.append(safe_point[1])
+
+    try:
+        # 字符串中未转义的换行等控制字符按原样保留
+        return json.loads("".join(output), strict=False), truncated
+    except json.JSONDecodeError as e:
+        raise ResponseParseError(f"修复后仍无法解析: {e}", truncated=truncated)
+
+
+def validate_response(stage: str, result: Any) -> Tuple[Dict[str, Any], int]:
+    """
+    按阶段结构校验响应
+
+    缺失的列表字段补为空列表，不符合条目结构的条目被丢弃，类型错误的可选字段被删除。
+
+    Args:
+        stage: 阶段名称
+        result: 解析后的响应
+
+    Returns:
+        (校验后的响应, 丢弃的条目数)
+
+    Raises:
+        ResponseParseError: 响应不是对象、没有任何列表字段或列表字段类型错误
+    """
+    schema = RESPONSE_SCHEMAS[stage]
+    if not isinstance(result, dict):
+        raise ResponseParseError(f"响应应为JSON对象，实际为 {type(result).__name__}")
+    if not any(field in result for field in schema):
+        raise ResponseParseError(f"响应缺少字段: {', '.join(schema)}")
+
+    dropped = 0
+    for field, item_schema in schema.items():
+        items = result.get(field, [])
+        if not isinstance(items, list):
+            raise ResponseParseError(f"字段 {field} 应为列表，实际为 {type(items).__name__}")
+
+        valid = []
+        for item in items:
+            if not isinstance(item, dict) or not all(
+                    _matches(item.get(key), expected) for key, expected in item_schema["required"].items()):
+                dropped += 1
+                continue
+            for key, expected in item_schema["optional"].items():
+                if key in item and not _matches(item[key], expected):
+                    del item[key]
+            valid.append(item)
+        result[field] = valid
+    return result, dropped
+
+
+def _matches(value: Any, expected) -> bool:
+    """值是否符合结构约束中的类型或判断函数"""
+    if isinstance(expected, type):
+        return isinstance(value, expected)
+    return expected(value)
+
+
+def parse_response(stage: str, response: Any) -> Tuple[Dict[str, Any], bool]:
+    """
+    解析并校验一个阶段的LLM响应
+
+    Args:
+        stage: 阶段名称
+        response: 响应文本，或打包请求中已解析的单文档结果
+
+    Returns:
+        (校验后的响应, 是否经过修复)
+
+    Raises:
+        ResponseParseError: 无法修复或不符合阶段结构
+    """
+    repaired = truncated = False
+    if isinstance(response, str):
+        try:
+            result = json.loads(response)
+        except json.JSONDecodeError:
+            result, truncated = repair_json(response)
+            repaired = True
+            logger.info(f"{stage}阶段响应已修复" + ("，丢弃了截断的末尾内容" if truncated else ""))
+    else:
+        result = response
+
+    try:
+        result, dropped = validate_response(stage, result)
+    except ResponseParseError as e:
+        # 截断后剩余的内容不足以构成阶段结果时，仍按截断处理
+        e.truncated = e.truncated or truncated
+        raise
+    if dropped:
+        logger.warning(f"{stage}阶段响应中有 {dropped} 个条目不符合结构，已丢弃")
+    return result, repaired
+
+
+class JsonArrayStreamParser:
+    """
+    增量JSON数组元素解析器
+
+    逐段输入流式响应的文本，顶层对象中指定数组字段的每个元素一结束就解析并返回，
+    不需要等待整个响应生成完毕。
+    """
+
+    def __init__(self, fields=None):
+        """
+        初始化解析器
+
+        Args:
+            fields: 需要解析的顶层数组字段名，为None时解析所有顶层数组字段
+        """
+        self.fields = set(fields) if fields is not None else None
+        self.text = ""
+        # 已解析出的元素数
+        self.count = 0
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        # 当前正在解析的数组字段及元素的开始位置
+        self._field = None
+        self._element_start = None
+
+    def feed(self, chunk: str):
+        """
+        输入一段响应文本
+
+        Args:
+            chunk: 新生成的文本
+
+        Returns:
+            本段文本中结束的 (字段名, 元素) 列表
+        """
+        self.text += chunk
+        elements = []
+        text = self.text
+        for position in range(self._position, len(text)):
+            char = text[position]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1:position]
+                    elif self._depth == 2 and self._element_start == self._string_start:
+                        self._emit(elements, position + 1)
+                continue
+
+            if self._field is not None and self._depth == 2 and self._element_start is None \
+                    and not char.isspace() and char not in ",]":
+                self._element_start = position
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and (self.fields is None or self._key in self.fields):
+                    self._field = self._key
+                    self._element_start = None
+            elif char in "}]":
+                if self._field is not None and self._depth == 2 and self._element_start is not None:
+                    # 数组结束前的最后一个数值或字面量元素
+                    self._emit(elements, position)
+                self._depth -= 1
+                if self._depth == 2 and self._field is not None and self._element_start is not None:
+                    self._emit(elements, position + 1)
+                elif self._depth == 1:
+                    self._field = None
+            elif char == "," and self._field is not None and self._depth == 2 and self._element_start is not None:
+                self._emit(elements, position)
+        self._position = len(text)
+        return elements
+
+    def _emit(self, elements, end):
+        """解析 [元素开始位置, end) 的文本，无法解析的元素留给完整响应的解析处理"""
+        raw = self.text[self._element_start:end]
+        self._element_start = None
+        try:
+            elements.append((self._field, json.loads(raw, strict=False)))
+            self.count += 1
+        except json.JSONDecodeError:
+            logger.debug(f"流式元素无法解析，跳过: {raw[:50]}")
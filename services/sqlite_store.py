@@ -0,0 +1,86 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 各存储默认的数据目录
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache")
+
+class SQLiteStore:
+    """
+    SQLite持久化存储基类
+
+    负责打开数据库（WAL模式，一个连接在线程间共享并由锁保护）、建表、清理过期记录和按最近使用时间淘汰，
+    子类在SCHEMA中声明建表语句。
+    """
+
+    # 建表和建索引语句
+    SCHEMA = ()
+
+    def __init__(self, db_path: str):
+        """
+        打开数据库并建表
+
+        Args:
+            db_path: SQLite数据库路径，所在目录不存在时创建
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    @staticmethod
+    def default_path(*parts: str) -> str:
+        """项目根目录下cache目录中的路径"""
+        return os.path.join(DEFAULT_STORE_DIR, *parts)
+
+    def _delete_expired(self, table: str, time_column: str, ttl: float) -> int:
+        """
+        删除time_column早于有效期的记录，调用方负责加锁和提交
+
+        Args:
+            table: 表名
+            time_column: 记录时间的列
+            ttl: 有效期（秒），为None或0时不删除
+
+        Returns:
+            删除的记录数
+        """
+        if not ttl:
+            return 0
+        cursor = self._conn.execute(f"DELETE FROM {table} WHERE {time_column} < ?", (time.time() - ttl,))
+        return cursor.rowcount
+
+    def _evict_overflow(self, table: str, key_column: str, order_column: str, max_rows: int) -> int:
+        """
+        记录数超出max_rows时按order_column从小到大淘汰，调用方负责加锁和提交
+
+        Args:
+            table: 表名
+            key_column: 主键列
+            order_column: 淘汰顺序依据的列（如最近访问时间）
+            max_rows: 最大记录数，为None或0时不限制
+
+        Returns:
+            淘汰的记录数
+        """
+        if not max_rows:
+            return 0
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        overflow = count - max_rows
+        if overflow <= 0:
+            return 0
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE {key_column} IN "
+            f"(SELECT {key_column} FROM {table} ORDER BY {order_column} ASC LIMIT ?)",
+            (overflow,)
+        )
+        return overflow
@@ -0,0 +1,90 @@
+import json
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+class StageCheckpointStore(SQLiteStore):
+    """流水线阶段检查点，按阶段键（输入指纹与阶段配置的链式哈希）保存各阶段的中间输出"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            key TEXT PRIMARY KEY,
+            stage TEXT NOT NULL,
+            output TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_checkpoints_accessed ON checkpoints (accessed_at)"
+    )
+
+    def __init__(self, checkpoint_path: str = None, ttl: float = 7 * 24 * 3600, max_entries: int = 30000):
+        """
+        初始化检查点存储
+
+        Args:
+            checkpoint_path: SQLite数据库路径，默认为项目根目录下的cache/checkpoints.sqlite
+            ttl: 检查点有效期（秒），过期的检查点在打开时清理；为None或0时永不过期
+            max_entries: 最大检查点数，超出时按最近最少使用淘汰；为None或0时不限制
+        """
+        if checkpoint_path is None:
+            checkpoint_path = self.default_path("checkpoints.sqlite")
+        super().__init__(checkpoint_path)
+
+        self.checkpoint_path = checkpoint_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        with self._lock:
+            self._delete_expired("checkpoints", "created_at", ttl)
+            self._evict_overflow("checkpoints", "key", "accessed_at", max_entries)
+            self._conn.commit()
+        logger.info(f"阶段检查点存储已就绪: {checkpoint_path}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取阶段输出
+
+        Args:
+            key: 阶段键
+
+        Returns:
+            阶段输出，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT output FROM checkpoints WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE checkpoints SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError as e:
+            logger.warning(f"检查点内容无法解析，忽略: {key}: {e}")
+            return None
+
+    def put(self, key: str, stage: str, output: Dict[str, Any]):
+        """
+        保存阶段输出，超出容量时淘汰最近最少使用的检查点
+
+        Args:
+            key: 阶段键
+            stage: 阶段名称
+            output: 阶段输出（可JSON序列化）
+        """
+        payload = json.dumps(output, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (key, stage, output, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, stage, payload, now, now)
+            )
+            self._evict_overflow("checkpoints", "key", "accessed_at", self.max_entries)
+            self._conn.commit()
@@ -0,0 +1,153 @@
+import re
+import logging
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# 句子结束标记：中文句末标点，以及后接空白或文本结尾的英文句号/问号/感叹号
+SENTENCE_END_PATTERN = re.compile(r'[。！？；]+|[.!?]+(?=\s|$)')
+
+class TextChunker:
+    """按句子边界将长文本切分为带重叠的文本块"""
+
+    def __init__(self, max_chars: int = 6000, overlap_sentences: int = 1):
+        """
+        初始化文本切分器
+
+        Args:
+            max_chars: 每个文本块的最大字符数
+            overlap_sentences: 相邻文本块之间重叠的句子数
+        """
+        self.max_chars = max_chars
+        self.overlap_sentences = overlap_sentences
+
+    def split_sentences(self, text: str) -> List[List[int]]:
+        """
+        切分句子
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            句子的 [开始位置, 结束位置] 列表
+        """
+        spans = []
+        start = 0
+        for match in SENTENCE_END_PATTERN.finditer(text):
+            end = match.end()
+            if text[start:end].strip():
+                spans.append([start, end])
+            start = end
+        if text[start:].strip():
+            spans.append([start, len(text)])
+
+        # 超长句子按最大长度硬切分
+        result = []
+        for start, end in spans:
+            while end - start > self.max_chars:
+                result.append([start, start + self.max_chars])
+                start += self.max_chars
+            result.append([start, end])
+        return result
+
+    def split(self, text: str) -> List[Dict[str, Any]]:
+        """
+        将文本切分为文本块
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            文本块列表，每个文本块包含chunk_id、text以及在原文中的start和end
+        """
+        if len(text) <= self.max_chars:
+            return [{"chunk_id": 0, "text": text, "start": 0, "end": len(text)}]
+
+        sentences = self.split_sentences(text)
+        chunks = []
+        index = 0
+        while index < len(sentences):
+            # 贪心地向当前块添加句子，直到超出长度限制
+            first = index
+            chunk_start = sentences[first][0]
+            while index < len(sentences) and (index == first or sentences[index][1] - chunk_start <= self.max_chars):
+                index += 1
+            chunk_end = sentences[index - 1][1]
+
+            chunks.append({
+                "chunk_id": len(chunks),
+                "text": text[chunk_start:chunk_end],
+                "start": chunk_start,
+                "end": chunk_end
+            })
+
+            # 下一块从末尾若干句开始，保证跨块的上下文不丢失；
+            # 重叠部分加上下一句超出长度限制时减少重叠句数
+            if index < len(sentences):
+                for overlap in range(self.overlap_sentences, 0, -1):
+                    candidate = index - overlap
+                    if candidate > first and sentences[index][1] - sentences[candidate][0] <= self.max_chars:
+                        index = candidate
+                        break
+
+        logger.info(f"文本长度 {len(text)} 字符，切分为 {len(chunks)} 个文本块")
+        return chunks
+
+
+def shift_position(position, offset: int):
+    """将 [开始位置, 结束位置] 平移offset，格式不正确时原样返回"""
+    if isinstance(position, (list, tuple)) and len(position) == 2 \
+            and all(isinstance(p, int) for p in position):
+        return [position[0] + offset, position[1] + offset]
+    return position
+
+
+def shift_entities(entities: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+    """复制实体列表并平移所有提及的位置"""
+    shifted = []
+    for entity in entities:
+        entity = dict(entity)
+        entity["mentions"] = [
+            dict(mention, position=shift_position(mention["position"], offset)) if "position" in mention else mention
+            for mention in entity.get("mentions", [])
+        ]
+        shifted.append(entity)
+    return shifted
+
+
+def shift_triggers(triggers: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+    """复制触发词列表并平移位置"""
+    return [
+        dict(trigger, position=shift_position(trigger["position"], offset)) if "position" in trigger else trigger
+        for trigger in triggers
+    ]
+
+
+def _in_chunk(position, chunk: Dict[str, Any]) -> bool:
+    """判断位置是否落在文本块内"""
+    return isinstance(position, (list, tuple)) and len(position) == 2 \
+        and chunk["start"] <= position[0] and position[1] <= chunk["end"]
+
+
+def entities_in_chunk(entities: List[Dict[str, Any]], chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    选出在文本块内出现的实体，提及位置转换为相对文本块的位置
+
+    没有位置信息的实体按文本是否出现在文本块中判断。
+    """
+    selected = []
+    chunk_text = chunk["text"].lower()
+    for entity in entities:
+        mentions = [m for m in entity.get("mentions", []) if _in_chunk(m.get("position"), chunk)]
+        if mentions:
+            selected.append(dict(entity, mentions=mentions))
+        elif not any(isinstance(m.get("position"), (list, tuple)) for m in entity.get("mentions", [])) \
+                and entity.get("text", "").lower() in chunk_text:
+            selected.append(dict(entity))
+    return shift_entities(selected, -chunk["start"])
+
+
+def triggers_in_chunk(triggers: List[Dict[str, Any]], chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """选出位于文本块内的触发词，位置转换为相对文本块的位置"""
+    selected = [t for t in triggers if _in_chunk(t.get("position"), chunk)]
+    return shift_triggers(selected, -chunk["start"])
@@ -2,6 +2,8 @@ import os
 import json
 import logging
 
+from services.log_config import configure_logging
+
 logger = logging.getLogger(__name__)
 
 class TextProcessor:
@@ -13,18 +15,7 @@ class TextProcessor:
     
     def setup_logging(self):
         """设置日志"""
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 配置日志格式
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(os.path.join(log_dir, "text_processor.log"), encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging("text_processor.log")
     
     def read_text_file(self, file_path):
         """
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import socket
+from typing import Dict, Any
+
+from services.document_sources import is_multi_document_source
+from services.output_manifest import OutputManifest
+
+logger = logging.getLogger(__name__)
+
+# 常驻进程默认的本地套接字路径
+DEFAULT_SOCKET_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "event_extractor.sock")
+
+class WarmServer:
+    """
+    常驻事件提取进程
+
+    启动时预先加载SpaCy模型、Azure OpenAI客户端、提示词模板和tokenizer，
+    之后通过本地Unix套接字接收文档，省去每次命令行调用的启动开销。
+    协议为每行一个JSON请求、每行一个JSON响应，同一连接可以连续发送多个请求；请求按到达顺序逐个处理。
+    """
+
+    def __init__(self, extractor, socket_path: str = None):
+        """
+        初始化常驻进程
+
+        Args:
+            extractor: 事件提取器
+            socket_path: 本地套接字路径，默认为项目根目录下的cache/event_extractor.sock
+        """
+        self.extractor = extractor
+        self.socket_path = socket_path or DEFAULT_SOCKET_PATH
+        self._running = False
+
+    def warm(self):
+        """预先加载模型、客户端、响应缓存和提示词，使第一个文档不承担加载开销"""
+        extractor = self.extractor
+        extractor.ner_extractor.load_model()
+        extractor.llm_service.init_client()
+        extractor.llm_service.init_cache()
+        # 提示词指纹会读取所有提示词模板并打开增量处理清单
+        extractor.prompt_hash
+        extractor.manifest
+        extractor.prompt_builder.encoder
+        logger.info("常驻进程预热完成")
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理一个请求
+
+        支持的请求：
+        - {"command": "ping"}
+        - {"command": "shutdown"}
+        - {"path": 文件或数据源路径, "document_id": 可选, "force": 可选}
+        - {"text": 文本, "document_id": 可选, "force": 可选}
+
+        Args:
+            request: 请求对象
+
+        Returns:
+            响应对象，ok表示是否成功
+        """
+        command = request.get("command", "extract")
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if command == "shutdown":
+            self._running = False
+            return {"ok": True}
+        if command != "extract":
+            return {"ok": False, "error": f"未知的命令: {command}"}
+
+        force = bool(request.get("force", False))
+        path = request.get("path")
+        if path:
+            if is_multi_document_source(path):
+                stats = self.extractor.extract_events_from_corpus([path], max_workers=1, force=force)
+                return {"ok": True, "stats": stats}
+            document_id = request.get("document_id") or os.path.basename(path)
+            result = self.extractor.extract_events_from_file(path, document_id, force=force)
+        elif "text" in request:
+            text = request["text"]
+            document_id = request.get("document_id") or OutputManifest.fingerprint(text)[:16]
+            result = self.extractor.extract_and_save(text, document_id, force=force)
+        else:
+            return {"ok": False, "error": "请求缺少path或text"}
+
+        if result is None:
+            return {"ok": False, "document_id": document_id, "error": "事件提取失败"}
+        return {
+            "ok": True,
+            "document_id": document_id,
+            "output_file": self.extractor._output_file(document_id),
+            "result": result
+        }
+
+    def serve_forever(self):
+        """预热后监听本地套接字，直到收到shutdown请求或被中断"""
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("当前平台不支持Unix套接字，无法启动常驻进程")
+
+        self.warm()
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        # 清理上次异常退出遗留的套接字文件
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen()
+        self._running = True
+        logger.info(f"常驻进程已启动，监听: {self.socket_path}")
+
+        try:
+            while self._running:
+                connection, _ = server.accept()
+                with connection:
+                    self._serve_connection(connection)
+        except KeyboardInterrupt:
+            logger.info("常驻进程被中断")
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            logger.info("常驻进程已退出")
+
+    def _serve_connection(self, connection):
+        """逐行读取请求并返回响应，客户端关闭连接或收到shutdown后结束"""
+        with connection.makefile("rb") as reader, connection.makefile("wb") as writer:
+            for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    response = self.handle(json.loads(line))
+                except Exception as e:
+                    logger.error(f"处理常驻进程请求失败: {e}")
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                writer.flush()
+                if not self._running:
+                    break
+
+
+def send_request(request: Dict[str, Any], socket_path: str = None, timeout: float = None) -> Dict[str, Any]:
+    """
+    向常驻进程发送一个请求
+
+    Args:
+        request: 请求对象（格式见WarmServer.handle）
+        socket_path: 本地套接字路径，默认为项目根目录下的cache/event_extractor.sock
+        timeout: 超时秒数，为None时一直等待
+
+    Returns:
+        响应对象
+
+    Raises:
+        OSError: 常驻进程未启动或连接中断
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path or DEFAULT_SOCKET_PATH)
+        client.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        with client.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("常驻进程没有返回响应")
+    return json.loads(line)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# 测试从项目根目录导入services和algorithms
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 测试不写分析日志
+os.environ["PUBLICMONITOR_ANALYSIS_LOG"] = "off"
+
+
+@pytest.fixture
+def extractor(tmp_path):
+    """不使用检查点、清单和缓存都在临时目录中的事件提取器"""
+    from services.event_extractor import EventExtractor
+
+    extractor = EventExtractor(manifest_path=str(tmp_path / "manifest.sqlite"), use_checkpoints=False)
+    extractor.llm_service.cache = None
+    return extractor
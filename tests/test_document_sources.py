@@ -0,0 +1,61 @@
+import json
+
+from services import document_sources
+from services.document_sources import (iter_csv_documents, iter_json_array, iter_jsonl_documents,
+                                       iter_mediacrawler_documents)
+
+
+def test_csv_joins_text_columns_and_falls_back_to_line_number(tmp_path):
+    path = tmp_path / "monitor.csv"
+    path.write_text("id,事件描述,详细描述,来源\n"
+                    "A1,云服务故障, 工程师正在排查 ,微博\n"
+                    ",只有事件描述,,论坛\n"
+                    "A3,,,新闻\n", encoding="utf-8-sig")
+
+    documents = list(iter_csv_documents(str(path)))
+    assert [(document_id, text) for document_id, text, _ in documents] == [
+        ("A1", "云服务故障\n工程师正在排查"),
+        ("monitor_3", "只有事件描述")
+    ]
+    assert documents[0][2] == {"id": "A1", "来源": "微博", "source": str(path)}
+
+
+def test_jsonl_skips_invalid_lines_and_falls_back_to_line_number(tmp_path):
+    path = tmp_path / "posts.jsonl"
+    path.write_text('{"id": 7, "text": "宣布裁员"}\n'
+                    'not json\n'
+                    '{"content": "服务中断"}\n', encoding="utf-8")
+    assert [(document_id, text) for document_id, text, _ in iter_jsonl_documents(str(path))] == [
+        ("7", "宣布裁员"), ("posts_3", "服务中断")
+    ]
+
+
+def test_json_array_elements_split_across_reads(tmp_path, monkeypatch):
+    """每次只读入几个字符时，跨越读取边界的对象、字符串和数字都能完整解析"""
+    items = [{"note_id": "n1", "desc": "长" * 20}, 12345678, "结尾的字符串", [1, 2]]
+    path = tmp_path / "items.json"
+    path.write_text(" \n" + json.dumps(items, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    monkeypatch.setattr(document_sources, "JSON_READ_SIZE", 5)
+    assert list(iter_json_array(str(path))) == items
+
+
+def test_mediacrawler_skips_creator_files(tmp_path):
+    json_dir = tmp_path / "xhs" / "json"
+    json_dir.mkdir(parents=True)
+    (json_dir / "search_contents_2024-01-01.json").write_text(json.dumps([
+        {"note_id": "n1", "title": "服务故障", "desc": "服务故障，工程师正在排查"},
+        {"note_id": "n2", "title": ""}
+    ], ensure_ascii=False), encoding="utf-8")
+    (json_dir / "search_creator_2024-01-01.json").write_text(json.dumps([
+        {"user_id": "u1", "desc": "个人简介"}
+    ], ensure_ascii=False), encoding="utf-8")
+    (tmp_path / "xhs" / "search_comments_2024-01-01.csv").write_text(
+        "comment_id,content\nc1,已经恢复了\n", encoding="utf-8")
+
+    documents = list(iter_mediacrawler_documents(str(tmp_path)))
+    assert [(document_id, text) for document_id, text, _ in documents] == [
+        ("xhs_comments_c1", "已经恢复了"),
+        ("xhs_contents_n1", "服务故障，工程师正在排查")
+    ]
+    assert documents[1][2]["platform"] == "xhs"
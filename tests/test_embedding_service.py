@@ -0,0 +1,18 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.embedding_service import EmbeddingService
+
+
+def test_embed_is_sync_only():
+    """同步接口在事件循环外可用，在协程中调用时给出明确错误"""
+    service = EmbeddingService(SimpleNamespace(config={"cache_enabled": False}))
+    assert service.embed([]).shape == (0, 0)
+
+    async def call_from_coroutine():
+        return service.embed(["文本"])
+
+    with pytest.raises(RuntimeError, match="aembed"):
+        asyncio.run(call_from_coroutine())
@@ -0,0 +1,37 @@
+from algorithms.entity_index import EntityIndex
+
+
+def test_find_by_text_is_case_insensitive_and_prefers_earlier_entities():
+    entities = [{"text": "Apple Inc"}, {"text": "apple inc"}]
+    index = EntityIndex(entities)
+    assert index.find_by_text("  APPLE INC ") is entities[0]
+
+
+def test_find_by_text_falls_back_to_partial_match_in_entity_order():
+    """没有完全匹配时返回文本互相包含的第一个实体"""
+    entities = [{"text": "华为"}, {"text": "华为技术有限公司"}, {"text": "工信部"}]
+    index = EntityIndex(entities)
+    assert index.find_by_text("华为技术") is entities[0]
+    assert index.find_by_text("技术有限") is entities[1]
+    assert index.find_by_text("小米") is None
+
+
+def test_find_by_span_finds_long_mention_behind_shorter_ones():
+    """区间落在长提及内部、之前还有较短提及时，借助前缀最大结束位置回溯到长提及"""
+    entities = [
+        {"text": "上海市浦东新区张江高科技园区", "mentions": [{"position": [0, 20]}]},
+        {"text": "浦东", "mentions": [{"position": [3, 5]}]},
+        {"text": "张江", "mentions": [{"position": [7, 9]}]}
+    ]
+    index = EntityIndex(entities)
+    assert index.find_by_span(12, 14) is entities[0]
+    # 被区间覆盖的提及
+    assert index.find_by_span(6, 10) is entities[0]
+    assert EntityIndex(entities[1:]).find_by_span(6, 10) is entities[2]
+
+
+def test_find_by_span_returns_none_outside_every_mention():
+    entities = [{"text": "浦东", "mentions": [{"position": [3, 5]}, {"position": "invalid"}]}]
+    index = EntityIndex(entities)
+    assert index.find_by_span(25, 27) is None
+    assert index.find_by_span(4, 6) is None
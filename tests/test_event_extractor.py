@@ -0,0 +1,95 @@
+def test_merge_chunk_integrations_renumbers_events_per_chunk(extractor):
+    """两个文本块都从EV1开始编号时，两个事件都保留，块内关系指向重新编号后的ID"""
+    first = {"chunk_id": 0, "text": "甲公司宣布裁员。", "start": 0, "end": 8}
+    second = {"chunk_id": 1, "text": "乙公司发布新品。乙公司股价上涨。", "start": 8, "end": 24}
+    chunk_results = [
+        (first, {"events": [{"event_id": "EV1", "trigger": {"text": "裁员", "position": [5, 7]}}]}),
+        (second, {"events": [
+            {"event_id": "EV1", "trigger": {"text": "发布", "position": [3, 5]}},
+            {"event_id": "EV2", "trigger": {"text": "上涨", "position": [13, 15]},
+             "relations": [{"related_event_id": "EV1", "relation_type": "CAUSAL"}]}
+        ]})
+    ]
+
+    result = extractor._merge_chunk_integrations(chunk_results, "doc")
+
+    events = result["events"]
+    assert [event["event_id"] for event in events] == ["EV1", "EV2", "EV3"]
+    assert [event["trigger"]["text"] for event in events] == ["裁员", "发布", "上涨"]
+    assert events[2]["relations"] == [{"related_event_id": "EV2", "relation_type": "CAUSAL"}]
+
+
+def test_restore_positions_copies_offsets_from_integration_inputs(extractor):
+    """整合结果中的触发词位置和实体提及来自输入，模型给出的无法对应的位置被去掉"""
+    events = [{"event_id": "EV1", "trigger": {"trigger_id": "T1", "text": "裁员", "position": [40, 42]}}]
+    entities = [{"entity_id": "E1", "text": "甲公司", "type": "ORGANIZATION",
+                 "mentions": [{"text": "甲公司", "position": [35, 38]}]}]
+    final_result = {
+        "events": [
+            {"event_id": "EV1", "trigger": {"trigger_id": "T1", "text": "裁员"}},
+            {"event_id": "EV2", "trigger": {"text": "上涨", "position": [1, 3]}}
+        ],
+        "entities": [{"entity_id": "E1", "text": "甲公司", "type": "ORGANIZATION"}]
+    }
+
+    extractor._restore_positions(final_result, events, entities)
+
+    assert final_result["events"][0]["trigger"]["position"] == [40, 42]
+    assert "position" not in final_result["events"][1]["trigger"]
+    assert final_result["entities"][0]["mentions"] == [{"text": "甲公司", "position": [35, 38]}]
+
+
+def test_query_packed_falls_back_for_truncated_and_invalid_documents(extractor):
+    """截断处所在的文档和不符合结构的文档结果为None，由单文档请求重新处理"""
+    extractor.pack_size = 3
+    response = ('{"documents": {"D1": {"entities": [{"text": "甲公司"}], "event_triggers": []}, '
+                '"D2": {"entities": "无"}, '
+                '"D3": {"entities": [{"text": "乙公司"}, {"text": "丙')
+    extractor.llm_service.query_many = lambda batches, **kwargs: [response] * len(batches)
+    documents = [{"text": text} for text in ("甲公司宣布裁员。", "今天天气不错。", "乙公司和丙公司合并。")]
+
+    results = extractor._query_packed("extraction", documents)
+
+    assert results[0] == {"entities": [{"text": "甲公司"}], "event_triggers": []}
+    assert results[1] is None
+    assert results[2] is None
+
+
+def test_truncated_response_is_continued_as_plain_text(extractor):
+    """截断且无法修复的响应请求以纯文本续写，续写内容与原响应拼接后解析"""
+    calls = []
+
+    def query(messages, **kwargs):
+        calls.append((messages, kwargs))
+        return 'ities": [{"text": "甲公司"}], "event_triggers": []}'
+
+    extractor.llm_service.query = query
+    messages = [{"role": "user", "content": "提取实体"}]
+
+    result = extractor._parse_stage_response("extraction", '{"ent', messages)
+
+    assert result == {"entities": [{"text": "甲公司"}], "event_triggers": []}
+    assert len(calls) == 1
+    continuation_messages, kwargs = calls[0]
+    assert kwargs["response_format"] == {"type": "text"}
+    assert continuation_messages[-2] == {"role": "assistant", "content": '{"ent'}
+
+
+def test_stage_fingerprints_follow_lexicon_and_risk_keyword_files(extractor, tmp_path):
+    """触发词词典或风险关键词文件内容变化时，阶段和清单指纹都随之变化"""
+    stage_hash, prompt_hash = extractor._stage_hash("extraction"), extractor.prompt_hash
+
+    lexicon = tmp_path / "extra.txt"
+    lexicon.write_text("停摆\tINCIDENT\n", encoding="utf-8")
+    extractor.trigger_extractor.load_trigger_words([str(lexicon)])
+    extractor._stage_hashes.clear()
+    extractor._prompt_hash = None
+    lexicon_stage_hash = extractor._stage_hash("extraction")
+    assert lexicon_stage_hash != stage_hash
+    assert extractor.prompt_hash != prompt_hash
+
+    risk_keywords = tmp_path / "risk_keywords.json"
+    risk_keywords.write_text('{"keywords": ["爆炸"]}', encoding="utf-8")
+    extractor.tier_gate.load_risk_keywords(str(risk_keywords))
+    extractor._stage_hashes.clear()
+    assert extractor._stage_hash("extraction") != lexicon_stage_hash
@@ -0,0 +1,15 @@
+from services.llm_service import LLMService
+
+
+def test_response_cache_is_opened_on_first_lookup(tmp_path):
+    """构造服务和读取命中统计都不打开缓存数据库，第一次查询缓存时才打开"""
+    cache_path = tmp_path / "llm_cache.sqlite"
+    service = LLMService()
+    service.config = dict(service.config, cache_enabled=True, cache_path=str(cache_path))
+
+    assert service.cache_stats() == {"hits": 0, "misses": 0, "hit_rate": 0.0}
+    assert not cache_path.exists()
+
+    assert service._cache_get({"model": "test", "messages": []})[1] is None
+    assert cache_path.exists()
+    assert service.cache_stats()["misses"] == 1
@@ -0,0 +1,39 @@
+import random
+
+from algorithms.near_duplicate import NearDuplicateIndex, lsh_bands
+
+TEXT = ("华为云今日宣布在贵安数据中心部署新一代昇腾算力集群，面向政企客户提供大模型训练与推理服务。"
+        "多家合作伙伴表示将迁移现有业务，但也有用户反映控制台在高峰时段响应缓慢，客服回应称正在扩容。"
+        "分析人士认为，此举将加剧国内云计算市场的价格竞争，并推动行业加快国产化替代进程。")
+
+
+def test_truncated_copy_is_found():
+    """去掉末尾5个字符的副本Jaccard约0.96，应被找到"""
+    index = NearDuplicateIndex(0.95)
+    index.add(index.signature(TEXT), "original")
+    assert index.find(index.signature(TEXT[:-5])) == "original"
+
+
+def test_bands_get_more_selective_as_threshold_rises():
+    """阈值越高每段行数越多，相似度恰为阈值的文档仍以高概率成为候选"""
+    assert lsh_bands(0.9)[1] < lsh_bands(0.95)[1] < lsh_bands(0.98)[1]
+    for threshold in (0.8, 0.9, 0.95):
+        bands, rows = lsh_bands(threshold)
+        assert bands * rows <= 128
+        assert 1 - (1 - threshold ** rows) ** bands >= 0.99
+
+
+def test_candidate_count_stays_bounded_as_index_grows():
+    """不相似的文档几乎不成为候选，每次查找校验的候选数不随索引规模增长"""
+    generator = random.Random(0)
+    index = NearDuplicateIndex(0.95)
+    checked = []
+    for count in range(3000):
+        text = "".join(chr(generator.randint(0x4e00, 0x4e00 + 3000)) for _ in range(200))
+        signature = index.signature(text)
+        index.find(signature)
+        index.add(signature, count)
+        if count + 1 in (1000, 3000):
+            checked.append(index.candidates_checked)
+    # 索引从1000增长到3000个文档，后2000次查找平均每次校验的候选数仍小于1
+    assert (checked[1] - checked[0]) / 2000 < 1
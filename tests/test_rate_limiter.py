@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import rate_limiter
+from services.llm_service import _retry_after
+from services.rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+    """可手动推进的单调时钟，sleep直接推进时间"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    # 暂停时长不加随机抖动
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: 0.0)
+    return clock
+
+
+def throttle_error(headers):
+    return SimpleNamespace(status_code=429, response=SimpleNamespace(headers=headers))
+
+
+def test_retry_after_prefers_milliseconds_header():
+    assert _retry_after(throttle_error({"retry-after-ms": "1500", "retry-after": "3"})) == 1.5
+    assert _retry_after(throttle_error({"retry-after": "3"})) == 3.0
+    assert _retry_after(throttle_error({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+    assert _retry_after(throttle_error({})) is None
+    assert _retry_after(ValueError("not an HTTP error")) is None
+
+
+def test_throttling_pauses_for_retry_after_and_halves_rate_once_per_pause(clock):
+    limiter = AdaptiveRateLimiter(rpm=600)
+    limiter.on_throttled(retry_after=2)
+    assert limiter.scale == 0.5
+    assert limiter._reserve(1) == pytest.approx(2.0)
+
+    # 同一暂停期内的429不再减速
+    clock.now += 1
+    limiter.on_throttled(retry_after=0.5)
+    assert limiter.scale == 0.5
+    assert limiter._reserve(1) == pytest.approx(1.0)
+
+    clock.now += 1
+    limiter.on_throttled()
+    assert limiter.scale == 0.25
+    assert limiter._reserve(1) == pytest.approx(limiter.default_retry_after)
+    assert limiter.stats() == {"scale": 0.25, "throttled": 3}
+
+
+def test_rate_never_drops_below_min_scale(clock):
+    limiter = AdaptiveRateLimiter(rpm=600, min_scale=0.2)
+    for _ in range(5):
+        limiter.on_throttled(retry_after=0)
+        clock.now += 1
+    assert limiter.scale == 0.2
+
+
+def test_success_recovers_rate_additively_up_to_full_quota(clock):
+    limiter = AdaptiveRateLimiter(rpm=600)
+    limiter.on_throttled(retry_after=0)
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.scale == pytest.approx(0.6)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.scale == 1.0
+
+
+def test_token_reservation_blocks_until_remaining_quota_refills(clock):
+    # 每秒补充100个token，桶容量1000
+    limiter = AdaptiveRateLimiter(tpm=6000, burst_seconds=10)
+    assert limiter._reserve(800) == 0.0
+    assert limiter._reserve(500) == pytest.approx(3.0)
+
+    limiter.acquire(500)
+    assert sum(clock.slept) == pytest.approx(3.0)
+    assert limiter.token_bucket.tokens == pytest.approx(0.0)
+
+
+def test_request_larger_than_bucket_waits_for_full_bucket(clock):
+    limiter = AdaptiveRateLimiter(tpm=6000, burst_seconds=10)
+    assert limiter._reserve(5000) == 0.0
+    assert limiter._reserve(5000) == pytest.approx(10.0)
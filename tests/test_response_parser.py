@@ -0,0 +1,73 @@
+import pytest
+
+from services.response_parser import JsonArrayStreamParser, ResponseParseError, repair_json, validate_response
+
+
+def test_truncation_drops_half_written_trailing_element():
+    """截断在元素内部时整个元素丢弃，不留下缺字段的空壳"""
+    parsed, truncated = repair_json('{"events":[{"event_id":"EV1","importance":3},{"importance":3')
+    assert truncated
+    assert parsed == {"events": [{"event_id": "EV1", "importance": 3}]}
+
+
+def test_truncation_inside_nested_array_drops_whole_element():
+    """位置或提及列表写到一半时不保留不完整的位置，也不保留丢了提及的实体"""
+    parsed, _ = repair_json('{"event_triggers":[{"text":"宣布","position":[3,5]},{"text":"故障","position":[1')
+    assert parsed == {"event_triggers": [{"text": "宣布", "position": [3, 5]}]}
+
+    parsed, _ = repair_json('{"entities":[{"text":"甲","mentions":[{"text":"甲","position":[0,1]}]},'
+                            '{"text":"乙","type":"ORG","mentions":[{"te')
+    assert parsed == {"entities": [{"text": "甲", "mentions": [{"text": "甲", "position": [0, 1]}]}]}
+
+
+def test_truncation_before_first_element_is_an_error():
+    """还没有任何完整元素时无法修复，标记为截断以便续写"""
+    with pytest.raises(ResponseParseError) as excinfo:
+        repair_json('{"events":[{"importance":3')
+    assert excinfo.value.truncated
+
+
+def test_validation_drops_items_missing_fields_read_by_merging():
+    """合并时直接读取的触发词文本、事件要素和触发词位置缺失或类型错误时丢弃条目"""
+    result, dropped = validate_response("construction", {"events": [
+        {"trigger": {"text": "裁员"}, "elements": {}},
+        {"trigger": {"trigger_id": "T1"}, "elements": {}},
+        {"trigger": {"text": "上涨"}},
+        {"importance": 3}
+    ]})
+    assert dropped == 3
+    assert result["events"] == [{"trigger": {"text": "裁员"}, "elements": {}}]
+
+    result, dropped = validate_response("extraction", {"event_triggers": [
+        {"text": "宣布", "position": [3, 5]},
+        {"text": "故障", "position": [1]},
+        {"text": "排查", "position": ["1", "3"]},
+        {"text": "扩容"}
+    ]})
+    assert dropped == 3
+    assert result == {"event_triggers": [{"text": "宣布", "position": [3, 5]}], "entities": []}
+
+
+def test_validation_removes_optional_fields_of_wrong_type():
+    """可选字段类型错误时只删除该字段，条目保留"""
+    result, dropped = validate_response("integration", {"events": [
+        {"trigger": {"text": "裁员"}, "elements": {}, "sentiment": "NEGATIVE", "relations": []}
+    ]})
+    assert dropped == 0
+    assert result["events"] == [{"trigger": {"text": "裁员"}, "elements": {}, "relations": []}]
+
+
+def test_validation_rejects_response_without_any_list_field():
+    with pytest.raises(ResponseParseError):
+        validate_response("construction", {"result": []})
+
+
+def test_stream_parser_emits_each_element_once_as_it_closes():
+    """元素跨越多段输入时在结束的那一段返回，未指定的字段不返回"""
+    parser = JsonArrayStreamParser(fields=("events",))
+    chunks = ['{"entities": [{"text": "甲"}], "ev', 'ents": [{"event_id": "EV1", "summary": "a, ]}"}',
+              ', {"event_id": "EV2"', '}]}']
+    emitted = [parser.feed(chunk) for chunk in chunks]
+    assert emitted == [[], [("events", {"event_id": "EV1", "summary": "a, ]}"})],
+                       [], [("events", {"event_id": "EV2"})]]
+    assert parser.count == 2
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from algorithms.event_trigger import EventTriggerExtractor
+from algorithms.trigger_matcher import AhoCorasickMatcher
+
+
+@pytest.fixture(scope="module")
+def trigger_extractor():
+    """加载内置英文触发词和config/trigger_lexicons下词典的提取器"""
+    return EventTriggerExtractor()
+
+
+def test_matcher_reports_every_overlapping_match():
+    """自动机返回所有重叠的匹配，包括作为更长模式后缀的模式"""
+    matcher = AhoCorasickMatcher()
+    for pattern in ("数据泄露", "泄露", "据泄"):
+        matcher.add(pattern, pattern)
+    assert sorted(matcher.finditer("发生数据泄露")) == [(2, 6, "数据泄露"), (3, 5, "据泄"), (4, 6, "泄露")]
+
+
+def test_overlapping_triggers_resolve_to_leftmost_longest(trigger_extractor):
+    triggers = trigger_extractor.extract_triggers("平台发生数据泄露事件")
+    assert [(t["text"], t["position"]) for t in triggers] == [("数据泄露", [4, 8])]
+
+
+def test_ascii_triggers_require_word_boundaries(trigger_extractor):
+    """英文触发词不匹配单词内部，原文大小写保留"""
+    triggers = trigger_extractor.extract_triggers("Police Arrested the attacker; the discharged case.")
+    assert [(t["text"], t["potential_type"]) for t in triggers] == [("Arrested", "JUSTICE")]
+
+
+def test_cjk_triggers_are_exempt_from_word_boundaries(trigger_extractor):
+    """中文触发词两侧紧邻汉字也能匹配"""
+    triggers = trigger_extractor.extract_triggers("某公司宣布裁员")
+    assert [(t["text"], t["position"]) for t in triggers] == [("宣布", [3, 5]), ("裁员", [5, 7])]
+
+
+def test_repeated_occurrences_give_one_trigger_per_offset(trigger_extractor):
+    triggers = trigger_extractor.extract_triggers("故障，故障，故障")
+    assert [t["position"] for t in triggers] == [[0, 2], [3, 5], [6, 8]]
+    assert [t["trigger_id"] for t in triggers] == ["T1", "T2", "T3"]
+
+
+def test_loads_json_and_txt_lexicons(tmp_path):
+    json_lexicon = tmp_path / "extra.json"
+    json_lexicon.write_text(json.dumps({"inflect": True, "triggers": {"INCIDENT": ["crash"]}}), encoding="utf-8")
+    txt_lexicon = tmp_path / "extra.txt"
+    txt_lexicon.write_text("# 注释\n停摆\tINCIDENT\n断网\n\n", encoding="utf-8")
+
+    extractor = EventTriggerExtractor(lexicon_paths=[str(json_lexicon), str(txt_lexicon)])
+    assert extractor.all_triggers["crash"] == extractor.all_triggers["crashed"] == "INCIDENT"
+    assert extractor.all_triggers["停摆"] == "INCIDENT"
+    assert extractor.all_triggers["断网"] == "OTHER"
+    assert "# 注释" not in extractor.all_triggers
+    # 只加载指定的词典，不加载config/trigger_lexicons
+    assert "宣布" not in extractor.all_triggers
+    assert len(extractor.lexicon_digests) == 2
+
+    triggers = extractor.extract_triggers("server crashed，导致停摆")
+    assert [t["text"] for t in triggers] == ["crashed", "停摆"]